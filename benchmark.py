@@ -0,0 +1,73 @@
+import re
+import shlex
+import statistics
+from typing import Dict, List, Optional
+
+import shelling
+import tracing
+
+REAL_MARKER = "NOPASTE_RUN"
+# $EPOCHREALTIME before and after a run; the decimal separator follows the locale
+REAL_RE = re.compile(REAL_MARKER + r" (\d+[.,]\d+) (\d+[.,]\d+)")
+NOISE_FRACTION = 0.02  # medians closer than this (or than half the runs' spread) are not told apart
+
+
+def time_runs(root_directory: str,
+              executable_name: str = "a.out",
+              repeat: int = 5,
+              stdin_path: Optional[str] = None,
+              distro: Optional[str] = None,
+              warmup: int = 1) -> List[float]:
+    """
+    Run the binary `warmup` untimed times (page cache, CPU frequency), then `repeat` times inside one WSL shell,
+    and return each timed run's wall time in seconds (microsecond resolution, from $EPOCHREALTIME).
+    stdin_path (Windows or WSL path) is fed to every run; otherwise stdin is /dev/null.
+    Program output is discarded. Raises RuntimeError if a run exits non-zero.
+    """
+    root_path = shelling.windows_to_wsl(root_directory)
+    binary = "./" + shlex.quote(executable_name)
+    stdin = shelling.windows_to_wsl(stdin_path) if stdin_path else "/dev/null"
+    cmd = (f"cd {root_path} && for i in $(seq {int(warmup) + int(repeat)}); do "
+           f"s=$EPOCHREALTIME; {binary} < {stdin} > /dev/null || exit $?; e=$EPOCHREALTIME; "
+           f"[ $i -gt {int(warmup)} ] && echo \"{REAL_MARKER} $s $e\"; done; true")
+    with tracing.span("benchmark", "run", runs=repeat):
+        cp = shelling.run_wsl_command(cmd, distro=distro, capture=True)
+    times = [float(end.replace(",", ".")) - float(start.replace(",", "."))
+             for start, end in REAL_RE.findall(cp.stdout or "")]
+    if cp.returncode != 0:
+        raise RuntimeError(f"{executable_name} exited with code {cp.returncode}: {(cp.stderr or '').strip()[-500:]}")
+    return times
+
+
+def summarize(times: List[float]) -> Dict[str, float]:
+    if not times:
+        return {}
+    return {
+        "runs": len(times),
+        "min": min(times),
+        "median": statistics.median(times),
+        "mean": statistics.fmean(times),
+        "max": max(times),
+    }
+
+
+def noise(times: List[float]) -> float:
+    """Seconds within which another median is not told apart from this one's."""
+    if not times:
+        return 0.0
+    return max(NOISE_FRACTION * statistics.median(times), (max(times) - min(times)) / 2)
+
+
+def differs(times: List[float], other: List[float]) -> bool:
+    """Whether the two sets of runs have medians further apart than either's noise."""
+    if not times or not other:
+        return False
+    return abs(statistics.median(times) - statistics.median(other)) > max(noise(times), noise(other))
+
+
+def format_summary(summary: Dict[str, float]) -> str:
+    if not summary:
+        return "no runs"
+    return (f"{summary['runs']} runs: min {summary['min'] * 1000:.1f} ms, "
+            f"median {summary['median'] * 1000:.1f} ms, mean {summary['mean'] * 1000:.1f} ms, "
+            f"max {summary['max'] * 1000:.1f} ms")
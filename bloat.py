@@ -0,0 +1,239 @@
+import json
+import os
+import re
+import shlex
+import time
+from typing import Dict, List, Optional, Tuple
+
+import shelling
+
+BLOAT_DIR = ".nopaste/bloat"
+SECTION_MARKER = "@@SECTIONS"
+TU_MARKER = "@@OBJECTS"
+GROUPINGS = ("file", "namespace", "template", "symbol", "section", "tu")
+# "vtable for X", "non-virtual thunk to X", ...: attribute to X
+SPECIAL_PREFIX_RE = re.compile(r"^(?:(?:construction )?vtable|typeinfo(?: name)?|VTT|guard variable) for "
+                               r"|^(?:(?:non-)?virtual|covariant return) thunk to ")
+CLONE_RE = re.compile(r"( \[clone [^\]]*\])+$")
+
+
+class Symbol:
+    def __init__(self, name: str, kind: str, size: int, file: str):
+        self.name = name
+        self.kind = kind  # nm type letter
+        self.size = size
+        self.file = file  # defining source/header, "" without debug info
+
+
+class Snapshot:
+    """Symbols, section sizes and per-object sizes of one build of the output binary."""
+
+    def __init__(self, binary: str, symbols: List[Symbol], sections: Dict[str, int], tus: Dict[str, int],
+                 created: Optional[float] = None):
+        self.binary = binary
+        self.symbols = symbols
+        self.sections = sections
+        self.tus = tus
+        self.created = created if created is not None else time.time()
+
+    @property
+    def total(self) -> int:
+        return sum(self.sections.values())
+
+    def to_dict(self) -> dict:
+        return {"binary": self.binary, "created": self.created, "sections": self.sections, "tus": self.tus,
+                "symbols": [[s.name, s.kind, s.size, s.file] for s in self.symbols]}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Snapshot":
+        return cls(data.get("binary", ""), [Symbol(*row) for row in data.get("symbols", [])],
+                   data.get("sections", {}), data.get("tus", {}), data.get("created"))
+
+
+# --- demangled name helpers ----------------------------------------------------------------------
+
+def _strip_brackets(name: str, open_char: str, close_char: str, keep: str) -> str:
+    """Replace every top-level open..close group with `keep`; `operator<` and friends are left alone."""
+    out, depth, i = [], 0, 0
+    while i < len(name):
+        if name.startswith("operator", i) and depth == 0:
+            match = re.match(r"operator\s*(<=>|<<=|>>=|<<|>>|<=|>=|<|>|\(\)|\[\]|->\*?)?", name[i:])
+            out.append(match.group(0))
+            i += len(match.group(0))
+            continue
+        ch = name[i]
+        if ch == open_char:
+            if depth == 0:
+                out.append(keep)
+            depth += 1
+        elif ch == close_char and depth:
+            depth -= 1
+        elif depth == 0:
+            out.append(ch)
+        i += 1
+    return "".join(out)
+
+
+def qualified_name(name: str) -> str:
+    """`void ns::f<int>(int) const [clone .cold]` -> `ns::f<…>`: no return type, parameters or clone suffix."""
+    name = CLONE_RE.sub("", SPECIAL_PREFIX_RE.sub("", name)).replace("(anonymous namespace)", "{anonymous}")
+    name = _strip_brackets(name, "<", ">", "<…>")
+    name = _strip_brackets(name, "(", ")", "")
+    name = name.replace(" const", "").strip()
+    if "operator" in name:
+        head, _sep, tail = name.partition("operator")
+        return head.rsplit(" ", 1)[-1] + "operator" + tail
+    return name.rsplit(" ", 1)[-1]
+
+
+def namespace_of(name: str) -> str:
+    parts = qualified_name(name).split("::")
+    return parts[0] if len(parts) > 1 else "(global)"
+
+
+def template_of(name: str) -> str:
+    qualified = qualified_name(name)
+    return qualified if "<…>" in qualified else "(not a template)"
+
+
+# --- collection ----------------------------------------------------------------------------------
+
+def parse_nm(text: str) -> List[Symbol]:
+    """`nm --size-sort -C [-l] -S --defined-only` output; aliases (same address and size) are counted once."""
+    symbols, seen = [], set()
+    for line in text.splitlines():
+        parts = line.split(None, 3)
+        if len(parts) < 4:
+            continue
+        address, size, kind, rest = parts
+        try:
+            size = int(size, 16)
+        except ValueError:
+            continue
+        if (address, size) in seen:
+            continue
+        seen.add((address, size))
+        name, _tab, location = rest.partition("\t")
+        file = location.rsplit(":", 1)[0] if location else ""
+        symbols.append(Symbol(name, kind, size, file))
+    return symbols
+
+
+def parse_size_sections(text: str) -> Dict[str, int]:
+    """`size -A -d` output -> {section: bytes}."""
+    sections = {}
+    for line in text.splitlines():
+        parts = line.split()
+        if len(parts) >= 2 and parts[0].startswith(".") and parts[1].isdigit():
+            sections[parts[0]] = int(parts[1])
+    return sections
+
+
+def parse_size_objects(text: str) -> Dict[str, int]:
+    """`size -d` (Berkeley format) of the objects of one flag set, run from its directory -> {source rel: bytes}."""
+    tus = {}
+    for line in text.splitlines():
+        parts = line.split(None, 5)
+        if len(parts) == 6 and parts[3].isdigit() and parts[5].endswith(".o"):
+            rel = parts[5][2:] if parts[5].startswith("./") else parts[5]
+            tus[rel[:-2]] = int(parts[3])
+    return tus
+
+
+def collect(root_directory: str, executable_name: str, distro: Optional[str] = None, lines: bool = False) -> Snapshot:
+    """
+    One WSL call: nm (symbols; with lines, also their defining file via nm -l, which needs Debug info and reads
+    the DWARF line tables for every symbol, so it is much slower on large binaries), size -A
+    (sections) and, when the incremental builder's object cache exists, the size of every object (per-TU
+    size before the linker drops unused code; the most recently built flag set). Raises RuntimeError if the
+    binary cannot be read.
+    """
+    import builder  # only for OBJ_DIR
+    root_path = shelling.windows_to_wsl(root_directory)
+    exe = shlex.quote(executable_name)
+    latest_objects = (f"O=$(ls -td {builder.OBJ_DIR}/*/ 2>/dev/null | head -n 1); "
+                      f"[ -n \"$O\" ] && (cd \"$O\" && find . -name '*.o' -exec size -d {{}} +)")
+    line_flag = "-l " if lines else ""
+    cmd = (f"cd {root_path} && nm --size-sort -C {line_flag}-S --defined-only {exe} && echo {SECTION_MARKER} && "
+           f"size -A -d {exe} && echo {TU_MARKER} && {{ {latest_objects} || true; }}")
+    cp = shelling.run_wsl_command(cmd, distro=distro, capture=True)
+    if cp.returncode != 0:
+        raise RuntimeError(f"Could not analyze {executable_name}: {(cp.stderr or '').strip()[-500:]}")
+    nm_text, _sep, rest = (cp.stdout or "").partition(SECTION_MARKER)
+    section_text, _sep, tu_text = rest.partition(TU_MARKER)
+
+    root_prefix = shelling.translate_paths([root_directory])[0].rstrip("/") + "/"
+    symbols = parse_nm(nm_text)
+    for symbol in symbols:
+        if symbol.file.startswith(root_prefix):
+            symbol.file = symbol.file[len(root_prefix):]
+    return Snapshot(executable_name, symbols, parse_size_sections(section_text), parse_size_objects(tu_text))
+
+
+# --- grouping, snapshots and diffs ---------------------------------------------------------------
+
+def group(snapshot: Snapshot, by: str) -> Dict[str, Tuple[int, int]]:
+    """{group: (bytes, count)} for one of GROUPINGS."""
+    if by == "section":
+        return {name: (size, 1) for name, size in snapshot.sections.items()}
+    if by == "tu":
+        return {name: (size, 1) for name, size in snapshot.tus.items()}
+    key = {
+        "file": lambda s: s.file or "(no file: no debug info, or collected without lines)",
+        "namespace": lambda s: namespace_of(s.name),
+        "template": lambda s: template_of(s.name),
+        "symbol": lambda s: s.name,
+    }[by]
+    groups: Dict[str, Tuple[int, int]] = {}
+    for symbol in snapshot.symbols:
+        name = key(symbol)
+        size, count = groups.get(name, (0, 0))
+        groups[name] = (size + symbol.size, count + 1)
+    return groups
+
+
+def ranked(groups: Dict[str, Tuple[int, int]], top: Optional[int] = None) -> List[Tuple[str, int, int]]:
+    rows = sorted(((name, size, count) for name, (size, count) in groups.items()), key=lambda r: r[1], reverse=True)
+    return rows[:top] if top else rows
+
+
+def diff(old: Snapshot, new: Snapshot, by: str) -> List[Tuple[str, int, int]]:
+    """[(group, new bytes, delta)] for groups that changed, biggest change first."""
+    before, after = group(old, by), group(new, by)
+    rows = []
+    for name in set(before) | set(after):
+        delta = after.get(name, (0, 0))[0] - before.get(name, (0, 0))[0]
+        if delta:
+            rows.append((name, after.get(name, (0, 0))[0], delta))
+    return sorted(rows, key=lambda r: abs(r[2]), reverse=True)
+
+
+def snapshot_dir(root_directory: str) -> str:
+    return os.path.join(root_directory, BLOAT_DIR)
+
+
+def save_snapshot(snapshot: Snapshot, root_directory: str, label: str) -> str:
+    directory = snapshot_dir(root_directory)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, re.sub(r"[^A-Za-z0-9_.+-]+", "-", label) + ".json")
+    with open(path, "w", encoding="utf-8") as handle:
+        json.dump(snapshot.to_dict(), handle)
+    return path
+
+
+def load_snapshot(root_directory: str, label: str) -> Optional[Snapshot]:
+    path = label if os.path.isfile(label) else os.path.join(snapshot_dir(root_directory), label + ".json")
+    try:
+        with open(path, "r", encoding="utf-8") as handle:
+            return Snapshot.from_dict(json.load(handle))
+    except (OSError, ValueError, TypeError) as exc:
+        print(f"Failed to load size snapshot {label}: {exc}")
+        return None
+
+
+def list_snapshots(root_directory: str) -> List[str]:
+    try:
+        names = os.listdir(snapshot_dir(root_directory))
+    except OSError:
+        return []
+    return sorted(name[:-5] for name in names if name.endswith(".json"))
@@ -0,0 +1,530 @@
+import hashlib
+import json
+import os
+import shlex
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import modules
+import monitor
+import shelling
+import tracing
+
+OBJ_DIR = ".nopaste/obj"
+CACHE_FILE = "cache.json"
+LINK_KEY = "__link__"  # cache entry remembering the last link command
+ARCHIVES_KEY = "__archives__"  # cache entry: {directory rel: {"fingerprint": ..., "archive": ...}}
+ARCHIVE_OPTION = "Directory archives"
+# flags that only matter when linking; they do not invalidate objects
+LINK_ONLY_FLAGS = ("-static", "-Wl,--gdb-index")
+# needed when compiling and again when linking (LTO runs at link time, -Ofast links crtfastmath.o)
+COMPILE_AND_LINK_FLAGS = ("-flto=auto", "-Ofast")
+DEFAULT_TU_SECONDS = 1.0  # estimate when there is no timing history at all
+
+
+def split_flags(flags: List[str]):
+    """Split g++ flags into (compile flags, link-only flags)."""
+    compile_flags, link_flags = [], []
+    for flag in flags:
+        if flag in LINK_ONLY_FLAGS or flag.startswith("-fuse-ld="):
+            link_flags.append(flag)
+        elif flag in COMPILE_AND_LINK_FLAGS:
+            compile_flags.append(flag)
+            link_flags.append(flag)
+        else:
+            compile_flags.append(flag)
+    return compile_flags, link_flags
+
+
+def parse_depfile(text: str) -> List[str]:
+    """Prerequisites from a make-style depfile written by -MMD (the target itself is dropped)."""
+    text = text.replace("\\\n", " ")
+    deps = []
+    for line in text.splitlines():
+        if ":" not in line:
+            continue
+        # "obj.o: a.cpp b.h" - paths are root-relative so the first ':' ends the target
+        _target, _sep, rest = line.partition(": ")
+        token = ""
+        escaped = False
+        for ch in rest:
+            if escaped:
+                token += ch
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch.isspace():
+                if token:
+                    deps.append(token)
+                token = ""
+            else:
+                token += ch
+        if token:
+            deps.append(token)
+    return [d[2:] if d.startswith("./") else d for d in deps]
+
+
+def estimate_durations(units, stats: Dict[str, dict], sizes: Dict[str, int]) -> Dict[str, float]:
+    """
+    Expected compile time per TU: the last measured time when there is one, otherwise the TU's
+    size (source plus known headers) times the median seconds-per-byte of the TUs we have timed.
+    """
+    rates = sorted(stats[tu.rel]["seconds"] / sizes[tu.rel] for tu in units
+                   if stats.get(tu.rel, {}).get("seconds") and sizes.get(tu.rel))
+    rate = rates[len(rates) // 2] if rates else None
+    estimates = {}
+    for tu in units:
+        known = stats.get(tu.rel, {}).get("seconds")
+        if known:
+            estimates[tu.rel] = known
+        elif rate is not None and sizes.get(tu.rel):
+            estimates[tu.rel] = rate * sizes[tu.rel]
+        else:
+            estimates[tu.rel] = DEFAULT_TU_SECONDS
+    return estimates
+
+
+def schedule_report(compiled, link_seconds: float, wall_seconds: float, workers: int) -> str:
+    """Compare the wall time with the critical path (longest TU + link) and the perfect-packing bound."""
+    if not compiled:
+        return ""
+    longest = max(compiled, key=lambda tu: tu.seconds)
+    critical = longest.seconds + link_seconds
+    work = sum(tu.seconds for tu in compiled)
+    bound = max(critical, work / max(1, workers) + link_seconds)
+    return (f"critical path {critical:.2f}s (longest: {longest.rel} {longest.seconds:.2f}s + link), "
+            f"{work:.2f}s of compile work on {workers} job(s), lower bound {bound:.2f}s, "
+            f"wall {wall_seconds:.2f}s ({wall_seconds / bound:.2f}x)" if bound else "")
+
+
+class TranslationUnit:
+    def __init__(self, rel: str, obj: str):
+        self.rel = rel  # source, root-relative posix path
+        self.obj = obj  # object, root-relative posix path
+        self.dep = obj[:-2] + ".d"
+        self.seconds = 0.0
+        self.output = ""
+        self.ok = None
+
+    def __repr__(self):
+        return f"TranslationUnit({self.rel!r})"
+
+
+class BuildResult:
+    def __init__(self):
+        self.ok = False
+        self.compiled: List[TranslationUnit] = []
+        self.reused: List[TranslationUnit] = []
+        self.failed: List[TranslationUnit] = []
+        self.output = ""
+        self.seconds = 0.0
+        self.link_seconds = 0.0
+
+    def stats(self) -> dict:
+        return {"ok": self.ok, "compiled": len(self.compiled), "reused": len(self.reused), "failed": len(self.failed),
+                "seconds": self.seconds, "link_seconds": self.link_seconds}
+
+    def summary(self) -> str:
+        status = "ok" if self.ok else "FAILED"
+        return (f"build {status}: {len(self.compiled)} compiled, {len(self.reused)} up to date, "
+                f"{len(self.failed)} failed, link {self.link_seconds:.2f}s, total {self.seconds:.2f}s")
+
+
+class Project:
+    """
+    Incremental per-TU build of one root directory: a file index, the header dependency graph
+    (from -MMD depfiles) and an object cache under <root>/.nopaste/obj/<flags hash>/.
+    Keeping a Project alive (see daemon.py) keeps all of that in memory between builds.
+    """
+
+    def __init__(self, root_directory: str, distro: Optional[str] = None):
+        self.root_directory = os.path.abspath(root_directory)
+        self.root_path = shelling.windows_to_wsl(self.root_directory)
+        self.distro = distro
+        self._caches: Dict[str, dict] = {}  # flags hash -> {source rel: {dep rel: [size, mtime_ns]}}
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()  # one build per project at a time; jobs still run in parallel
+        self.remote = None  # remote.RemoteCompiler when worker endpoints are configured
+        self._hashes: Dict[str, tuple] = {}  # rel -> (stat signature, content sha1)
+        self._module_scan: Dict[str, tuple] = {}  # rel -> (stat signature, modules.ModuleInfo)
+
+    # --- index / dependency graph -------------------------------------------------------------
+
+    def relative(self, path: str) -> str:
+        return os.path.relpath(os.path.abspath(path), self.root_directory).replace("\\", "/")
+
+    def _stat(self, rel: str):
+        try:
+            st = os.stat(os.path.join(self.root_directory, rel))
+        except OSError:
+            return None
+        return [st.st_size, st.st_mtime_ns]
+
+    def _cache_dir(self, key: str) -> str:
+        return f"{OBJ_DIR}/{key}"
+
+    def _load_cache(self, key: str) -> dict:
+        with self._lock:
+            if key not in self._caches:
+                path = os.path.join(self.root_directory, self._cache_dir(key), CACHE_FILE)
+                try:
+                    with open(path, "r", encoding="utf-8") as handle:
+                        self._caches[key] = json.load(handle)
+                except (OSError, json.JSONDecodeError):
+                    self._caches[key] = {}
+            return self._caches[key]
+
+    def _save_cache(self, key: str):
+        with self._lock:
+            directory = os.path.join(self.root_directory, self._cache_dir(key))
+            os.makedirs(directory, exist_ok=True)
+            try:
+                with open(os.path.join(directory, CACHE_FILE), "w", encoding="utf-8") as handle:
+                    json.dump(self._caches.get(key, {}), handle)
+            except OSError as exc:
+                print(f"Failed to save object cache: {exc}")
+
+    def is_stale(self, tu: TranslationUnit, cache: dict) -> bool:
+        entry = cache.get(tu.rel)
+        if not entry or not os.path.exists(os.path.join(self.root_directory, tu.obj)):
+            return True
+        return any(self._stat(dep) != sig for dep, sig in entry.items())
+
+    def _tu_bytes(self, tu: TranslationUnit, cache: dict) -> int:
+        """Source size plus the headers it pulled in last time (if known)."""
+        entry = cache.get(tu.rel)
+        if entry:
+            return sum(sig[0] for sig in entry.values() if sig)
+        sig = self._stat(tu.rel)
+        return sig[0] if sig else 0
+
+    def _record(self, tu: TranslationUnit, cache: dict, extra: Optional[List[str]] = None):
+        """Remember the stat of everything tu depended on; extra: more deps (the CMIs of imported modules)."""
+        try:
+            with open(os.path.join(self.root_directory, tu.dep), "r", encoding="utf-8") as handle:
+                deps = parse_depfile(handle.read())
+        except OSError:
+            deps = [tu.rel]
+        deps += extra or []
+        with self._lock:
+            cache[tu.rel] = {dep: self._stat(dep) for dep in deps if not os.path.isabs(dep)}
+
+    # --- building -----------------------------------------------------------------------------
+
+    def plan(self, sources: List[str], compile_flags: List[str]):
+        key = hashlib.sha1(" ".join(compile_flags).encode("utf-8")).hexdigest()[:12]
+        units = []
+        for path in shelling.expand_sources(sources):
+            if not path.endswith(shelling.SOURCE_EXTENSIONS):
+                continue
+            rel = self.relative(path)
+            obj = f"{self._cache_dir(key)}/{rel.replace('../', '__/')[:-4]}.o"
+            units.append(TranslationUnit(rel, obj))
+        return key, units
+
+    # --- C++20 modules ----------------------------------------------------------------------------
+
+    def scan_modules(self, units: List[TranslationUnit], compile_flags: List[str]) -> Dict[str, "modules.ModuleInfo"]:
+        """modules.scan, repeated only for sources whose size or mtime changed since the last build."""
+        signatures = {tu.rel: self._stat(tu.rel) for tu in units}
+        changed = [rel for rel, sig in signatures.items()
+                   if sig is None or self._module_scan.get(rel, (None,))[0] != sig]
+        if changed:
+            for rel, info in modules.scan(self.root_directory, changed, compile_flags, distro=self.distro).items():
+                self._module_scan[rel] = (signatures[rel], info)
+        return {tu.rel: self._module_scan[tu.rel][1] for tu in units}
+
+    # --- directory archives -------------------------------------------------------------------
+
+    def components(self, sources: List[str], units: List[TranslationUnit]) -> Dict[str, List[TranslationUnit]]:
+        """Checked directories below the root, each with the TUs directly inside it (see shelling.expand_sources)."""
+        by_rel = {tu.rel: tu for tu in units}
+        found = {}
+        for path in sources:
+            if not os.path.isdir(path):
+                continue
+            rel = self.relative(path)
+            if rel == "." or rel.startswith("../"):
+                continue
+            tus = [by_rel[r] for r in (self.relative(p) for p in shelling.expand_sources([path])) if r in by_rel]
+            if tus:
+                found[rel] = tus
+        return found
+
+    def _content_hash(self, rel: str) -> str:
+        sig = self._stat(rel)
+        known = self._hashes.get(rel)
+        if known is not None and known[0] == sig:
+            return known[1]
+        try:
+            with open(os.path.join(self.root_directory, rel), "rb") as handle:
+                digest = hashlib.sha1(handle.read()).hexdigest()
+        except OSError:
+            digest = "missing"
+        self._hashes[rel] = (sig, digest)
+        return digest
+
+    def fingerprint(self, tus: List[TranslationUnit], cache: dict, compile_flags: List[str]) -> Optional[str]:
+        """
+        Content hash of a directory component: its sources, every project header they included last time
+        and the flags. None while some TU has never been compiled (its headers are unknown).
+        Contents are only re-read for files whose size or mtime changed.
+        """
+        files = set()
+        for tu in tus:
+            entry = cache.get(tu.rel)
+            if not entry:
+                return None
+            files.update(entry)
+        digest = hashlib.sha1(" ".join(compile_flags).encode("utf-8"))
+        for rel in sorted(files):
+            digest.update(f"{rel}\0{self._content_hash(rel)}\0".encode("utf-8"))
+        return digest.hexdigest()
+
+    def archive_path(self, key: str, directory: str) -> str:
+        return f"{self._cache_dir(key)}/lib/{directory.replace('/', '__')}.a"
+
+    def archive(self, key: str, components: Dict[str, List[TranslationUnit]]):
+        """(Re)create the archives of the given components in one WSL call; gcc-ar so LTO objects keep working."""
+        steps = [f"cd {self.root_path}", f"mkdir -p {shlex.quote(self._cache_dir(key) + '/lib')}"]
+        for directory, tus in components.items():
+            archive = shlex.quote(self.archive_path(key, directory))
+            steps.append(f"rm -f {archive}")
+            steps.append(f"gcc-ar rcs {archive} " + " ".join(shlex.quote(tu.obj) for tu in tus))
+        with tracing.span("archive", "link", directories=len(components)):
+            return shelling.run_wsl_command(" && ".join(steps), distro=self.distro, capture=True,
+                                            job_name=f"archive {len(components)} director(ies)")
+
+    def use_remote_workers(self, endpoints: Optional[List[str]], token: Optional[str] = None):
+        if not endpoints:
+            self.remote = None
+            return
+        import remote
+        if self.remote is None or [f"{h}:{p}" for h, p in self.remote.endpoints] != list(endpoints):
+            self.remote = remote.RemoteCompiler(endpoints, token=token)
+
+    def compile_unit(self, tu: TranslationUnit, compile_flags: List[str], local: bool = False) -> TranslationUnit:
+        if self.remote is not None and not local:
+            return self.remote.compile_unit(self, tu, compile_flags)
+        obj_dir = os.path.dirname(tu.obj)
+        cmd = (f"cd {self.root_path} && mkdir -p {shlex.quote(obj_dir)} && "
+               f"g++ -c {' '.join(compile_flags)} -IHeaders -ISources -MMD -MF {shlex.quote(tu.dep)} "
+               f"{shlex.quote(tu.rel)} -o {shlex.quote(tu.obj)}")
+        start = time.perf_counter()
+        with tracing.span("compile", "compile", file=tu.rel):
+            cp = shelling.run_wsl_command(cmd, distro=self.distro, capture=True, job_name=f"compile {tu.rel}")
+        tu.seconds = time.perf_counter() - start
+        tu.output = (cp.stdout or "") + (cp.stderr or "")
+        tu.ok = cp.returncode == 0
+        return tu
+
+    def link(self, objects: List[str], link_flags: List[str], executable_name: str):
+        args = link_flags + objects + ["-o", executable_name]
+        rsp = shelling.write_response_file(args, self.root_directory, "link.rsp")
+        cmd = f"cd {self.root_path} && g++ @{shlex.quote(rsp)}"
+        with tracing.span("link", "link", objects=len(objects)):
+            return shelling.run_wsl_command(cmd, distro=self.distro, capture=True, job_name=f"link {executable_name}")
+
+    def build(self,
+              sources: List[str],
+              custom_options=None,
+              language_standard: Optional[str] = None,
+              executable_name: str = "a.out",
+              linker: Optional[str] = None,
+              pool: Optional[ThreadPoolExecutor] = None,
+              jobs: Optional[int] = None,
+              on_event=None) -> BuildResult:
+        """
+        Compile only the translation units whose source or headers changed, then link.
+        - pool: shared executor (the daemon passes one pool for every project); otherwise one is made here.
+        - jobs: the worker count of `pool`, or of the pool made here (default: one per CPU).
+        - on_event: optional callback(str) for progress lines.
+        """
+        with self._build_lock, tracing.span("build", "build", target=executable_name):
+            return self._build(sources, custom_options, language_standard, executable_name, linker,
+                               pool, jobs, on_event)
+
+    def _build(self, sources, custom_options, language_standard, executable_name, linker, pool, jobs, on_event):
+        def emit(text):
+            if on_event is not None:
+                on_event(text)
+
+        start = time.perf_counter()
+        result = BuildResult()
+        flags = shelling.options_to_flags(custom_options, linker=linker)
+        if language_standard:
+            flags.append(f"-std={language_standard}")
+        compile_flags, link_flags = split_flags(flags)
+        # -g, -O2, -std etc. matter at link time too (LTO, debug info)
+        link_flags = compile_flags + link_flags
+
+        key, units = self.plan(sources, compile_flags)
+        cache = self._load_cache(key)
+        # checked directories as static archives: a directory whose contents did not change is not even
+        # checked TU by TU, its archive is linked as it is
+        components = {}
+        if custom_options is not None and shelling.option_enabled(custom_options, ARCHIVE_OPTION):
+            components = self.components(sources, units)
+        archives = cache.get(ARCHIVES_KEY, {})
+        fresh = []
+        for directory, tus in components.items():
+            entry = archives.get(directory)
+            if entry and entry.get("fingerprint") == self.fingerprint(tus, cache, compile_flags) \
+                    and os.path.exists(os.path.join(self.root_directory, self.archive_path(key, directory))):
+                fresh.append(directory)
+        archived = {tu.rel for directory in components for tu in components[directory]}
+        skipped = {tu.rel for directory in fresh for tu in components[directory]}
+        if fresh:
+            emit(f"reusing {len(fresh)} directory archive(s): {', '.join(fresh)}")
+        stale = [tu for tu in units if tu.rel not in skipped and self.is_stale(tu, cache)]
+
+        # C++20 modules: interfaces are compiled before their importers, CMIs are kept per flag set
+        infos = self.scan_modules(units, compile_flags) if modules.modules_standard(language_standard) else {}
+        unit_flags, module_deps = compile_flags, {}
+        if any(info.uses_modules for info in infos.values()):
+            issues = modules.problems(infos)
+            if issues:
+                result.failed = list(units)
+                result.output = "\n".join(issues)
+                emit(result.output)
+                result.seconds = time.perf_counter() - start
+                emit(result.summary())
+                return result
+            mapper = modules.write_mapper(self.root_directory, self._cache_dir(key), infos)
+            unit_flags = compile_flags + modules.module_flags(mapper)
+            module_deps = modules.dependencies(infos)
+            # a rebuilt interface writes a new CMI (g++ records source and header mtimes in it), so everything
+            # importing it is rebuilt as well
+            importers: Dict[str, List[str]] = {}
+            for rel, deps in module_deps.items():
+                for dep in deps:
+                    importers.setdefault(dep, []).append(rel)
+            queue = [tu.rel for tu in stale]
+            stale_rels = set(queue)
+            while queue:
+                for rel in importers.get(queue.pop(), []):
+                    if rel not in stale_rels and rel not in skipped:
+                        stale_rels.add(rel)
+                        queue.append(rel)
+            stale = [tu for tu in units if tu.rel in stale_rels]
+
+        result.reused = [tu for tu in units if tu not in stale]
+        emit(f"{len(stale)} of {len(units)} translation units to compile")
+
+        # longest first, so one slow TU does not start last and stretch the build
+        stats = monitor.load_tu_stats(self.root_directory)
+        estimates = estimate_durations(stale, stats, {tu.rel: self._tu_bytes(tu, cache) for tu in stale})
+        stale.sort(key=lambda tu: estimates[tu.rel], reverse=True)
+
+        resources = None
+        if stale and custom_options is not None and shelling.option_enabled(custom_options, "Memory throttle"):
+            resources = monitor.ResourceMonitor(distro=self.distro)
+            resources.history = stats
+            resources.start()
+
+        def run(tu):
+            info = infos.get(tu.rel)
+            if resources is not None:
+                resources.acquire(tu.rel)
+            try:
+                # module units need the local CMIs, so they are not sent to remote workers
+                self.compile_unit(tu, unit_flags, local=bool(info and info.uses_modules))
+            finally:
+                if resources is not None:
+                    resources.release(tu.rel)
+            if tu.ok:
+                # the CMIs it imported count as dependencies, like headers
+                imported = [modules.cmi_path(self._cache_dir(key), name) for name in info.requires] if info else []
+                self._record(tu, cache, extra=imported)
+            emit(f"{'compiled' if tu.ok else 'FAILED  '} {tu.rel} ({tu.seconds:.2f}s)")
+            if tu.output:
+                emit(tu.output.rstrip())
+            return tu
+
+        workers = jobs or os.cpu_count() or 1
+        own_pool = None
+        if pool is None:
+            own_pool = pool = ThreadPoolExecutor(max_workers=workers)
+        skipped_units: List[TranslationUnit] = []
+
+        def skip(tu, blocker):
+            tu.ok, tu.output = False, f"not compiled: {blocker} failed"
+            skipped_units.append(tu)
+
+        try:
+            if module_deps:
+                done = modules.run_in_order(pool, stale, module_deps, run, on_skip=skip) + skipped_units
+            else:
+                done = list(pool.map(run, stale))
+        finally:
+            if own_pool is not None:
+                own_pool.shutdown()
+            if resources is not None:
+                resources.stop()
+        self._save_cache(key)
+        for tu in done:
+            if tu.ok:
+                stats.setdefault(tu.rel, {})["seconds"] = round(tu.seconds, 3)
+        if resources is not None:
+            resources.merge_into(stats)
+            emit(resources.report())
+        if done:
+            monitor.save_tu_stats(self.root_directory, stats)
+
+        result.compiled = [tu for tu in done if tu.ok]
+        result.failed = [tu for tu in done if not tu.ok]
+        result.output = "\n".join(tu.output for tu in done if tu.output)
+
+        rebuilt = {d: tus for d, tus in components.items() if d not in fresh}
+        if rebuilt and not result.failed:
+            cp = self.archive(key, rebuilt)
+            if cp.returncode != 0:
+                result.failed = [tu for d in rebuilt for tu in rebuilt[d]]
+                result.output += (cp.stdout or "") + (cp.stderr or "")
+                emit(f"archiving failed:\n{result.output.rstrip()}")
+            with self._lock:
+                archives = cache.setdefault(ARCHIVES_KEY, {})
+                for directory, tus in rebuilt.items():
+                    if cp.returncode == 0:
+                        archives[directory] = {"fingerprint": self.fingerprint(tus, cache, compile_flags),
+                                               "archive": self.archive_path(key, directory)}
+                    else:
+                        archives.pop(directory, None)
+            self._save_cache(key)
+            if cp.returncode == 0:
+                emit(f"archived {', '.join(rebuilt)}")
+
+        objects = [tu.obj for tu in units if tu.rel not in archived]
+        if components:
+            # --whole-archive: every object is linked, as if listed one by one (static initializers included)
+            objects += ["-Wl,--whole-archive"] + [self.archive_path(key, d) for d in components] + \
+                       ["-Wl,--no-whole-archive"]
+        link_signature = {"args": " ".join(link_flags + objects), "output": executable_name}
+        if not result.failed and units and not result.compiled and not rebuilt \
+                and cache.get(LINK_KEY) == link_signature \
+                and os.path.exists(os.path.join(self.root_directory, executable_name)):
+            emit("nothing changed, skipping link")
+            result.ok = True
+        elif not result.failed and units:
+            link_start = time.perf_counter()
+            cp = self.link(objects, link_flags, executable_name)
+            result.link_seconds = time.perf_counter() - link_start
+            link_output = (cp.stdout or "") + (cp.stderr or "")
+            if link_output:
+                emit(link_output.rstrip())
+                result.output += link_output
+            result.ok = cp.returncode == 0
+            with self._lock:
+                if result.ok:
+                    cache[LINK_KEY] = link_signature
+                else:
+                    cache.pop(LINK_KEY, None)
+            self._save_cache(key)
+        result.seconds = time.perf_counter() - start
+        report = schedule_report(result.compiled, result.link_seconds, result.seconds, workers)
+        if report:
+            emit(report)
+        emit(result.summary())
+        return result
@@ -0,0 +1,196 @@
+import mmap
+import os
+import subprocess
+import threading
+import time
+from typing import Optional
+
+import shelling
+import tracing
+
+CAPTURE_DIR = ".nopaste/capture"
+RING_BYTES = 8 * 1024 * 1024  # newest output kept in memory
+READ_CHUNK = 64 * 1024
+
+
+class RingBuffer:
+    """Fixed-size byte ring; writing past capacity hands back the oldest bytes it dropped."""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._buf = bytearray(capacity)
+        self._start = 0
+        self.size = 0
+
+    def write(self, data: bytes) -> bytes:
+        evicted = b""
+        if len(data) >= self.capacity:
+            evicted = self.read(0, self.size) + data[:-self.capacity]
+            data = data[-self.capacity:]
+            self._start, self.size = 0, 0
+        overflow = self.size + len(data) - self.capacity
+        if overflow > 0:
+            evicted += self.read(0, overflow)
+            self._start = (self._start + overflow) % self.capacity
+            self.size -= overflow
+        end = (self._start + self.size) % self.capacity
+        first = min(len(data), self.capacity - end)
+        self._buf[end:end + first] = data[:first]
+        self._buf[:len(data) - first] = data[first:]
+        self.size += len(data)
+        return evicted
+
+    def read(self, offset: int, length: int) -> bytes:
+        length = max(0, min(length, self.size - offset))
+        begin = (self._start + offset) % self.capacity
+        first = min(length, self.capacity - begin)
+        return bytes(self._buf[begin:begin + first]) + bytes(self._buf[:length - first])
+
+
+class OutputCapture:
+    """
+    Captures a program's output with bounded memory: the newest RING_BYTES stay in a RingBuffer and
+    everything older is appended to a spill file, which readers map with mmap and page through lazily.
+    Offsets are absolute (0 = first byte the program printed). Safe to read while the program still writes.
+    """
+
+    def __init__(self, spill_path: str, ring_bytes: int = RING_BYTES):
+        self.spill_path = spill_path
+        self.ring = RingBuffer(ring_bytes)
+        self.spilled = 0
+        self.returncode: Optional[int] = None
+        self.seconds = 0.0
+        self._spill = None
+        self._map: Optional[mmap.mmap] = None
+        self._map_size = 0
+        self._closed = False
+        self._lock = threading.Lock()
+
+    @property
+    def total(self) -> int:
+        return self.spilled + self.ring.size
+
+    @property
+    def finished(self) -> bool:
+        return self.returncode is not None
+
+    def write(self, data: bytes):
+        with self._lock:
+            if self._closed:
+                return  # the viewer went away; the program's remaining output is dropped
+            evicted = self.ring.write(data)
+            if evicted:
+                if self._spill is None:
+                    os.makedirs(os.path.dirname(self.spill_path), exist_ok=True)
+                    self._spill = open(self.spill_path, "wb")
+                self._spill.write(evicted)
+                self._spill.flush()
+                self.spilled += len(evicted)
+
+    def _spill_view(self) -> Optional[mmap.mmap]:
+        # the map has a fixed length, so map again once the spill file has grown
+        if self.spilled and self._map_size != self.spilled:
+            if self._map is not None:
+                self._map.close()
+            with open(self.spill_path, "rb") as handle:
+                self._map = mmap.mmap(handle.fileno(), self.spilled, access=mmap.ACCESS_READ)
+            self._map_size = self.spilled
+        return self._map
+
+    def read(self, offset: int, length: int) -> bytes:
+        with self._lock:
+            offset = max(0, min(offset, self.total))
+            length = max(0, min(length, self.total - offset))
+            data = b""
+            if offset < self.spilled:
+                view = self._spill_view()
+                end = min(offset + length, self.spilled)
+                data = view[offset:end]
+                length -= end - offset
+                offset = end
+            if length:
+                data += self.ring.read(offset - self.spilled, length)
+            return data
+
+    def head(self, length: int = READ_CHUNK) -> bytes:
+        return self.read(0, length)
+
+    def tail(self, length: int = READ_CHUNK) -> bytes:
+        return self.read(self.total - length, length)
+
+    def close(self, remove: bool = True):
+        with self._lock:
+            self._closed = True
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+            if self._spill is not None:
+                self._spill.close()
+                self._spill = None
+            if remove and self.spilled:
+                try:
+                    os.remove(self.spill_path)
+                except OSError:
+                    pass
+
+
+def new_capture(root_directory: str) -> OutputCapture:
+    name = time.strftime("run-%Y%m%d-%H%M%S") + f"-{os.getpid()}.log"
+    return OutputCapture(os.path.join(root_directory, CAPTURE_DIR, name))
+
+
+def run_captured(cmd: str, capture: OutputCapture, distro: Optional[str] = None,
+                 stdin_path: Optional[str] = None, timeout: Optional[float] = None) -> OutputCapture:
+    """
+    Run a WSL command with stdout+stderr going into `capture`; blocks until it exits.
+    The run is a jobs.Job, so it stops after `timeout` seconds or on jobs.cancel_all().
+    """
+    import jobs
+    job = jobs.Job("captured run", distro=distro, timeout=timeout)
+    start = time.perf_counter()
+    stdin = open(stdin_path, "rb") if stdin_path else subprocess.DEVNULL
+    try:
+        proc = subprocess.Popen(shelling.wsl_args(job.wrap(cmd), distro=distro), stdout=subprocess.PIPE,
+                                stderr=subprocess.STDOUT, stdin=stdin)
+        job.attach(proc)
+        while True:
+            data = proc.stdout.read1(READ_CHUNK)
+            if not data:
+                break
+            capture.write(data)
+        capture.returncode = proc.wait()
+    finally:
+        job.finish()
+        if stdin_path:
+            stdin.close()
+    if job.timed_out:
+        capture.write(f"\n[stopped: timed out after {timeout:g}s]\n".encode())
+    elif job.cancelled:
+        capture.write(b"\n[stopped: cancelled]\n")
+    capture.seconds = time.perf_counter() - start
+    tracing.add_span("run", "run", start, capture.seconds, exit=capture.returncode)
+    return capture
+
+
+def line_start(capture: OutputCapture, offset: int) -> int:
+    """Move offset back to the start of its line (looking at most one chunk back)."""
+    if offset <= 0:
+        return 0
+    before = capture.read(max(0, offset - READ_CHUNK), min(offset, READ_CHUNK))
+    newline = before.rfind(b"\n")
+    return offset - len(before) + newline + 1 if newline != -1 else offset
+
+
+def format_size(size: int) -> str:
+    """Bytes for display; negative sizes (size diffs) keep their sign."""
+    if abs(size) < 1024:
+        return f"{size} B"
+    if abs(size) < 1024 * 1024:
+        return f"{size / 1024:.1f} KB"
+    return f"{size / (1024 * 1024):.1f} MB"
+
+
+def summary(capture: OutputCapture) -> str:
+    if not capture.finished:
+        return f"{format_size(capture.total)} of output, running"
+    return f"{format_size(capture.total)} of output, exit {capture.returncode}, {capture.seconds:.2f}s"
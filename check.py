@@ -0,0 +1,241 @@
+import hashlib
+import json
+import os
+import re
+import secrets
+import shlex
+import subprocess
+import threading
+import time
+from typing import Dict, List, Optional
+
+import builder
+import jobs
+import shelling
+import tracing
+
+STATE_FILE = "check-state.json"
+# "file:line:col: error: ..." (column is optional for some diagnostics)
+DIAGNOSTIC_RE = re.compile(r"^(?P<file>[^:\s][^:]*):(?P<line>\d+):(?:\d+:)? (?P<kind>fatal error|error|warning): ",
+                           re.MULTILINE)
+
+
+class CheckFailed(RuntimeError):
+    """The checking shell failed (WSL, mktemp, cd, cancelled, ...); `unchecked` never reported a result."""
+
+    def __init__(self, message: str, checked: List["FileCheck"], unchecked: List[str]):
+        super().__init__(message)
+        self.checked = checked
+        self.unchecked = unchecked
+
+
+class FileCheck:
+    """Outcome of `g++ -fsyntax-only` on one source file, plus what it included (to know when to re-check)."""
+
+    def __init__(self, rel: str, key: str = "", errors: int = 0, warnings: int = 0, output: str = "",
+                 deps: Optional[Dict[str, list]] = None):
+        self.rel = rel
+        self.key = key  # hash of the flags it was checked with
+        self.errors = errors
+        self.warnings = warnings
+        self.output = output
+        self.deps = deps or {}  # {root-relative dep: [size, mtime_ns]}, the source itself included
+
+    @property
+    def badge(self) -> str:
+        parts = []
+        if self.errors:
+            parts.append(f"✖{self.errors}")
+        if self.warnings:
+            parts.append(f"⚠{self.warnings}")
+        return " ".join(parts)
+
+    def to_dict(self) -> dict:
+        return {"key": self.key, "errors": self.errors, "warnings": self.warnings, "output": self.output,
+                "deps": self.deps}
+
+    @classmethod
+    def from_dict(cls, rel: str, data: dict) -> "FileCheck":
+        return cls(rel, data.get("key", ""), data.get("errors", 0), data.get("warnings", 0),
+                   data.get("output", ""), data.get("deps", {}))
+
+
+def count_diagnostics(output: str):
+    """(errors, warnings) in g++ output; notes and "In function" context lines are not counted."""
+    errors = warnings = 0
+    for match in DIAGNOSTIC_RE.finditer(output):
+        if match.group("kind") == "warning":
+            warnings += 1
+        else:
+            errors += 1
+    return errors, warnings
+
+
+def check_flags(custom_options=None, language_standard: Optional[str] = None) -> List[str]:
+    """The build's compile flags; link-only flags are dropped, nothing else changes what the parser sees."""
+    flags = shelling.options_to_flags(custom_options)
+    if language_standard:
+        flags.append(f"-std={language_standard}")
+    return builder.split_flags(flags)[0]
+
+
+class SyntaxChecker:
+    """
+    Background "check" pass over a project: runs `g++ -fsyntax-only` (no code generation, no linking) on the
+    sources that changed since they were last checked, all in one WSL shell with up to `parallel` compilers at once.
+    A file is re-checked when it, a header it includes (from -MMD) or the flags changed.
+    State lives in <root>/.nopaste/check-state.json.
+    """
+
+    def __init__(self, root_directory: str, distro: Optional[str] = None):
+        self.root_directory = os.path.abspath(root_directory)
+        self.root_path = shelling.translate_paths([self.root_directory])[0]
+        self.distro = distro
+        self.results: Dict[str, FileCheck] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _state_path(self) -> str:
+        return os.path.join(self.root_directory, shelling.RESPONSE_DIR, STATE_FILE)
+
+    def _load(self):
+        try:
+            with open(self._state_path(), "r", encoding="utf-8") as handle:
+                data = json.load(handle)
+        except (OSError, ValueError):
+            return
+        if isinstance(data, dict):
+            self.results = {rel: FileCheck.from_dict(rel, entry) for rel, entry in data.items()
+                            if isinstance(entry, dict)}
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self._state_path()), exist_ok=True)
+        try:
+            with open(self._state_path(), "w", encoding="utf-8") as handle:
+                json.dump({rel: result.to_dict() for rel, result in self.results.items()}, handle)
+        except OSError as exc:
+            print(f"Failed to save the syntax check state: {exc}")
+
+    def relative(self, path: str) -> str:
+        return os.path.relpath(os.path.abspath(path), self.root_directory).replace("\\", "/")
+
+    def path_of(self, rel: str) -> str:
+        return os.path.normpath(os.path.join(self.root_directory, rel))
+
+    def _stat(self, rel: str):
+        try:
+            st = os.stat(os.path.join(self.root_directory, rel))
+        except OSError:
+            return None
+        return [st.st_size, st.st_mtime_ns]
+
+    def sources(self, sources: List[str]) -> List[str]:
+        """Root-relative .cpp files of `sources`, which may contain checked directories."""
+        return [self.relative(p) for p in shelling.expand_sources(sources) if p.endswith(shelling.SOURCE_EXTENSIONS)]
+
+    def changed(self, sources: List[str], flags: List[str]) -> List[str]:
+        """The root-relative sources that need checking."""
+        key = hashlib.sha1(" ".join(flags).encode("utf-8")).hexdigest()[:12]
+        stale = []
+        for rel in self.sources(sources):
+            previous = self.results.get(rel)
+            if previous is None or previous.key != key or not previous.deps or \
+                    any(self._stat(dep) != sig for dep, sig in previous.deps.items()):
+                stale.append(rel)
+        return stale
+
+    def check(self,
+              sources: List[str],
+              custom_options=None,
+              language_standard: Optional[str] = None,
+              parallel: Optional[int] = None,
+              force: bool = False,
+              on_result=None) -> List[FileCheck]:
+        """
+        Check the changed files (every file with force=True) and return their results; unchanged files keep
+        their last result (see self.results). on_result(FileCheck) is called from this thread as each file
+        finishes, so the first badges show up before the slowest file is done.
+        Raises CheckFailed when the shell exits non-zero or some files never report back; the files that did
+        report are saved, the others keep their previous state and are checked again next time.
+        """
+        flags = check_flags(custom_options, language_standard)
+        key = hashlib.sha1(" ".join(flags).encode("utf-8")).hexdigest()[:12]
+        rels = self.sources(sources) if force else self.changed(sources, flags)
+        if not rels:
+            return []
+        # stat before compiling: an edit made while g++ runs must trigger another check
+        before = {rel: self._stat(rel) for rel in rels}
+
+        marker = "@@NOPASTE-" + secrets.token_hex(4)
+        parallel = max(1, parallel or os.cpu_count() or 1)
+        flag_text = " ".join(shlex.quote(f) for f in flags)
+        lines = [f"cd {shlex.quote(self.root_path)} && T=$(mktemp -d) && trap 'rm -rf \"$T\"' EXIT || exit 1",
+                 f"chk() {{ g++ -fsyntax-only {flag_text} -IHeaders -ISources -MMD -MF \"$T/$1.d\" \"$2\" "
+                 f"> \"$T/$1.out\" 2>&1; rc=$?; "
+                 f"{{ echo '{marker} begin'; cat \"$T/$1.out\"; echo '{marker} deps'; cat \"$T/$1.d\" 2>/dev/null; "
+                 f"echo \"{marker} end $1 $rc\"; }} > \"$T/$1.msg\"; flock \"$T\" cat \"$T/$1.msg\"; }}"]
+        for index, rel in enumerate(rels):
+            lines.append(f"while [ $(jobs -rp | wc -l) -ge {parallel} ]; do wait -n; done; chk {index} {shlex.quote(rel)} &")
+        lines.append("wait")
+
+        job = jobs.Job(f"syntax check ({len(rels)} files)", distro=self.distro)
+        started = time.perf_counter()
+        proc = subprocess.Popen(shelling.wsl_args(job.wrap("\n".join(lines)), distro=self.distro),
+                                stdout=subprocess.PIPE, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL,
+                                text=True, errors="replace")
+        job.attach(proc)
+        checked = []
+        output: List[str] = []
+        deps: List[str] = []
+        stray: List[str] = []  # shell output outside a file's block: why the shell failed
+        target = stray
+        try:
+            for line in proc.stdout:
+                if line.startswith(marker + " begin"):
+                    output, deps = [], []
+                    target = output
+                    continue
+                if line.startswith(marker + " deps"):
+                    target = deps
+                    continue
+                if not line.startswith(marker + " end "):
+                    target.append(line)
+                    continue
+                target = stray
+                try:
+                    _end, index, rc = line[len(marker) + 1:].split()
+                    rel = rels[int(index)]
+                    rc = int(rc)
+                except (ValueError, IndexError):
+                    continue
+                text = "".join(output)
+                errors, warnings = count_diagnostics(text)
+                if rc != 0 and not errors:
+                    errors = 1  # g++ failed without a parsable diagnostic (missing file, bad flag, ...)
+                dep_rels = [d for d in builder.parse_depfile("".join(deps)) if not os.path.isabs(d)]
+                signatures = {dep: self._stat(dep) for dep in dep_rels if dep != rel}
+                signatures[rel] = before[rel]
+                result = FileCheck(rel, key, errors, warnings, text, signatures)
+                with self._lock:
+                    self.results[rel] = result
+                checked.append(result)
+                if on_result is not None:
+                    on_result(result)
+            returncode = proc.wait()
+        finally:
+            job.finish()
+            tracing.add_span("syntax check", "compile", started, time.perf_counter() - started, files=len(rels))
+        self._save()
+        reported = {result.rel for result in checked}
+        unchecked = [rel for rel in rels if rel not in reported]
+        if returncode != 0 or unchecked:
+            reason = "cancelled" if job.cancelled else f"shell exited with {returncode}"
+            detail = "".join(stray).strip()[-1000:]
+            raise CheckFailed(f"syntax check failed ({reason}); {len(unchecked)} file(s) not checked"
+                              + (f":\n{detail}" if detail else ""), checked, unchecked)
+        return checked
+
+
+def format_result(result: FileCheck) -> str:
+    status = result.badge or "ok"
+    return f"  {status:<8} {result.rel}"
@@ -0,0 +1,535 @@
+import argparse
+import contextlib
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import List, Optional
+
+import benchmark
+import bloat
+import capture
+import builder
+import check
+import cook_cpu
+import daemon
+import history
+import includes
+import judge
+import pgo
+import remote
+import sessions
+import shelling
+import testrun
+import tracing
+import tune
+from settings import SETTINGS_FILE, load_settings_file, save_settings_file
+
+
+class Project:
+    """The subset of settings.json a headless build needs."""
+
+    def __init__(self, data: dict):
+        self.root_directory = data.get("root_directory")
+        self.checked_paths = [p for p in data.get("checked_paths", []) if isinstance(p, str)]
+        self.cpp_standard = data.get("cpp_standard") or "c++17"
+        options = data.get("options", {})
+        self.options = {k: bool(v) for k, v in options.items()} if isinstance(options, dict) else {}
+        self.output_name = data.get("output_file_name") or "a.out"
+        self.linker = data.get("linker") or "default"
+        workers = data.get("remote_workers", [])
+        self.remote_workers = [w for w in workers if isinstance(w, str)] if isinstance(workers, list) else []
+        self.remote_token = data.get("remote_token")
+
+
+def load_project(args) -> Project:
+    data = load_settings_file(args.settings) or {}
+    project = Project(data)
+    if args.root:
+        project.root_directory = os.path.abspath(args.root)
+    if args.std:
+        project.cpp_standard = args.std
+    if args.output:
+        project.output_name = args.output
+    if args.sources:
+        project.checked_paths = [os.path.abspath(p) for p in args.sources]
+    if not project.root_directory or not os.path.isdir(project.root_directory):
+        raise SystemExit(f"No valid root directory (settings: {args.settings}); pass --root")
+    return project
+
+
+def cmd_compile(project: Project, args) -> int:
+    with background_load(args):
+        return compile_project(project, args)
+
+
+def compile_project(project: Project, args) -> int:
+    if not project.checked_paths:
+        print("No checked files in settings; pass --source")
+        return 2
+    if args.archives:
+        project.options[builder.ARCHIVE_OPTION] = True
+    started = time.perf_counter()
+
+    def record(mode: str, stats: dict, phases=None):
+        phases = {**history.phase_totals(started), **(phases or {})}
+        history.History(project.root_directory).record_build_result(
+            project.output_name, mode, stats, project.cpp_standard, project.options,
+            len(shelling.expand_sources(project.checked_paths)), phases)
+
+    if args.daemon:
+        reply = daemon.build(project.root_directory, project.checked_paths, project.options,
+                             project.cpp_standard, project.output_name, linker=project.linker,
+                             distro=args.distro, remote_workers=project.remote_workers,
+                             remote_token=project.remote_token, on_event=print)
+        if reply is None:
+            print("Could not reach the compile server")
+            return 1
+        record("daemon", reply, {"link": reply.get("link_seconds", 0.0)})
+        return 0 if reply.get("ok") else 1
+    if args.incremental:
+        build_project = builder.Project(project.root_directory, distro=args.distro)
+        build_project.use_remote_workers(project.remote_workers, project.remote_token)
+        result = build_project.build(project.checked_paths, custom_options=project.options,
+                                     language_standard=project.cpp_standard,
+                                     executable_name=project.output_name, linker=project.linker,
+                                     jobs=args.jobs, on_event=print)
+        record("incremental", result.stats())
+        return 0 if result.ok else 1
+    ok = shelling.compile_in_wsl(project.checked_paths,
+                                 distro=args.distro,
+                                 root_path=shelling.windows_to_wsl(project.root_directory),
+                                 custom_options=project.options,
+                                 language_standard=project.cpp_standard,
+                                 executable_name=project.output_name,
+                                 linker=project.linker,
+                                 inline=True,
+                                 root_directory=project.root_directory)
+    record("inline", {"ok": ok, "seconds": time.perf_counter() - started})
+    return 0 if ok else 1
+
+
+def cmd_run(project: Project, args) -> int:
+    runner = "valgrind --leak-check=full " if args.valgrind else ""
+    cmd = f"cd {shelling.windows_to_wsl(project.root_directory)} && {runner}./{project.output_name}"
+    store = history.History(project.root_directory)
+    if not args.capture:
+        start = time.perf_counter()
+        code = subprocess.call(shelling.wsl_args(cmd, distro=args.distro))
+        store.record_run(project.output_name, "valgrind" if args.valgrind else "terminal", code,
+                         time.perf_counter() - start)
+        return code
+    output = capture.new_capture(project.root_directory)
+    capture.run_captured(cmd, output, distro=args.distro, stdin_path=args.input)
+    store.record_run(project.output_name, "valgrind" if args.valgrind else "captured", output.returncode,
+                     output.seconds)
+    head = output.head(args.capture_bytes)
+    print(head.decode(errors="replace"), end="")
+    if output.total > len(head):
+        skipped = max(0, output.total - len(head) - args.capture_bytes)
+        if skipped:
+            print(f"\n... {capture.format_size(skipped)} not shown ...")
+        print(output.tail(min(args.capture_bytes, output.total - len(head))).decode(errors="replace"), end="")
+    print(f"\n[{capture.summary(output)}]")
+    output.close()
+    return output.returncode
+
+
+def background_load(args):
+    """A cook_cpu.LoadGenerator for --load/--load-workers/--load-memory, or a no-op context."""
+    if args.load is None and not args.load_memory:
+        return contextlib.nullcontext()
+    load = cook_cpu.LoadGenerator(utilization=args.load if args.load is not None else 0.0,
+                                  workers=args.load_workers, memory_mb=args.load_memory)
+    print(f"background load: {load.describe()}")
+    return load
+
+
+def add_load_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--load", type=float, metavar="UTIL",
+                        help="run under background CPU load, 0..1 per loaded core")
+    parser.add_argument("--load-workers", type=int, help="loaded cores (default: all)")
+    parser.add_argument("--load-memory", type=int, default=0, metavar="MB", help="memory held by the load")
+
+
+def session_input(project: Project, name: str) -> str:
+    path = sessions.stdin_path(project.root_directory, name)
+    if path is None:
+        raise SystemExit(f"No replayable session {name!r} (see `record`)")
+    return path
+
+
+def cmd_bench(project: Project, args) -> int:
+    if args.session:
+        args.input = session_input(project, args.session)
+    try:
+        with background_load(args):
+            times = benchmark.time_runs(project.root_directory, project.output_name, repeat=args.repeat,
+                                        stdin_path=args.input, distro=args.distro)
+    except RuntimeError as exc:
+        print(exc)
+        return 1
+    summary = benchmark.summarize(times)
+    print(benchmark.format_summary(summary))
+    if summary:
+        history.History(project.root_directory).record_run(project.output_name, "bench", 0, summary["median"],
+                                                           runs=len(times), min_seconds=summary["min"],
+                                                           detail={"times": times, "input": args.input})
+    return 0
+
+
+def cmd_judge(project: Project, args) -> int:
+    results = judge.run_judge(args.tests_dir, project.root_directory, executable_name=project.output_name,
+                              time_limit=args.time_limit, memory_limit_mb=args.memory_limit,
+                              distro=args.distro, jobs=args.jobs)
+    if not results:
+        print(f"No .in files found in {args.tests_dir}")
+        return 2
+    print(judge.format_report(results))
+    return 0 if all(r.status == "PASS" for r in results) else 1
+
+
+def cmd_pgo(project: Project, args) -> int:
+    if not project.checked_paths:
+        print("No checked files in settings; pass --source")
+        return 2
+    args.inputs = (args.inputs or []) + [session_input(project, name) for name in args.sessions or []]
+    result = pgo.run_pgo(project.checked_paths, project.root_directory, custom_options=project.options,
+                         language_standard=project.cpp_standard, executable_name=project.output_name,
+                         training_inputs=args.inputs, linker=project.linker, lto=args.lto,
+                         repeat=args.repeat, distro=args.distro)
+    return 0 if result.ok else 1
+
+
+def cmd_tune(project: Project, args) -> int:
+    if not project.checked_paths:
+        print("No checked files in settings; pass --source")
+        return 2
+    results = tune.run_tune(project.checked_paths, project.root_directory, project.options, project.cpp_standard,
+                            executable_name=project.output_name, stdin_path=args.input, repeat=args.repeat,
+                            distro=args.distro, jobs=args.jobs,
+                            on_result=lambda r: print(f"benchmarked {r.variant}"))
+    print(tune.format_table(results))
+    if not results or not results[0].ok:
+        return 1
+    if args.save:
+        best = tune.winner(results)
+        if best is None:
+            print("Not saving an option profile without a clear winner")
+            return 0
+        data = load_settings_file(args.settings) or {}
+        data["options"] = dict(data.get("options") or {}, **best.options)
+        save_settings_file(data, args.settings)
+        print(f"Saved {best.variant} as the option profile in {args.settings}")
+    return 0
+
+
+def cmd_size(project: Project, args) -> int:
+    try:
+        snapshot = bloat.collect(project.root_directory, project.output_name, distro=args.distro,
+                                 lines=args.lines or args.by == "file")
+    except RuntimeError as exc:
+        print(exc)
+        return 1
+    print(f"{project.output_name}: {capture.format_size(snapshot.total)} in {len(snapshot.symbols)} symbols")
+    if args.diff:
+        old = bloat.load_snapshot(project.root_directory, args.diff)
+        if old is None:
+            return 1
+        print(f"change since {args.diff}: {capture.format_size(snapshot.total - old.total)}")
+        for name, size, delta in bloat.diff(old, snapshot, args.by)[:args.top]:
+            print(f"{'+' if delta > 0 else '-'}{capture.format_size(abs(delta)):>10}  {capture.format_size(size):>10}  {name}")
+    else:
+        for name, size, count in bloat.ranked(bloat.group(snapshot, args.by), args.top):
+            print(f"{capture.format_size(size):>10}  {count:6}  {name}")
+    if args.save:
+        print(f"Saved snapshot to {bloat.save_snapshot(snapshot, project.root_directory, args.save)}")
+    return 0
+
+
+def cmd_includes(project: Project, args) -> int:
+    if not project.checked_paths:
+        print("No checked files in settings; pass --source")
+        return 2
+    try:
+        report = includes.analyze(project.root_directory, project.checked_paths, project.options,
+                                  project.cpp_standard, parallel=args.jobs, distro=args.distro)
+    except RuntimeError as exc:
+        print(exc)
+        return 1
+    for tu in report.tus:
+        if not tu.ok:
+            print(f"{tu.rel} failed to preprocess:\n{tu.output}")
+    print(f"{len(report.tus)} TUs, {capture.format_size(report.total_bytes)} preprocessed, "
+          f"{len(report.headers)} headers")
+    print(f"{'total':>10}  {'own':>10}  {'TUs':>5}  {'opened':>6}  header")
+    for cost in report.ranked(args.by, args.top):
+        print(includes.format_row(cost))
+    if report.suggestions:
+        print("\nSuggestions:")
+        for suggestion in report.suggestions[:args.top]:
+            print(f"  {suggestion}")
+    return 0 if all(tu.ok for tu in report.tus) else 1
+
+
+def cmd_record(project: Project, args) -> int:
+    name = args.name or sessions.new_session_name()
+    cmd = sessions.record_command(project.root_directory, project.output_name, name)
+    code = subprocess.call(shelling.wsl_args(cmd, distro=args.distro))
+    if sessions.finalize(project.root_directory, name):
+        print(f"Recorded session {name}")
+    return code
+
+
+def cmd_replay(project: Project, args) -> int:
+    names = sessions.list_sessions(project.root_directory) if args.all else [args.name]
+    if not args.all and not args.name:
+        names = sessions.list_sessions(project.root_directory)[:1]
+    if not names:
+        print("No recorded sessions")
+        return 2
+    ok = True
+    for name in names:
+        result = sessions.replay(project.root_directory, name, project.output_name, distro=args.distro,
+                                 timeout=args.timeout)
+        if result is None:
+            ok = False
+            continue
+        print(result.summary())
+        if not result.matches:
+            ok = False
+            print(result.diff())
+    return 0 if ok else 1
+
+
+def cmd_test(project: Project, args) -> int:
+    if args.failed:
+        cases = testrun.load_failed(project.root_directory)
+        if not cases:
+            print("No failed tests recorded")
+            return 0
+    else:
+        binaries = args.binaries or testrun.find_test_binaries(project.root_directory, extra=[project.output_name],
+                                                               distro=args.distro)
+        if not binaries:
+            print("No test executables found")
+            return 2
+        cases = testrun.list_cases(project.root_directory, binaries, distro=args.distro)
+    if args.filter:
+        cases = [case for case in cases if args.filter in case.label]
+    print(f"Running {len(cases)} test case(s)")
+    results = testrun.run_tests(cases, project.root_directory, parallel=args.jobs, timeout=args.timeout,
+                                distro=args.distro, on_result=lambda r: print(testrun.format_result(r)),
+                                merge_failed=bool(args.filter))
+    print(testrun.format_report(results))
+    if results:
+        history.History(project.root_directory).record_tests(results)
+    return 0 if all(r.status == "PASS" for r in results) else 1
+
+
+def cmd_check(project: Project, args) -> int:
+    if not project.checked_paths:
+        print("No checked files in settings; pass --source")
+        return 2
+    checker = check.SyntaxChecker(project.root_directory, distro=args.distro)
+    try:
+        results = checker.check(project.checked_paths, project.options, project.cpp_standard, parallel=args.jobs,
+                                force=args.all, on_result=lambda r: print(check.format_result(r)))
+    except check.CheckFailed as exc:
+        print(exc)
+        for rel in exc.unchecked:
+            print(f"  {'unchecked':<8} {rel}")
+        return 1
+    if not results:
+        print("Nothing changed since the last check")
+    for result in results:
+        if result.output.strip():
+            print(result.output.rstrip())
+    errors = sum(checker.results[rel].errors for rel in checker.sources(project.checked_paths)
+                 if rel in checker.results)
+    print(f"{errors} error(s) in the checked files")
+    return 1 if errors else 0
+
+
+def cmd_history(project: Project, args) -> int:
+    store = history.History(project.root_directory)
+    builds, runs = store.builds(limit=args.limit), store.runs(limit=args.limit)
+    if not builds and not runs:
+        print(f"No builds or runs recorded in {store.path}")
+        return 0
+    build_change, run_change = store.trend(builds), store.trend(runs)
+    print("Builds (newest first):")
+    for record in builds:
+        print("  " + history.format_build(record, build_change.get(record["id"])))
+    print("Runs (newest first):")
+    for record in runs:
+        print("  " + history.format_run(record, run_change.get(record["id"])))
+    regressions = store.regressions(args.build_threshold, args.run_threshold)
+    print(f"\n{len(regressions)} regression(s)" + (":" if regressions else ""))
+    for regression in regressions:
+        print(f"  {regression}")
+    return 1 if regressions and args.check else 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="nopaste", description="NoPaste headless build")
+    parser.add_argument("--settings", default=SETTINGS_FILE, help="settings.json written by the GUI")
+    parser.add_argument("--root", help="project root (overrides settings)")
+    parser.add_argument("--std", help="c++ standard, e.g. c++20 (overrides settings)")
+    parser.add_argument("--output", help="output binary name (overrides settings)")
+    parser.add_argument("--source", action="append", dest="sources",
+                        help="file/directory to compile, repeatable (overrides checked paths)")
+    parser.add_argument("--distro", help="WSL distro name")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="write a Chrome trace (chrome://tracing, ui.perfetto.dev) of the command to FILE "
+                             "and print a span summary")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    compile_p = sub.add_parser("compile", help="compile the checked sources")
+    compile_p.add_argument("--daemon", action="store_true",
+                           help="incremental build through the compile server (started if needed)")
+    compile_p.add_argument("--incremental", action="store_true",
+                           help="incremental per-file build in this process (uses remote_workers from settings)")
+    compile_p.add_argument("--jobs", type=int, help="parallel compile jobs for --incremental")
+    compile_p.add_argument("--archives", action="store_true",
+                           help="with --incremental/--daemon: build each checked directory into a cached .a")
+    add_load_arguments(compile_p)
+
+    daemon_p = sub.add_parser("daemon", help="run the compile server in the foreground")
+    daemon_p.add_argument("--jobs", type=int)
+    daemon_p.add_argument("--stop", action="store_true", help="stop the running server")
+    daemon_p.add_argument("--status", action="store_true", help="show the running server's state")
+
+    worker_p = sub.add_parser("worker", help="run a remote compile worker endpoint")
+    worker_p.add_argument("--host", default="127.0.0.1", help="use 0.0.0.0 to accept other hosts")
+    worker_p.add_argument("--port", type=int, default=remote.DEFAULT_PORT)
+    worker_p.add_argument("--token", help=f"shared secret (default: ${remote.TOKEN_ENV})")
+    worker_p.add_argument("--jobs", type=int)
+
+    check_p = sub.add_parser("check", help="g++ -fsyntax-only on the sources changed since the last check")
+    check_p.add_argument("--all", action="store_true", help="check every source, changed or not")
+    check_p.add_argument("--jobs", type=int, help="parallel compilers")
+
+    run_p = sub.add_parser("run", help="run the output binary in this console")
+    run_p.add_argument("--valgrind", action="store_true")
+    run_p.add_argument("--capture", action="store_true", help="capture output with bounded memory, print head and tail")
+    run_p.add_argument("--capture-bytes", type=int, default=capture.READ_CHUNK, help="head/tail size with --capture")
+    run_p.add_argument("--input", help="stdin file with --capture")
+
+    bench_p = sub.add_parser("bench", help="time repeated runs of the output binary")
+    bench_p.add_argument("--repeat", type=int, default=5)
+    bench_p.add_argument("--input", help="file fed to stdin on every run")
+    bench_p.add_argument("--session", help="use a recorded session's input as stdin")
+    add_load_arguments(bench_p)
+
+    pgo_p = sub.add_parser("pgo", help="profile-guided build, timed against the normal build")
+    pgo_p.add_argument("--input", action="append", dest="inputs", help="training input for stdin (repeatable)")
+    pgo_p.add_argument("--session", action="append", dest="sessions", help="recorded session as training input")
+    pgo_p.add_argument("--lto", action="store_true", help="also link-time optimize the final build")
+    pgo_p.add_argument("--repeat", type=int, default=5, help="timed runs per input")
+
+    tune_p = sub.add_parser("tune", help="build and benchmark optimization variants, fastest first")
+    tune_p.add_argument("--input", help="representative input for stdin")
+    tune_p.add_argument("--repeat", type=int, default=5, help="timed runs per variant")
+    tune_p.add_argument("--jobs", type=int, help="parallel variant builds")
+    tune_p.add_argument("--save", action="store_true", help="store the winner's options in the settings file")
+
+    size_p = sub.add_parser("size", help="what makes the output binary large")
+    size_p.add_argument("--by", choices=bloat.GROUPINGS, default="namespace")
+    size_p.add_argument("--lines", action="store_true",
+                        help="attribute symbols to source files (nm -l, slow on large binaries); implied by --by file")
+    size_p.add_argument("--top", type=int, default=30)
+    size_p.add_argument("--save", metavar="LABEL", help="keep this build's sizes for a later --diff")
+    size_p.add_argument("--diff", metavar="LABEL", help="compare with a saved snapshot (label or .json path)")
+
+    test_p = sub.add_parser("test", help="run test executables (GoogleTest/Catch2 cases split out) in parallel")
+    test_p.add_argument("binaries", nargs="*", help="root-relative test binaries (default: discover *test*)")
+    test_p.add_argument("--jobs", type=int)
+    test_p.add_argument("--timeout", type=float, default=testrun.DEFAULT_TIMEOUT, help="seconds per case")
+    test_p.add_argument("--failed", action="store_true", help="re-run only the cases that failed last time")
+    test_p.add_argument("--filter", help="only cases whose name contains this")
+
+    includes_p = sub.add_parser("includes", help="which headers cost the most preprocessed code, and what to drop")
+    includes_p.add_argument("--by", choices=("bytes", "count", "own"), default="bytes",
+                            help="rank by total bytes pulled in, number of TUs, or the header's own bytes")
+    includes_p.add_argument("--top", type=int, default=includes.DEFAULT_TOP)
+    includes_p.add_argument("--jobs", type=int)
+
+    history_p = sub.add_parser("history", help="recorded builds and runs, and which got slower")
+    history_p.add_argument("--limit", type=int, default=20, help="builds and runs to list")
+    history_p.add_argument("--build-threshold", type=float, default=history.BUILD_THRESHOLD,
+                           help="flag a build this much slower than its baseline (0.2 = 20%%)")
+    history_p.add_argument("--run-threshold", type=float, default=history.RUN_THRESHOLD,
+                           help="flag a run this much slower than its baseline")
+    history_p.add_argument("--check", action="store_true", help="exit with 1 when something regressed")
+
+    record_p = sub.add_parser("record", help="run the binary interactively and record the session")
+    record_p.add_argument("--name", help="session name (default: session-<timestamp>)")
+
+    replay_p = sub.add_parser("replay", help="re-run recorded sessions and diff the output")
+    replay_p.add_argument("name", nargs="?", help="session name (default: the newest)")
+    replay_p.add_argument("--all", action="store_true", help="replay every recorded session")
+    replay_p.add_argument("--timeout", type=float)
+
+    judge_p = sub.add_parser("judge", help="run against a directory of .in/.out files")
+    judge_p.add_argument("tests_dir")
+    judge_p.add_argument("--time-limit", type=float, default=judge.DEFAULT_TIME_LIMIT)
+    judge_p.add_argument("--memory-limit", type=int, default=judge.DEFAULT_MEMORY_LIMIT_MB, help="MB")
+    judge_p.add_argument("--jobs", type=int)
+    return parser
+
+
+COMMANDS = {
+    "compile": cmd_compile,
+    "check": cmd_check,
+    "run": cmd_run,
+    "bench": cmd_bench,
+    "pgo": cmd_pgo,
+    "tune": cmd_tune,
+    "size": cmd_size,
+    "includes": cmd_includes,
+    "judge": cmd_judge,
+    "test": cmd_test,
+    "history": cmd_history,
+    "record": cmd_record,
+    "replay": cmd_replay,
+}
+
+
+def cmd_daemon(args) -> int:
+    if args.stop or args.status:
+        reply = daemon.request({"op": "shutdown" if args.stop else "status"}, timeout=daemon.CONNECT_TIMEOUT)
+        if reply is None:
+            print("Compile server is not running")
+            return 1
+        print(json.dumps(reply, indent=2))
+        return 0
+    daemon.serve(jobs=args.jobs)
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.command == "daemon":
+        return cmd_daemon(args)
+    if args.command == "worker":
+        try:
+            remote.serve_worker(args.host, args.port, token=args.token, jobs=args.jobs, distro=args.distro)
+        except ValueError as exc:
+            print(exc)
+            return 2
+        return 0
+    project = load_project(args)
+    if not args.trace:
+        return COMMANDS[args.command](project, args)
+    try:
+        with tracing.span(args.command, "cli"):
+            return COMMANDS[args.command](project, args)
+    finally:
+        print(tracing.format_summary())
+        print(f"{tracing.export_chrome_trace(args.trace)} span(s) written to {args.trace}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
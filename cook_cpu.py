@@ -1,22 +1,36 @@
-import psutil
-import time
+import argparse
+import multiprocessing
 import os
-import math
-import random
-from threading import Thread
+import time
+from typing import Optional
+
+try:
+    import psutil
+except ImportError:  # only needed for get_telly
+    psutil = None
+
+PERIOD = 0.05  # duty-cycle period in seconds: busy for utilization * PERIOD, then sleep
+PAGE = 4096
+MAX_WORKERS_PER_CORE = 4
 
 
-def get_telly():
+def get_telly(stop: Optional[multiprocessing.Event] = None, interval: float = 1.0):
+    if psutil is None:
+        print("get_telly needs psutil (pip install psutil)")
+        return
     process = psutil.Process(os.getpid())
-    while True:
+    while stop is None or not stop.is_set():
         cpu_temp = "N/A"
         total_cpu_usage = psutil.cpu_percent(interval=0.2)
 
-        # CPU usage of this program
+        # CPU usage of this program (including load workers)
         proc_cpu = process.cpu_percent(interval=0.1)
+        proc_cpu += sum(child.cpu_percent(interval=None) for child in process.children(recursive=True))
 
-        # RAM usage of this program
-        mem_usage = process.memory_info().rss / (1024 * 1024)  # MB
+        # RAM usage of this program (including load workers)
+        mem_usage = process.memory_info().rss
+        mem_usage += sum(child.memory_info().rss for child in process.children(recursive=True))
+        mem_usage /= 1024 * 1024  # MB
 
         print("========== System Stats ==========")
         print(f"CPU Temperature: {cpu_temp} °C")
@@ -25,22 +39,104 @@ def get_telly():
         print(f"This Program Memory Usage: {mem_usage:.2f} MB")
         print("==================================\n")
 
-        time.sleep(1)
+        time.sleep(interval)
+
+
+def _burn(utilization: float, deadline: Optional[float], stop: multiprocessing.Event):
+    """Keep one core at `utilization` (0..1) by spinning for part of every PERIOD and sleeping the rest."""
+    busy = PERIOD * utilization
+    n = 1.0
+    while not stop.is_set() and (deadline is None or time.time() < deadline):
+        start = time.perf_counter()
+        while time.perf_counter() - start < busy:
+            n = n / n + 1.0
+        idle = PERIOD - (time.perf_counter() - start)
+        if idle > 0:
+            time.sleep(idle)
+
+
+def _hold_memory(megabytes: int, deadline: Optional[float], stop: multiprocessing.Event):
+    """Allocate `megabytes` and touch every page so it is resident, then keep it until stopped."""
+    block = bytearray(megabytes * 1024 * 1024)
+    for i in range(0, len(block), PAGE):
+        block[i] = 1
+    while not stop.is_set() and (deadline is None or time.time() < deadline):
+        stop.wait(0.2)
+    del block
+
+
+class LoadGenerator:
+    """
+    Controlled background load for benchmarking on a busy machine:
+    - workers: number of busy processes (default: one per core, capped at MAX_WORKERS_PER_CORE per core)
+    - utilization: target load of each worker's core, 0..1
+    - duration: seconds before the load stops by itself (None: until stop())
+    - memory_mb: resident memory held by an extra process, for memory pressure
+    Processes are used because threads would share one core under the GIL.
+    """
+
+    def __init__(self, utilization: float = 1.0, workers: Optional[int] = None,
+                 duration: Optional[float] = None, memory_mb: int = 0):
+        cores = os.cpu_count() or 1
+        self.utilization = min(1.0, max(0.0, utilization))
+        self.workers = max(0, min(workers if workers is not None else cores, cores * MAX_WORKERS_PER_CORE))
+        self.duration = duration
+        self.memory_mb = max(0, int(memory_mb))
+        self._stop = multiprocessing.Event()
+        self._procs = []
+
+    def start(self):
+        deadline = time.time() + self.duration if self.duration else None
+        self._stop.clear()
+        for _ in range(self.workers):
+            self._procs.append(multiprocessing.Process(target=_burn, args=(self.utilization, deadline, self._stop),
+                                                       daemon=True))
+        if self.memory_mb:
+            self._procs.append(multiprocessing.Process(target=_hold_memory,
+                                                       args=(self.memory_mb, deadline, self._stop), daemon=True))
+        for proc in self._procs:
+            proc.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        for proc in self._procs:
+            proc.join(timeout=2)
+            if proc.is_alive():
+                proc.terminate()
+        self._procs = []
+
+    def wait(self):
+        for proc in self._procs:
+            proc.join()
 
+    def __enter__(self):
+        return self.start()
 
-def feet():
-    n = random.random()
-    print("start: ", n)
-    while True:
-        n = n / n
-        # math.pow(n, n)
-        print("n: ", n)
+    def __exit__(self, *_exc):
+        self.stop()
 
-# Thread(target=get_telly).start()
+    def describe(self) -> str:
+        text = f"{self.workers} worker(s) at {self.utilization:.0%}"
+        if self.memory_mb:
+            text += f", holding {self.memory_mb} MB"
+        return text
 
 
-thread_count = 0
-while thread_count < 10000000:
-    thread_count += 1
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    parser = argparse.ArgumentParser(description="CPU/memory load generator")
+    parser.add_argument("--utilization", type=float, default=1.0, help="per-core load, 0..1")
+    parser.add_argument("--workers", type=int, help="busy processes (default: one per core)")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds")
+    parser.add_argument("--memory-mb", type=int, default=0)
+    parser.add_argument("--telly", action="store_true", help="print CPU/RAM stats while loading")
+    args = parser.parse_args()
 
-    Thread(target=feet).start()
+    load = LoadGenerator(args.utilization, args.workers, args.duration, args.memory_mb)
+    print("load:", load.describe())
+    with load:
+        if args.telly:
+            import threading
+            threading.Thread(target=get_telly, args=(load._stop,), daemon=True).start()
+        load.wait()
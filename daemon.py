@@ -0,0 +1,222 @@
+import json
+import os
+import secrets
+import socket
+import socketserver
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+
+import builder
+
+STATE_DIR = os.path.join(os.path.expanduser("~"), ".nopaste")
+DAEMON_FILE = os.path.join(STATE_DIR, "daemon.json")
+HOST = "127.0.0.1"
+CONNECT_TIMEOUT = 2.0
+START_TIMEOUT = 10.0
+
+
+class CompileServer(socketserver.ThreadingTCPServer):
+    """
+    Keeps builder.Project objects (file index, dependency graph, object cache metadata) warm between
+    builds and runs every client's compile jobs on one shared worker pool.
+    Protocol: one JSON request per line; the reply is a stream of JSON lines ending with {"event": "done"}.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, jobs: Optional[int] = None):
+        super().__init__((HOST, 0), RequestHandler)
+        self.token = secrets.token_hex(16)
+        self.jobs = jobs or os.cpu_count() or 1
+        self.pool = ThreadPoolExecutor(max_workers=self.jobs)
+        self.projects: Dict[str, builder.Project] = {}
+        self.projects_lock = threading.Lock()
+        self.started = time.time()
+        self.builds = 0
+
+    def project(self, root_directory: str, distro: Optional[str]) -> builder.Project:
+        key = os.path.normcase(os.path.abspath(root_directory)) + "|" + (distro or "")
+        with self.projects_lock:
+            if key not in self.projects:
+                self.projects[key] = builder.Project(root_directory, distro=distro)
+            return self.projects[key]
+
+    def write_state_file(self):
+        os.makedirs(STATE_DIR, exist_ok=True)
+        with open(DAEMON_FILE, "w", encoding="utf-8") as handle:
+            json.dump({"port": self.server_address[1], "token": self.token, "pid": os.getpid()}, handle)
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    def setup(self):
+        super().setup()
+        # build events come from the shared pool's threads; the writer is unbuffered, one sendall per call
+        self.send_lock = threading.Lock()
+
+    def send(self, message: dict):
+        data = (json.dumps(message) + "\n").encode("utf-8")
+        with self.send_lock:
+            self.wfile.write(data)
+            self.wfile.flush()
+
+    def handle(self):
+        line = self.rfile.readline()
+        try:
+            request = json.loads(line)
+        except (ValueError, UnicodeDecodeError):
+            self.send({"event": "done", "ok": False, "error": "bad request"})
+            return
+        if request.get("token") != self.server.token:
+            self.send({"event": "done", "ok": False, "error": "bad token"})
+            return
+
+        op = request.get("op")
+        try:
+            if op == "ping":
+                self.send({"event": "done", "ok": True, "pid": os.getpid()})
+            elif op == "status":
+                self.send({"event": "done", "ok": True, "projects": len(self.server.projects),
+                           "builds": self.server.builds, "uptime": time.time() - self.server.started})
+            elif op == "build":
+                self.handle_build(request)
+            elif op == "shutdown":
+                self.send({"event": "done", "ok": True})
+                threading.Thread(target=self.server.shutdown, daemon=True).start()
+            else:
+                self.send({"event": "done", "ok": False, "error": f"unknown op {op!r}"})
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def handle_build(self, request: dict):
+        project = self.server.project(request["root_directory"], request.get("distro"))
+        project.use_remote_workers(request.get("remote_workers"), request.get("remote_token"))
+        self.server.builds += 1
+
+        def on_event(text):
+            try:
+                self.send({"event": "log", "text": text})
+            except OSError:
+                pass
+
+        try:
+            result = project.build(request.get("sources", []),
+                                   custom_options=request.get("options") or {},
+                                   language_standard=request.get("cpp_standard"),
+                                   executable_name=request.get("output_file_name") or "a.out",
+                                   linker=request.get("linker"),
+                                   pool=self.server.pool,
+                                   jobs=self.server.jobs,
+                                   on_event=on_event)
+        except Exception as exc:
+            # the client would otherwise wait for a "done" that never comes
+            error = f"Build failed inside the compile server: {type(exc).__name__}: {exc}"
+            print(error)
+            self.send({"event": "done", "ok": False, "output": error})
+            return
+        self.send({"event": "done", "summary": result.summary(), **result.stats()})
+
+
+def serve(jobs: Optional[int] = None):
+    server = CompileServer(jobs=jobs)
+    server.write_state_file()
+    print(f"NoPaste compile server listening on {HOST}:{server.server_address[1]} (pid {os.getpid()})")
+    try:
+        server.serve_forever()
+    finally:
+        server.pool.shutdown(wait=False)
+        try:
+            with open(DAEMON_FILE, "r", encoding="utf-8") as handle:
+                if json.load(handle).get("pid") == os.getpid():
+                    os.remove(DAEMON_FILE)
+        except (OSError, ValueError):
+            pass
+
+
+# --- client side ---------------------------------------------------------------------------------
+
+def _read_state() -> Optional[dict]:
+    try:
+        with open(DAEMON_FILE, "r", encoding="utf-8") as handle:
+            return json.load(handle)
+    except (OSError, ValueError):
+        return None
+
+
+def request(message: dict, on_event=None, timeout: Optional[float] = None) -> Optional[dict]:
+    """
+    Send one request to the running daemon; log events go to on_event(text).
+    Returns the final "done" message, or None if no daemon is reachable.
+    """
+    state = _read_state()
+    if not state:
+        return None
+    try:
+        sock = socket.create_connection((HOST, state["port"]), timeout=CONNECT_TIMEOUT)
+    except (OSError, KeyError):
+        return None
+    with sock:
+        sock.settimeout(timeout)
+        sock.sendall((json.dumps(dict(message, token=state.get("token"))) + "\n").encode("utf-8"))
+        for line in sock.makefile("r", encoding="utf-8"):
+            reply = json.loads(line)
+            if reply.get("event") == "log":
+                if on_event is not None:
+                    on_event(reply.get("text", ""))
+            elif reply.get("event") == "done":
+                return reply
+    return None
+
+
+def is_running() -> bool:
+    reply = request({"op": "ping"}, timeout=CONNECT_TIMEOUT)
+    return bool(reply and reply.get("ok"))
+
+
+def start_background() -> bool:
+    """Start a detached daemon (`run.py daemon`) unless one is already answering."""
+    if is_running():
+        return True
+    if getattr(sys, 'frozen', False):
+        args = [sys.executable, "daemon"]
+    else:
+        args = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "run.py"), "daemon"]
+    kwargs = {"stdin": subprocess.DEVNULL, "stdout": subprocess.DEVNULL, "stderr": subprocess.DEVNULL}
+    if os.name == "nt":
+        kwargs["creationflags"] = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        kwargs["start_new_session"] = True
+    subprocess.Popen(args, close_fds=True, **kwargs)
+
+    deadline = time.time() + START_TIMEOUT
+    while time.time() < deadline:
+        if is_running():
+            return True
+        time.sleep(0.1)
+    return False
+
+
+def build(root_directory: str, sources, options: dict, cpp_standard: Optional[str], output_file_name: str,
+          linker: Optional[str] = None, distro: Optional[str] = None, remote_workers=None,
+          remote_token: Optional[str] = None, on_event=None) -> Optional[dict]:
+    """Ask the daemon (starting it if needed) to build; returns the final reply or None."""
+    if not start_background():
+        return None
+    reply = request({
+        "op": "build",
+        "root_directory": root_directory,
+        "sources": list(sources),
+        "options": options,
+        "cpp_standard": cpp_standard,
+        "output_file_name": output_file_name,
+        "linker": linker,
+        "distro": distro,
+        "remote_workers": list(remote_workers or []),
+        "remote_token": remote_token,
+    }, on_event=on_event)
+    if reply is not None and reply.get("output") and on_event is not None:
+        on_event(reply["output"])
+    return reply
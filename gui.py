@@ -0,0 +1,1731 @@
+import os
+import tkinter as tk
+from tkinter import ttk, filedialog, messagebox, simpledialog
+import threading
+import time
+from typing import Optional
+
+import shelling
+import tracing
+from settings import PROGRAM_BASE_PATH, SETTINGS_FILE, load_settings_file, save_settings_file
+
+# Folder/file icons (using Unicode symbols)
+FOLDER_ICON = "📁"
+FILE_ICON = "📄"
+CHECKED_BOX = "☑"
+UNCHECKED_BOX = "☐"
+CHECK_INTERVAL_MS = 1500  # how often the "Syntax check" option looks for changed files
+STATUS_POLL_MS = 500  # how often a build/run in a terminal window is checked for its status file
+STATUS_WAIT_MS = 12 * 60 * 60 * 1000  # stop waiting for a terminal window after this long
+
+# Colors
+BG = "#07050b"  # (#110d1b) very dark with slight purple tint
+ACCENT = "#4b1168"  # dark purple accent
+CARD = "#0f0813"  # slightly lighter card background
+FG = "#e9e6f1"  # light foreground
+
+FONT_TITLE = ("Segoe UI", 12, "bold")
+FONT_LABEL = ("Segoe UI", 10)
+FONT_BUTTON = ("Segoe UI", 10, "bold")
+
+
+
+class MyApp(tk.Tk):
+    def __init__(self):
+        super().__init__()
+        self.title("NoPaste C++ Compiler")
+        self.configure(bg=BG)
+        self.geometry("900x560")
+        self.minsize(820, 480)
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+
+        self.settings_path = SETTINGS_FILE
+        self._loading_settings = False
+        self._pending_tree = None  # (root_dir, checked_paths) until the deferred restore runs
+        self._popup_styles_ready = False
+        self.script_available = None  # `script` in WSL, probed after first paint; False disables "record session"
+
+        with tracing.phase("styles"):
+            self._configure_styles()
+        with tracing.phase("widgets"):
+            self._build_widgets()
+        with tracing.phase("settings"):
+            self.load_settings()
+
+        # everything below is not needed for the first frame
+        self.after_idle(lambda: self.after(0, self._after_first_paint))
+
+    def _configure_styles(self):
+        style = ttk.Style(self)
+        try:
+            style.theme_use("clam")
+        except Exception:
+            pass
+
+        # General ttk styles
+        style.configure("TFrame", background=BG)
+        style.configure("Card.TFrame", background=CARD, borderwidth=1, relief="flat")
+
+        # Buttons
+        style.configure("Accent.TButton", background=ACCENT, foreground=FG, font=FONT_BUTTON, relief="flat")
+        style.map("Accent.TButton",
+                  background=[('active', ACCENT)],
+                  foreground=[('disabled', '#777')])
+
+        style.configure("Card.TButton", background=CARD, foreground=FG, font=FONT_BUTTON, relief="flat")
+        style.map("Card.TButton",
+                  background=[('active', CARD)],
+                  foreground=[('disabled', '#777')])
+
+        # Entry / Combobox
+        style.configure("Card.TEntry", fieldbackground=CARD, foreground=FG)
+        style.configure("TCombobox", fieldbackground=CARD, background=CARD, foreground=FG,
+                        selectbackground=CARD, selectforeground=FG)
+        style.map("TCombobox",
+                  fieldbackground=[('readonly', CARD)],
+                  selectbackground=[('readonly', CARD)],
+                  selectforeground=[('readonly', FG)])
+
+        # Scrollbar
+        style.element_create("Custom.Vertical.Scrollbar.trough", "from", "clam")
+        style.configure("Vertical.TScrollbar", troughcolor=CARD, background=ACCENT, bordercolor=CARD, arrowcolor=FG,
+                        gripcount=0)
+
+        # Treeview (file explorer)
+        style.configure(
+            "NoPaste.Treeview",
+            background=CARD,
+            fieldbackground=CARD,
+            foreground=FG,
+            bordercolor=BG,
+            borderwidth=0,
+            rowheight=26,
+            font=FONT_LABEL
+        )
+        style.map(
+            "NoPaste.Treeview",
+            background=[('selected', ACCENT)],
+            foreground=[('selected', FG)]
+        )
+        # Labels
+        style.configure("TLabel", background=BG, foreground=FG, font=FONT_LABEL)
+        style.configure("Card.TLabel", background=CARD, foreground=FG, font=FONT_LABEL)
+
+    def _configure_popup_styles(self):
+        """Styles only used by popups; configured the first time one opens."""
+        if self._popup_styles_ready:
+            return
+        self._popup_styles_ready = True
+        style = ttk.Style(self)
+
+        # Checkbutton
+        style.configure("Card.TCheckbutton", background=CARD, foreground=FG)
+        style.map("Card.TCheckbutton",
+                  background=[('active', CARD)])
+
+        # Folder/File labels with hover effect
+        style.configure("Folder.TLabel", background=CARD, foreground=FG, font=FONT_LABEL)
+        style.map("Folder.TLabel",
+                  background=[('active', CARD)],
+                  foreground=[('active', 'white')])
+
+        # Treeview headings (the file tree hides them)
+        style.configure("NoPaste.Treeview.Heading", background=ACCENT, foreground=FG, font=FONT_BUTTON, borderwidth=0)
+
+    def _build_widgets(self):
+        # Top title bar
+        # title_bar = ttk.Frame(self, style="Card.TFrame")
+        # title_bar.pack(fill="x", padx=10, pady=10)
+        # title_label = ttk.Label(title_bar, text="NoPaste", font=("Segoe UI", 14, "bold"), background=CARD, foreground=FG)
+        # title_label.pack(side="left", padx=8, pady=6)
+
+        # main area
+        main = ttk.Frame(self)
+        main.pack(fill="both", expand=True, padx=12, pady=(0, 12))
+
+        # Left column: Select directory and file tree
+        left = ttk.Frame(main)
+        left.pack(side="left", fill="y", padx=(0, 12), pady=6)
+
+        select_btn = ttk.Button(left, text="Select directory", command=self.select_directory, style="Card.TButton")
+        select_btn.pack(anchor="nw", pady=(6, 10))
+
+        self.file_tree_card = ttk.Frame(left, style="Card.TFrame")
+        self.file_tree_card.pack(fill="both", expand=True, ipadx=6, ipady=6)
+        self.file_tree_card.configure(width=360, height=420)
+
+        self.tree = ttk.Treeview(
+            self.file_tree_card,
+            columns=("path", "type"),
+            show="tree",
+            selectmode="extended",
+            style="NoPaste.Treeview"
+        )
+        self.tree.heading("#0", text="Project files", anchor="w")
+        self.tree.column("#0", stretch=True)
+        self.tree.column("path", width=0, stretch=False)
+        self.tree.column("type", width=0, stretch=False)
+
+        tree_scrollbar = ttk.Scrollbar(
+            self.file_tree_card,
+            orient="vertical",
+            command=self.tree.yview,
+            style="Vertical.TScrollbar"
+        )
+        self.tree.configure(yscrollcommand=tree_scrollbar.set)
+
+        self.tree.pack(side="left", fill="both", expand=True)
+        tree_scrollbar.pack(side="right", fill="y")
+
+        self.tree.bind("<<TreeviewOpen>>", self.on_tree_open)
+        self.tree.bind("<Button-1>", self.on_tree_click, add="+")
+        self.tree.bind("<space>", self.on_space_toggle)
+
+        self.root_directory = None
+        self.root_id = None
+        self.loaded_nodes = set()
+        self.checked_state = {}
+        self.node_names = {}
+        self.path_to_id = {}
+        self.checker = None  # check.SyntaxChecker of the open root
+        self.check_badges = {}  # file path -> "✖2 ⚠1"
+        self._checking = False
+
+        # Right column: options & actions
+        right = ttk.Frame(main)
+        right.pack(side="left", fill="both", expand=True)
+
+        # Top options row
+        options_row = ttk.Frame(right)
+        options_row.pack(fill="x", pady=(6, 20))
+
+        # C++ standard dropdown
+        std_label = ttk.Label(options_row, text="c++ standard version", style="Card.TLabel", background=CARD)
+        std_label.grid(row=0, column=0, sticky="w", padx=(0, 6))
+
+        self.cpp_standard = tk.StringVar(value="c++17")
+        self.cpp_standard.trace_add("write", self._on_state_change)
+        self.standards = ["c++98", "c++11", "c++14", "c++17", "c++20", "c++23"]
+        self.std_combo = ttk.Combobox(
+            options_row,
+            values=self.standards,
+            textvariable=self.cpp_standard,
+            state="readonly",
+            width=12,
+        )
+        # Configure the combobox colors
+        self.std_combo.grid(row=1, column=0, sticky="w", padx=(0, 6))
+        # Fix combobox dropdown background
+        self.option_add('*TCombobox*Listbox.background', CARD)
+        self.option_add('*TCombobox*Listbox.foreground', FG)
+        self.option_add('*TCombobox*Listbox.selectBackground', ACCENT)
+        self.option_add('*TCombobox*Listbox.selectForeground', FG)
+
+        # Another dropdown with checkboxes (opens popup)
+        self.opt_btn = ttk.Button(options_row, text="Options...", command=self.open_options_popup, style="Card.TButton")
+        self.opt_btn.grid(row=1, column=1, padx=(20, 6))
+
+        self.tools_btn = ttk.Button(options_row, text="Tools ▼", command=self.show_tools_menu, style="Card.TButton")
+        self.tools_btn.grid(row=1, column=2, padx=(0, 6))
+
+        # Placeholder spacer
+        options_row.columnconfigure(3, weight=1)
+
+        # Output name entry
+        out_frame = ttk.Frame(right)
+        out_frame.pack(fill="x", pady=(20, 12))
+        out_label = ttk.Label(out_frame, text='Output file name:', style="Card.TLabel", background=CARD)
+        out_label.pack(anchor="w")
+        self.output_name = tk.StringVar(value="a.out")
+        out_entry = ttk.Entry(out_frame, textvariable=self.output_name, style="Card.TEntry")
+        out_entry.pack(fill="x", pady=(6, 0))
+
+        # Bottom action buttons
+        action_frame = ttk.Frame(right)
+        action_frame.pack(side="bottom", anchor="e", pady=12)
+
+        compile_btn = ttk.Button(action_frame, text="Compile", command=self.compile_action, style="Accent.TButton")
+        compile_btn.pack(side="left", padx=(0, 10))
+        
+        # Run button with dropdown
+        run_frame = ttk.Frame(action_frame)
+        run_frame.pack(side="left")
+        
+        self.run_mode = tk.StringVar(value="run")
+        self.run_mode.trace_add("write", self._on_run_mode_change)
+        self.run_modes = ["run", "run captured", "run valgrind", "judge", "tests", "record session", "replay session"]
+        self.judge_directory = None
+        
+        self.run_btn = ttk.Button(run_frame, text="Run program", command=self.run_action, style="Card.TButton")
+        self.run_btn.pack(side="left")
+        
+        run_dropdown_btn = ttk.Button(run_frame, text="▼", command=self.show_run_menu, style="Card.TButton", width=3)
+        run_dropdown_btn.pack(side="left", padx=(2, 0))
+
+        cancel_btn = ttk.Button(action_frame, text="Cancel", command=self.cancel_action, style="Card.TButton")
+        cancel_btn.pack(side="left", padx=(10, 0))
+
+        # state for options popup
+        self.options = {
+            "Optimize": tk.BooleanVar(value=False),
+            "Optimize more": tk.BooleanVar(value=False),
+            "Optimize fast": tk.BooleanVar(value=False),
+            "LTO": tk.BooleanVar(value=False),
+            "Native arch": tk.BooleanVar(value=False),
+            "Warn All": tk.BooleanVar(value=True),
+            "Debug info": tk.BooleanVar(value=True),
+            "Warnings as errors": tk.BooleanVar(value=False),
+            "Link static": tk.BooleanVar(value=False),
+            "Split DWARF": tk.BooleanVar(value=False),
+            "GDB index": tk.BooleanVar(value=False),
+            "Native mirror": tk.BooleanVar(value=False),
+            "Build daemon": tk.BooleanVar(value=False),
+            "Directory archives": tk.BooleanVar(value=False),
+            "Memory throttle": tk.BooleanVar(value=False),
+            "Syntax check": tk.BooleanVar(value=False),
+        }
+        for var in self.options.values():
+            var.trace_add("write", self._on_state_change)
+
+        self.linker = tk.StringVar(value="default")
+        self.linker.trace_add("write", self._on_state_change)
+        self.available_linkers = None  # probed after first paint
+        # compile worker endpoints ("host:port"); only editable in settings.json for now
+        self.remote_workers = []
+        self.remote_token = None
+        self.linker_timings = {}
+        # seconds before a build / run is stopped; empty = no limit
+        self.compile_timeout = tk.StringVar(value="")
+        self.run_timeout = tk.StringVar(value="")
+        self.compile_timeout.trace_add("write", self._on_state_change)
+        self.run_timeout.trace_add("write", self._on_state_change)
+
+    def _after_first_paint(self):
+        self.update_idletasks()
+        tracing.mark("first paint")
+
+        with tracing.phase("icon"):
+            try:
+                self.iconbitmap(os.path.join(PROGRAM_BASE_PATH, "skull.ico"))
+            except tk.TclError:
+                pass
+        with tracing.phase("restore tree"):
+            self._restore_pending_tree()
+
+        def probe():
+            return shelling.check_script_installed(), shelling.detect_linkers()
+
+        def probed(result):
+            self.script_available, found = result
+            if self.available_linkers is None:
+                self.available_linkers = found
+
+        self._run_in_background(probe, probed)
+        self.after(CHECK_INTERVAL_MS, self._poll_check)
+        print(tracing.startup_report())
+
+    def _restore_pending_tree(self):
+        if self._pending_tree is None:
+            return
+        root_dir, checked_paths = self._pending_tree
+        self._loading_settings = True
+        try:
+            self.populate_file_tree(root_dir)
+            self._restore_checked_paths(checked_paths)
+        finally:
+            self._loading_settings = False
+            self._pending_tree = None
+
+    def select_directory(self):
+        folder = filedialog.askdirectory()
+        print("selected directory: ", folder)
+        if folder:
+            self._pending_tree = None
+            self.populate_file_tree(folder)
+            self._on_state_change()
+
+    def clear_file_tree(self):
+        for child in self.tree.get_children():
+            self.tree.delete(child)
+        self.loaded_nodes.clear()
+        self.root_directory = None
+        self.root_id = None
+        self.checked_state.clear()
+        self.node_names.clear()
+        self.path_to_id.clear()
+
+    def populate_file_tree(self, root_dir: str):
+        import check
+        if not root_dir:
+            return
+
+        self.clear_file_tree()
+        normalized_root = os.path.normpath(root_dir)
+        self.root_directory = normalized_root
+        # badges from the last check of this project show up right away
+        self.checker = check.SyntaxChecker(normalized_root)
+        self.check_badges = {self.checker.path_of(rel): result.badge for rel, result in self.checker.results.items()}
+
+        root_name = os.path.basename(normalized_root) or normalized_root
+        root_id = self.tree.insert("", "end", text=root_name, values=(normalized_root, "dir"), open=True)
+        self.root_id = root_id
+        self.node_names[root_id] = root_name
+        self.path_to_id[normalized_root] = root_id
+        self._set_check_state(root_id, False)
+        self._add_placeholder(root_id)
+        self._load_children(root_id, normalized_root)
+        self.loaded_nodes.add(root_id)
+        self.tree.selection_set(root_id)
+        self.tree.focus(root_id)
+
+    def _add_placeholder(self, parent_id: str):
+        # Placeholder child so Treeview shows an expand arrow
+        self.tree.insert(parent_id, "end", text="loading...", values=("", "placeholder"))
+
+    def _load_children(self, parent_id: str, directory: str):
+        # Remove placeholder rows
+        for child in self.tree.get_children(parent_id):
+            if self.tree.set(child, "type") == "placeholder":
+                self.tree.delete(child)
+
+        try:
+            with tracing.span("scan directory", "fs", path=directory):
+                entries = list(os.scandir(directory))
+                entries.sort(key=lambda e: (not e.is_dir(), e.name.lower()))
+        except PermissionError:
+            messagebox.showwarning("Permission denied", f"Cannot access {directory}")
+            return
+        except FileNotFoundError:
+            return
+
+        for entry in entries:
+            node_type = "dir" if entry.is_dir() else "file"
+            node_path = os.path.normpath(entry.path)
+            child_id = self.tree.insert(
+                parent_id,
+                "end",
+                text=entry.name,
+                values=(node_path, node_type),
+                open=False
+            )
+            self.node_names[child_id] = entry.name
+            self.path_to_id[node_path] = child_id
+            parent_checked = self.checked_state.get(parent_id, False)
+            self._set_check_state(child_id, parent_checked)
+            if entry.is_dir():
+                self._add_placeholder(child_id)
+
+    def _format_item_text(self, name: str, node_type: str, checked: bool, badge: str = "") -> str:
+        icon = FOLDER_ICON if node_type == "dir" else FILE_ICON
+        box = CHECKED_BOX if checked else UNCHECKED_BOX
+        return f"{box} {icon} {name}  {badge}" if badge else f"{box} {icon} {name}"
+
+    def _set_check_state(self, item_id: str, checked: bool, propagate_children: bool = False):
+        self.checked_state[item_id] = checked
+        node_type = self.tree.set(item_id, "type")
+        if not node_type or node_type == "placeholder":
+            return
+        name = self.node_names.get(item_id, self.tree.item(item_id, "text"))
+        badge = self.check_badges.get(self.tree.set(item_id, "path"), "")
+        self.tree.item(item_id, text=self._format_item_text(name, node_type, checked, badge))
+
+        if propagate_children and node_type == "dir":
+            for child in self.tree.get_children(item_id):
+                self._set_check_state(child, checked, propagate_children=True)
+
+    def _toggle_item_check(self, item_id: str):
+        current = self.checked_state.get(item_id, False)
+        node_type = self.tree.set(item_id, "type")
+        propagate = node_type == "dir"
+        self._set_check_state(item_id, not current, propagate_children=propagate)
+        self._on_state_change()
+
+    def on_tree_click(self, event):
+        region = self.tree.identify("region", event.x, event.y)
+        if region != "tree":
+            return
+        element = self.tree.identify("element", event.x, event.y)
+        if element == "Treeitem.indicator":
+            return
+        item_id = self.tree.identify_row(event.y)
+        if not item_id:
+            return
+        self._toggle_item_check(item_id)
+
+    def on_space_toggle(self, _event):
+        item_id = self.tree.focus()
+        if not item_id:
+            return
+        self._toggle_item_check(item_id)
+
+    def on_tree_open(self, _event):
+        item_id = self.tree.focus()
+        if not item_id or item_id in self.loaded_nodes:
+            return
+
+        node_type = self.tree.set(item_id, "type")
+        path = self.tree.set(item_id, "path")
+        if node_type == "dir" and path:
+            self._load_children(item_id, path)
+            self.loaded_nodes.add(item_id)
+
+    def _collect_files_under(self, directory: str) -> list[str]:
+        collected: list[str] = []
+        for root, _dirs, files in os.walk(directory):
+            for filename in files:
+                collected.append(os.path.join(root, filename))
+        return collected
+
+    def _gather_checked_paths(self) -> list[str]:
+        if not self.root_directory:
+            return []
+        with tracing.span("gather selection", "ui", items=len(self.checked_state)):
+            seen = set()
+            paths: list[str] = []
+            for item_id, checked in self.checked_state.items():
+                if not checked:
+                    continue
+                path = self.tree.set(item_id, "path")
+                if not path:
+                    continue
+                normalized = os.path.normpath(path)
+                if normalized in seen:
+                    continue
+                seen.add(normalized)
+                paths.append(normalized)
+        return paths
+
+    def _ensure_node_for_path(self, path: str):
+        if not self.root_directory or not path:
+            return None
+        normalized = os.path.normpath(path)
+        root_norm = os.path.normpath(self.root_directory)
+        try:
+            if os.path.commonpath([root_norm, normalized]) != root_norm:
+                return None
+        except ValueError:
+            return None
+
+        if normalized == root_norm:
+            return self.root_id
+
+        if normalized in self.path_to_id:
+            return self.path_to_id[normalized]
+
+        parent_path = os.path.dirname(normalized)
+        if not parent_path or parent_path == normalized:
+            return None
+
+        parent_id = self._ensure_node_for_path(parent_path)
+        if not parent_id:
+            return None
+
+        parent_dir = self.tree.set(parent_id, "path")
+        if not parent_dir or self.tree.set(parent_id, "type") != "dir":
+            return None
+
+        self._load_children(parent_id, parent_dir)
+        self.loaded_nodes.add(parent_id)
+        self.tree.item(parent_id, open=True)
+        return self.path_to_id.get(normalized)
+
+    def _restore_checked_paths(self, paths: list[str]):
+        if not paths:
+            return
+        for path in paths:
+            if not path or not os.path.exists(path):
+                continue
+            item_id = self._ensure_node_for_path(path)
+            if item_id:
+                self._set_check_state(item_id, True)
+
+    def _on_state_change(self, *_args):
+        if self._loading_settings:
+            return
+        self.save_settings()
+
+    def save_settings(self):
+        if self._pending_tree is not None:
+            # closed before the deferred restore ran: keep what was saved
+            root_directory, checked_paths = self._pending_tree
+        else:
+            root_directory, checked_paths = self.root_directory, self._gather_checked_paths()
+        data = {
+            "root_directory": root_directory,
+            "checked_paths": checked_paths,
+            "cpp_standard": self.cpp_standard.get(),
+            "options": {k: v.get() for k, v in self.options.items()},
+            "output_file_name": self.output_name.get(),
+            "judge_directory": self.judge_directory,
+            "linker": self.linker.get(),
+            "remote_workers": self.remote_workers,
+            "remote_token": self.remote_token,
+            "compile_timeout": self._timeout(self.compile_timeout),
+            "run_timeout": self._timeout(self.run_timeout)
+        }
+        save_settings_file(data, self.settings_path)
+
+    def load_settings(self):
+        data = load_settings_file(self.settings_path)
+        if data is None:
+            return
+
+        self._loading_settings = True
+        try:
+            self.output_name.set(data.get("output_file_name"))
+            saved_std = data.get("cpp_standard")
+            if isinstance(saved_std, str) and saved_std in self.standards:
+                self.cpp_standard.set(saved_std)
+
+            saved_options = data.get("options", {})
+            if isinstance(saved_options, dict):
+                for name, var in self.options.items():
+                    var.set(bool(saved_options.get(name, False)))
+
+            saved_linker = data.get("linker")
+            if isinstance(saved_linker, str) and saved_linker in shelling.LINKER_FLAGS:
+                self.linker.set(saved_linker)
+
+            workers = data.get("remote_workers", [])
+            if isinstance(workers, list):
+                self.remote_workers = [w for w in workers if isinstance(w, str)]
+            if isinstance(data.get("remote_token"), str):
+                self.remote_token = data.get("remote_token")
+
+            for key, var in (("compile_timeout", self.compile_timeout), ("run_timeout", self.run_timeout)):
+                value = data.get(key)
+                var.set(f"{value:g}" if isinstance(value, (int, float)) and value > 0 else "")
+
+            judge_dir = data.get("judge_directory")
+            if isinstance(judge_dir, str) and os.path.isdir(judge_dir):
+                self.judge_directory = judge_dir
+
+            root_dir = data.get("root_directory")
+            checked_paths = data.get("checked_paths", [])
+            if isinstance(root_dir, str) and os.path.isdir(root_dir):
+                # the tree is filled in after the window is shown (see _after_first_paint)
+                self._pending_tree = (root_dir, checked_paths if isinstance(checked_paths, list) else [])
+        finally:
+            self._loading_settings = False
+
+    def on_close(self):
+        self.save_settings()
+        self.destroy()
+
+    def open_options_popup(self):
+        import linkers
+        self._configure_popup_styles()
+        win = tk.Toplevel(self)
+        win.title("Options")
+        win.configure(bg=BG)
+        win.minsize(260, 0)
+        win.transient(self)
+        for i, (k, v) in enumerate(self.options.items()):
+            cb = ttk.Checkbutton(win, text=k, variable=v, style="Card.TCheckbutton")
+            cb.pack(fill="x", padx=12, pady=6)
+
+        linker_row = ttk.Frame(win)
+        linker_row.pack(fill="x", padx=12, pady=6)
+        ttk.Label(linker_row, text="Linker").pack(side="left")
+        linker_combo = ttk.Combobox(linker_row, textvariable=self.linker, state="readonly", width=10,
+                                    values=["default"] + (self.available_linkers or []))
+        linker_combo.pack(side="left", padx=(8, 0))
+
+        timings_label = ttk.Label(win, text=linkers.format_timings(self.linker_timings), wraplength=240)
+        timings_label.pack(fill="x", padx=12)
+
+        def on_detected(found):
+            self.available_linkers = found
+            if win.winfo_exists():
+                linker_combo.configure(values=["default"] + found)
+
+        if self.available_linkers is None:
+            # the startup probe has not finished yet
+            self._run_in_background(shelling.detect_linkers, on_detected)
+
+        def on_timed(timings):
+            self.linker_timings = timings
+            if win.winfo_exists():
+                timings_label.configure(text=linkers.format_timings(timings))
+
+        def time_all():
+            cpp_files = self._gather_checked_paths()
+            if not cpp_files or not self.root_directory:
+                messagebox.showwarning("Linkers", "Select some source files first.", parent=win)
+                return
+            timings_label.configure(text="timing linkers...")
+            root_directory = self.root_directory
+            opts = {k: v.get() for k, v in self.options.items()}
+            std = self.cpp_standard.get()
+            self._run_in_background(lambda: linkers.time_linkers(cpp_files, root_directory, opts, std), on_timed,
+                                    lambda exc: win.winfo_exists() and timings_label.configure(text=f"failed: {exc}"))
+
+        ttk.Button(win, text="Time linkers", command=time_all, style="Card.TButton").pack(pady=(6, 0))
+
+        for label, var in (("Compile timeout (s)", self.compile_timeout), ("Run timeout (s)", self.run_timeout)):
+            row = ttk.Frame(win)
+            row.pack(fill="x", padx=12, pady=(6, 0))
+            ttk.Label(row, text=label).pack(side="left")
+            ttk.Entry(row, textvariable=var, width=8, style="Card.TEntry").pack(side="right")
+
+        close_btn = ttk.Button(win, text="Close", command=win.destroy, style="Accent.TButton")
+        close_btn.pack(pady=8)
+
+    def show_run_menu(self):
+        menu = tk.Menu(self, tearoff=0, bg=CARD, fg=FG, activebackground=ACCENT, activeforeground=FG)
+        for mode in self.run_modes:
+            menu.add_radiobutton(
+                label=mode,
+                variable=self.run_mode,
+                value=mode,
+                background=CARD,
+                foreground=FG,
+                selectcolor=ACCENT,
+                state="disabled" if mode == "record session" and self.script_available is False else "normal"
+            )
+        menu.post(self.winfo_pointerx(), self.winfo_pointery())
+
+    def show_tools_menu(self):
+        menu = tk.Menu(self, tearoff=0, bg=CARD, fg=FG, activebackground=ACCENT, activeforeground=FG)
+        menu.add_command(label="Matrix build...", command=self.open_matrix_popup)
+        menu.add_command(label="PGO build...", command=self.open_pgo_popup)
+        menu.add_command(label="Auto-tune...", command=self.open_tune_popup)
+        menu.add_command(label="Size analysis...", command=self.open_size_popup)
+        menu.add_command(label="Include costs...", command=self.open_includes_popup)
+        menu.add_command(label="Check syntax", command=lambda: self.check_action(report=True))
+        menu.add_command(label="Trace...", command=self.open_trace_popup)
+        menu.add_command(label="History...", command=self.open_history_popup)
+        menu.add_separator()
+        menu.add_command(label="Re-run failed tests", command=lambda: self.test_action(failed_only=True))
+        menu.post(self.winfo_pointerx(), self.winfo_pointery())
+
+    def open_matrix_popup(self):
+        import matrix
+        self._configure_popup_styles()
+        win = tk.Toplevel(self)
+        win.title("Matrix build")
+        win.configure(bg=BG)
+        win.geometry("720x420")
+        win.transient(self)
+
+        controls = ttk.Frame(win)
+        controls.pack(side="left", fill="y", padx=12, pady=12)
+
+        ttk.Label(controls, text="Standards").pack(anchor="w")
+        std_vars = {std: tk.BooleanVar(value=(std == self.cpp_standard.get())) for std in self.standards}
+        for std, var in std_vars.items():
+            ttk.Checkbutton(controls, text=std, variable=var, style="Card.TCheckbutton").pack(fill="x", pady=1)
+
+        ttk.Label(controls, text="Vary options").pack(anchor="w", pady=(10, 0))
+        # only options that add a g++ flag; build modes (mirror, daemon, ...) would just repeat every cell
+        vary_vars = {name: tk.BooleanVar(value=False) for name in self.options if name in shelling.OPTION_FLAGS}
+        for name, var in vary_vars.items():
+            ttk.Checkbutton(controls, text=name, variable=var, style="Card.TCheckbutton").pack(fill="x", pady=1)
+
+        grid = ttk.Treeview(win, show="headings", style="NoPaste.Treeview")
+        grid.pack(side="left", fill="both", expand=True, padx=(0, 12), pady=12)
+
+        def start():
+            standards = [std for std, var in std_vars.items() if var.get()]
+            vary = [name for name, var in vary_vars.items() if var.get()]
+            cpp_files = self._gather_checked_paths()
+            if not standards or not cpp_files or not self.root_directory:
+                messagebox.showwarning("Matrix build", "Select at least one standard and some source files.",
+                                       parent=win)
+                return
+            base = {name: var.get() for name, var in self.options.items()}
+            combos = matrix.option_combinations(base, vary)
+            cells = matrix.plan_matrix(standards, combos)
+
+            columns = ["standard"] + list(combos)
+            grid.configure(columns=columns)
+            for col in columns:
+                grid.heading(col, text=col)
+                grid.column(col, width=110, stretch=True)
+            grid.delete(*grid.get_children())
+            rows = {std: grid.insert("", "end", values=[std] + ["..."] * len(combos)) for std in standards}
+
+            def show_cell(cell):
+                if win.winfo_exists():
+                    grid.set(rows[cell.standard], cell.combo_name, matrix.format_cell(cell))
+
+            def on_cell(cell):
+                self.after(0, show_cell, cell)
+
+            root_directory = self.root_directory
+            out = self.output_name.get()
+            self._run_in_background(
+                lambda: matrix.run_matrix(cells, cpp_files, root_directory, executable_name=out, on_cell=on_cell),
+                lambda done: print("\n".join(f"[{c.standard} {c.combo_name}] {matrix.format_cell(c)}"
+                                              for c in done)))
+
+        ttk.Button(controls, text="Build matrix", command=start, style="Accent.TButton").pack(pady=(12, 0))
+
+    def open_pgo_popup(self):
+        import pgo
+        import sessions
+        self._configure_popup_styles()
+        win = tk.Toplevel(self)
+        win.title("PGO build")
+        win.configure(bg=BG)
+        win.geometry("560x340")
+        win.transient(self)
+
+        ttk.Label(win, text="Training inputs (fed to stdin, one run each)").pack(anchor="w", padx=12, pady=(12, 4))
+        inputs = tk.Listbox(win, bg=CARD, fg=FG, selectbackground=ACCENT, highlightthickness=0, borderwidth=0)
+        inputs.pack(fill="both", expand=True, padx=12)
+
+        def add_inputs():
+            for path in filedialog.askopenfilenames(parent=win, title="Select training inputs",
+                                                    initialdir=self.judge_directory or self.root_directory):
+                if path not in inputs.get(0, "end"):
+                    inputs.insert("end", path)
+
+        def remove_inputs():
+            for index in reversed(inputs.curselection()):
+                inputs.delete(index)
+
+        row = ttk.Frame(win)
+        row.pack(fill="x", padx=12, pady=8)
+        ttk.Button(row, text="Add...", command=add_inputs, style="Card.TButton").pack(side="left")
+        def add_session():
+            name = self._ask_session(parent=win)
+            path = sessions.stdin_path(self.root_directory, name) if name else None
+            if path and path not in inputs.get(0, "end"):
+                inputs.insert("end", path)
+
+        ttk.Button(row, text="Remove", command=remove_inputs, style="Card.TButton").pack(side="left", padx=6)
+        ttk.Button(row, text="Add recording...", command=add_session, style="Card.TButton").pack(side="left")
+        lto = tk.BooleanVar(value=False)
+        ttk.Checkbutton(row, text="LTO", variable=lto, style="Card.TCheckbutton").pack(side="left", padx=6)
+
+        def start():
+            cpp_files = self._gather_checked_paths()
+            if not cpp_files or not self.root_directory:
+                messagebox.showwarning("PGO build", "Select some source files first.", parent=win)
+                return
+            request = dict(sources=cpp_files, root_directory=self.root_directory,
+                           custom_options={k: v.get() for k, v in self.options.items()},
+                           language_standard=self.cpp_standard.get(), executable_name=self.output_name.get(),
+                           training_inputs=list(inputs.get(0, "end")), linker=self.linker.get(),
+                           lto=lto.get())
+            start_btn.config(state="disabled")
+
+            def done(result):
+                if win.winfo_exists():
+                    start_btn.config(state="normal")
+                messagebox.showinfo("PGO build", result.summary())
+
+            def failed(exc):
+                if win.winfo_exists():
+                    start_btn.config(state="normal")
+                messagebox.showerror("PGO build", f"The PGO build failed: {exc}")
+
+            self._run_in_background(lambda: pgo.run_pgo(**request), done, failed)
+
+        start_btn = ttk.Button(row, text="Start PGO build", command=start, style="Accent.TButton")
+        start_btn.pack(side="right")
+
+    def open_tune_popup(self):
+        import tune
+        self._configure_popup_styles()
+        win = tk.Toplevel(self)
+        win.title("Auto-tune")
+        win.configure(bg=BG)
+        win.geometry("620x340")
+        win.transient(self)
+
+        row = ttk.Frame(win)
+        row.pack(fill="x", padx=12, pady=(12, 6))
+        input_var = tk.StringVar(value="")
+        ttk.Label(row, text="Input").pack(side="left")
+        ttk.Entry(row, textvariable=input_var).pack(side="left", fill="x", expand=True, padx=6)
+
+        def browse():
+            path = filedialog.askopenfilename(parent=win, title="Select a representative input",
+                                              initialdir=self.judge_directory or self.root_directory)
+            if path:
+                input_var.set(path)
+
+        ttk.Button(row, text="Browse...", command=browse, style="Card.TButton").pack(side="left")
+
+        columns = ["variant", "runtime", "size", "compile"]
+        table = ttk.Treeview(win, columns=columns, show="headings", style="NoPaste.Treeview")
+        for col in columns:
+            table.heading(col, text=col)
+            table.column(col, width=120, stretch=True)
+        table.pack(fill="both", expand=True, padx=12)
+        ranked = []
+
+        def show(results):
+            ranked[:] = results
+            if not win.winfo_exists():
+                return
+            start_btn.config(state="normal")
+            table.delete(*table.get_children())
+            for result in results:
+                table.insert("", "end", values=tune.format_row(result))
+            if tune.winner(results) is not None:
+                table.selection_set(table.get_children()[0])
+            if results and results[0].ok:
+                save_btn.config(state="normal")
+            print(tune.format_table(results))
+
+        def failed(exc):
+            if win.winfo_exists():
+                start_btn.config(state="normal")
+            messagebox.showerror("Auto-tune", f"Auto-tune failed: {exc}")
+
+        def start():
+            cpp_files = self._gather_checked_paths()
+            if not cpp_files or not self.root_directory:
+                messagebox.showwarning("Auto-tune", "Select some source files first.", parent=win)
+                return
+            request = dict(sources=cpp_files, root_directory=self.root_directory,
+                           custom_options={k: v.get() for k, v in self.options.items()},
+                           language_standard=self.cpp_standard.get(), executable_name=self.output_name.get(),
+                           stdin_path=input_var.get() or None)
+            start_btn.config(state="disabled")
+            save_btn.config(state="disabled")
+            table.delete(*table.get_children())
+            self._run_in_background(lambda: tune.run_tune(**request), show, failed)
+
+        def save_winner():
+            selected = table.selection()
+            if not selected or not ranked:
+                return
+            result = ranked[table.index(selected[0])]
+            if not result.ok:
+                return
+            for name in shelling.OPTIMIZATION_OPTIONS:
+                self.options[name].set(result.options.get(name, False))
+            self.save_settings()
+            print(f"Option profile set to {result.variant}")
+
+        buttons = ttk.Frame(win)
+        buttons.pack(fill="x", padx=12, pady=8)
+        start_btn = ttk.Button(buttons, text="Build and benchmark", command=start, style="Accent.TButton")
+        start_btn.pack(side="left")
+        save_btn = ttk.Button(buttons, text="Use selected", command=save_winner, style="Card.TButton",
+                              state="disabled")
+        save_btn.pack(side="right")
+
+    def open_size_popup(self):
+        import bloat
+        import capture
+        self._configure_popup_styles()
+        win = tk.Toplevel(self)
+        win.title(f"Size analysis: {self.output_name.get()}")
+        win.configure(bg=BG)
+        win.geometry("760x460")
+        win.transient(self)
+        root_directory = self.root_directory
+        out = self.output_name.get()
+
+        row = ttk.Frame(win)
+        row.pack(fill="x", padx=12, pady=(12, 6))
+        by = tk.StringVar(value="namespace")
+        lines = tk.BooleanVar(value=False)
+        ttk.Label(row, text="Group by").pack(side="left")
+        ttk.Combobox(row, textvariable=by, values=bloat.GROUPINGS, state="readonly", width=10).pack(side="left",
+                                                                                                    padx=6)
+        compare = tk.StringVar(value="(none)")
+        ttk.Label(row, text="Compare with").pack(side="left", padx=(12, 0))
+        compare_combo = ttk.Combobox(row, textvariable=compare, state="readonly", width=16,
+                                     values=["(none)"] + bloat.list_snapshots(root_directory))
+        compare_combo.pack(side="left", padx=6)
+        total_label = ttk.Label(win, text="")
+        total_label.pack(anchor="w", padx=12)
+
+        columns = ["size", "count", "name"]
+        table = ttk.Treeview(win, columns=columns, show="headings", style="NoPaste.Treeview")
+        table.heading("size", text="size")
+        table.column("size", width=90, stretch=False, anchor="e")
+        table.heading("count", text="count")
+        table.column("count", width=90, stretch=False, anchor="e")
+        table.heading("name", text="name")
+        table.column("name", width=540, stretch=True)
+        table.pack(fill="both", expand=True, padx=12)
+        current = {}
+
+        def refresh(*_args):
+            snapshot = current.get("snapshot")
+            if snapshot is None or not win.winfo_exists():
+                return
+            table.delete(*table.get_children())
+            label = compare.get()
+            old = bloat.load_snapshot(root_directory, label) if label != "(none)" else None
+            if old is not None:
+                table.heading("count", text="change")
+                total_label.configure(text=f"{capture.format_size(snapshot.total)} "
+                                           f"({capture.format_size(snapshot.total - old.total)} since {label})")
+                for name, size, delta in bloat.diff(old, snapshot, by.get())[:500]:
+                    table.insert("", "end", values=[capture.format_size(size),
+                                                    ("+" if delta > 0 else "") + capture.format_size(delta), name])
+            else:
+                table.heading("count", text="count")
+                total_label.configure(text=f"{capture.format_size(snapshot.total)} in "
+                                           f"{len(snapshot.symbols)} symbols")
+                for name, size, count in bloat.ranked(bloat.group(snapshot, by.get()), 500):
+                    table.insert("", "end", values=[capture.format_size(size), count, name])
+
+        def analyzed(snapshot):
+            current["snapshot"] = snapshot
+            if win.winfo_exists():
+                analyze_btn.config(state="normal")
+                save_btn.config(state="normal" if snapshot is not None else "disabled")
+            refresh()
+
+        def analyze():
+            def work():
+                try:
+                    return bloat.collect(root_directory, out, lines=lines.get() or by.get() == "file")
+                except RuntimeError as exc:
+                    print(exc)
+                    return None
+            def failed(exc):
+                analyzed(None)
+                if win.winfo_exists():
+                    total_label.configure(text=f"Size analysis failed: {exc}")
+            analyze_btn.config(state="disabled")
+            total_label.configure(text="reading symbols...")
+            self._run_in_background(work, analyzed, failed)
+
+        def save():
+            label = simpledialog.askstring("Save snapshot", "Label for this build:", parent=win)
+            if label and current.get("snapshot") is not None:
+                print(f"Saved size snapshot to {bloat.save_snapshot(current['snapshot'], root_directory, label)}")
+                compare_combo.configure(values=["(none)"] + bloat.list_snapshots(root_directory))
+
+        def regroup(*_args):
+            if by.get() == "file" and not lines.get():
+                lines.set(True)  # the snapshot has no source files yet
+                analyze()
+            else:
+                refresh()
+
+        by.trace_add("write", regroup)
+        compare.trace_add("write", refresh)
+        buttons = ttk.Frame(win)
+        buttons.pack(fill="x", padx=12, pady=8)
+        analyze_btn = ttk.Button(buttons, text="Analyze", command=analyze, style="Accent.TButton")
+        analyze_btn.pack(side="left")
+        ttk.Checkbutton(buttons, text="Source files (slow)", variable=lines,
+                        style="Card.TCheckbutton").pack(side="left", padx=6)
+        save_btn = ttk.Button(buttons, text="Save snapshot...", command=save, style="Card.TButton", state="disabled")
+        save_btn.pack(side="right")
+        analyze()
+
+    def open_includes_popup(self):
+        import capture
+        import includes
+        self._configure_popup_styles()
+        cpp_files = self._gather_checked_paths()
+        if not cpp_files or not self.root_directory:
+            messagebox.showwarning("Include costs", "Select some source files first.")
+            return
+        win = tk.Toplevel(self)
+        win.title("Include costs")
+        win.configure(bg=BG)
+        win.geometry("820x560")
+        win.transient(self)
+        root_directory = self.root_directory
+        opts = {k: v.get() for k, v in self.options.items()}
+        std = self.cpp_standard.get()
+
+        row = ttk.Frame(win)
+        row.pack(fill="x", padx=12, pady=(12, 6))
+        by = tk.StringVar(value="bytes")
+        ttk.Label(row, text="Rank by").pack(side="left")
+        ttk.Combobox(row, textvariable=by, values=("bytes", "count", "own"), state="readonly",
+                     width=8).pack(side="left", padx=6)
+        total_label = ttk.Label(win, text="")
+        total_label.pack(anchor="w", padx=12)
+
+        columns = ["total", "own", "tus", "opened", "header"]
+        table = ttk.Treeview(win, columns=columns, show="headings", style="NoPaste.Treeview", height=12)
+        for column, title, width in (("total", "total", 90), ("own", "own", 90), ("tus", "TUs", 60),
+                                     ("opened", "opened", 70)):
+            table.heading(column, text=title)
+            table.column(column, width=width, stretch=False, anchor="e")
+        table.heading("header", text="header")
+        table.column("header", width=460, stretch=True)
+        table.pack(fill="both", expand=True, padx=12)
+
+        ttk.Label(win, text="Suggestions").pack(anchor="w", padx=12, pady=(8, 0))
+        hints = tk.Listbox(win, height=8, bg=CARD, fg=FG, selectbackground=ACCENT, highlightthickness=0)
+        hints.pack(fill="x", padx=12)
+        current = {}
+
+        def refresh(*_args):
+            report = current.get("report")
+            if report is None or not win.winfo_exists():
+                return
+            table.delete(*table.get_children())
+            for cost in report.ranked(by.get(), 500):
+                table.insert("", "end", values=[capture.format_size(cost.total_bytes), capture.format_size(cost.own_bytes),
+                                                len(cost.tus), cost.opened, cost.path])
+            hints.delete(0, "end")
+            for suggestion in report.suggestions:
+                hints.insert("end", str(suggestion))
+
+        def analyzed(report):
+            if isinstance(report, Exception):
+                if win.winfo_exists():
+                    analyze_btn.config(state="normal")
+                    total_label.configure(text=str(report).splitlines()[0])
+                return
+            current["report"] = report
+            if not win.winfo_exists():
+                return
+            analyze_btn.config(state="normal")
+            failed = [tu.rel for tu in report.tus if not tu.ok]
+            total_label.configure(text=f"{len(report.tus)} TUs, {capture.format_size(report.total_bytes)} "
+                                       f"preprocessed, {len(report.headers)} headers"
+                                       + (f"; failed to preprocess: {', '.join(failed)}" if failed else ""))
+            for tu in report.tus:
+                if not tu.ok:
+                    print(tu.output)
+            refresh()
+
+        def analyze():
+            def progress(tu):
+                self.after(0, lambda: win.winfo_exists() and total_label.configure(text=f"preprocessed {tu.rel}"))
+            analyze_btn.config(state="disabled")
+            total_label.configure(text="preprocessing...")
+            self._run_in_background(lambda: includes.analyze(root_directory, cpp_files, opts, std, on_tu=progress),
+                                    analyzed, analyzed)
+
+        by.trace_add("write", refresh)
+        buttons = ttk.Frame(win)
+        buttons.pack(fill="x", padx=12, pady=8)
+        analyze_btn = ttk.Button(buttons, text="Analyze", command=analyze, style="Accent.TButton")
+        analyze_btn.pack(side="left")
+        analyze()
+
+    def open_trace_popup(self):
+        """Span summary of everything traced so far (see tracing.py), with a Chrome trace export."""
+        self._configure_popup_styles()
+        win = tk.Toplevel(self)
+        win.title("Trace")
+        win.configure(bg=BG)
+        win.geometry("760x460")
+        win.transient(self)
+
+        text = tk.Text(win, bg=CARD, fg=FG, insertbackground=FG, wrap="none", font=("Consolas", 10),
+                       borderwidth=0, highlightthickness=0)
+        text.pack(fill="both", expand=True, padx=12, pady=(12, 6))
+
+        def refresh():
+            text.configure(state="normal")
+            text.delete("1.0", "end")
+            text.insert("end", tracing.format_summary())
+            text.configure(state="disabled")
+
+        def export():
+            directory = os.path.join(self.root_directory, shelling.RESPONSE_DIR) if self.root_directory else None
+            path = filedialog.asksaveasfilename(parent=win, title="Export Chrome trace", initialdir=directory,
+                                                initialfile=tracing.TRACE_FILE, defaultextension=".json",
+                                                filetypes=[("Trace JSON", "*.json")])
+            if not path:
+                return
+            try:
+                count = tracing.export_chrome_trace(path)
+            except OSError as exc:
+                messagebox.showerror("Trace", f"Could not write {path}: {exc}", parent=win)
+                return
+            print(f"{count} span(s) written to {path}; open it in ui.perfetto.dev or chrome://tracing")
+
+        def clear():
+            tracing.clear()
+            refresh()
+
+        buttons = ttk.Frame(win)
+        buttons.pack(fill="x", padx=12, pady=(0, 12))
+        ttk.Button(buttons, text="Refresh", command=refresh).pack(side="left")
+        ttk.Button(buttons, text="Clear", command=clear).pack(side="left", padx=6)
+        ttk.Button(buttons, text="Export...", command=export, style="Accent.TButton").pack(side="right")
+        refresh()
+
+    def open_history_popup(self):
+        """Builds and runs recorded in the project's history, with regressions against their recent baseline."""
+        import capture
+        import history
+        if not self.root_directory:
+            messagebox.showwarning("History", "Select a project directory first.")
+            return
+        self._configure_popup_styles()
+        win = tk.Toplevel(self)
+        win.title("Build and run history")
+        win.configure(bg=BG)
+        win.geometry("980x640")
+        win.transient(self)
+        store = history.History(self.root_directory)
+
+        row = ttk.Frame(win)
+        row.pack(fill="x", padx=12, pady=(12, 6))
+        build_limit = tk.StringVar(value=f"{history.BUILD_THRESHOLD * 100:g}")
+        run_limit = tk.StringVar(value=f"{history.RUN_THRESHOLD * 100:g}")
+        ttk.Label(row, text="Flag builds slower by %").pack(side="left")
+        ttk.Entry(row, textvariable=build_limit, width=5).pack(side="left", padx=(4, 12))
+        ttk.Label(row, text="runs slower by %").pack(side="left")
+        ttk.Entry(row, textvariable=run_limit, width=5).pack(side="left", padx=4)
+
+        flagged = tk.Listbox(win, height=4, bg=CARD, fg="#ff6b6b", selectbackground=ACCENT, highlightthickness=0)
+        flagged.pack(fill="x", padx=12)
+
+        def make_table(title, columns):
+            ttk.Label(win, text=title).pack(anchor="w", padx=12, pady=(8, 0))
+            table = ttk.Treeview(win, columns=[c for c, _w in columns], show="headings", style="NoPaste.Treeview",
+                                 height=7)
+            for column, width in columns:
+                table.heading(column, text=column)
+                table.column(column, width=width, stretch=column in ("options", "detail"))
+            table.tag_configure("regression", foreground="#ff6b6b")
+            table.tag_configure("failed", foreground="#888888")
+            table.pack(fill="both", expand=True, padx=12)
+            return table
+
+        builds = make_table("Builds", [("when", 120), ("target", 90), ("mode", 80), ("status", 60), ("time", 70),
+                                       ("change", 60), ("compiled", 65), ("cached", 60), ("size", 80),
+                                       ("options", 260)])
+        runs = make_table("Runs", [("when", 120), ("target", 90), ("mode", 80), ("exit", 50), ("time", 80),
+                                   ("change", 60), ("detail", 300)])
+        phases = ttk.Label(win, text="Select a build to see its phases.")
+        phases.pack(anchor="w", padx=12, pady=6)
+        shown = {}
+
+        def percent(var, default):
+            try:
+                return float(var.get()) / 100
+            except ValueError:
+                return default
+
+        def loaded(data):
+            build_rows, run_rows, regressions = data
+            if not win.winfo_exists():
+                return
+            build_change, run_change = store.trend(build_rows), store.trend(run_rows)
+            flagged_ids = {(r.kind, r.record["id"]) for r in regressions}
+            flagged.delete(0, "end")
+            for regression in regressions:
+                flagged.insert("end", str(regression))
+            if not regressions:
+                flagged.insert("end", "No regressions against the recent builds and runs.")
+            shown.clear()
+            builds.delete(*builds.get_children())
+            for record in build_rows:
+                change = build_change.get(record["id"])
+                tag = "regression" if ("build", record["id"]) in flagged_ids else "" if record["ok"] else "failed"
+                item = builds.insert("", "end", tags=(tag,), values=[
+                    time.strftime("%Y-%m-%d %H:%M", time.localtime(record["started"])), record["target"],
+                    record["mode"], "ok" if record["ok"] else "FAILED", f"{record['seconds']:.2f}s",
+                    f"{change:+.0%}" if change is not None else "",
+                    "" if record["compiled"] is None else record["compiled"],
+                    "" if record["cache_hits"] is None else record["cache_hits"],
+                    capture.format_size(record["binary_size"]) if record["binary_size"] else "",
+                    " ".join([record["standard"] or ""] + record["options"])])
+                shown[item] = record
+            runs.delete(*runs.get_children())
+            for record in run_rows:
+                change = run_change.get(record["id"])
+                tag = "regression" if ("run", record["id"]) in flagged_ids else ""
+                runs.insert("", "end", tags=(tag,), values=[
+                    time.strftime("%Y-%m-%d %H:%M", time.localtime(record["started"])), record["target"],
+                    record["mode"], record["exit_code"], f"{record['seconds']:.3f}s",
+                    f"{change:+.0%}" if change is not None else "", history.run_detail(record)])
+
+        def refresh():
+            build_threshold = percent(build_limit, history.BUILD_THRESHOLD)
+            run_threshold = percent(run_limit, history.RUN_THRESHOLD)
+            self._run_in_background(lambda: (store.builds(limit=200), store.runs(limit=200),
+                                             store.regressions(build_threshold, run_threshold)), loaded)
+
+        def selected(_event):
+            record = shown.get(builds.focus())
+            if record is not None:
+                parts = sorted(record["phases"].items(), key=lambda item: item[1], reverse=True)
+                phases.configure(text="Phases: " + (", ".join(f"{name} {seconds:.2f}s" for name, seconds in parts)
+                                                    or "none recorded"))
+
+        builds.bind("<<TreeviewSelect>>", selected)
+        ttk.Button(row, text="Refresh", command=refresh, style="Accent.TButton").pack(side="right")
+        refresh()
+
+    def _on_run_mode_change(self, *_args):
+        mode = self.run_mode.get()
+        if mode == "run valgrind":
+            self.run_btn.config(text="Run with Valgrind")
+        elif mode == "judge":
+            self.run_btn.config(text="Run judge")
+        elif mode == "run captured":
+            self.run_btn.config(text="Run (capture output)")
+        elif mode == "tests":
+            self.run_btn.config(text="Run tests")
+        elif mode == "record session":
+            self.run_btn.config(text="Run and record")
+        elif mode == "replay session":
+            self.run_btn.config(text="Replay session")
+        else:
+            self.run_btn.config(text="Run program")
+
+    def compile_action(self):
+        # selected_file_paths: list[str] = []
+        #
+        #
+        # for item_id, checked in self.checked_state.items():
+        #     if not checked:
+        #         continue
+        #     node_type = self.tree.set(item_id, "type")
+        #     path = self.tree.set(item_id, "path")
+        #     if not path:
+        #         continue
+        #     if node_type == "file":
+        #         selected_file_paths.append(path)
+        #     elif node_type == "dir":
+        #         selected_file_paths.extend(self._collect_files_under(path))
+        #
+        # # Deduplicate while preserving order
+        # seen: set[str] = set()
+        # unique_selected = []
+        # for path in selected_file_paths:
+        #     if path not in seen:
+        #         seen.add(path)
+        #         unique_selected.append(path)
+        #
+        # std = self.cpp_standard.get()
+        # opts = {k: v.get() for k, v in self.options.items()}
+        # out = self.output_name.get()
+        # info = f"Compiling {len(unique_selected)} files\nStandard: {std}\nOptions: {opts}\nOutput: {out}"
+        # messagebox.showinfo("Compile", info)
+        # print(info)
+        #
+        # if unique_selected:
+        #     normalized = [p.replace("\\", "/") for p in unique_selected]
+        #     print("paths:", " ".join(normalized))
+        # else:
+        #     print("no files selected")
+        started = time.perf_counter()
+        cpp_files = self._gather_checked_paths()
+        if self.options["Build daemon"].get():
+            self.daemon_compile(cpp_files, started)
+            return
+        root_path = shelling.windows_to_wsl(self.root_directory)
+        recording_out = self.root_directory + "\\output.txt"
+        status_path = self._status_path("build.status")
+
+        distro_name = None  # e.g. "Ubuntu-22.04"
+        # the terminal window has only just started; the build's outcome arrives through its status file
+        shelling.compile_in_wsl(cpp_files, distro=distro_name, root_path=root_path,
+                                custom_options=self.options,
+                                language_standard=self.cpp_standard.get(),
+                                executable_name=self.output_name.get(),
+                                linker=self.linker.get(),
+                                root_directory=self.root_directory,
+                                timeout=self._timeout(self.compile_timeout),
+                                status_path=status_path)
+        record = self._build_recorder("terminal", cpp_files, started)
+
+        def finished(rc: int, seconds: float):
+            if rc == 0:
+                print(f"Compilation succeeded in {seconds:.1f}s.")
+            else:
+                print("Compilation failed; fix errors then re-run.")
+            record({"ok": rc == 0, "seconds": seconds}, {"g++": seconds})
+        self._await_status(status_path, finished)
+
+
+    @staticmethod
+    def _timeout(var) -> Optional[float]:
+        """A timeout entry's value in seconds; None when it is empty, zero or not a number."""
+        try:
+            value = float(var.get())
+        except (tk.TclError, ValueError):
+            return None
+        return value if value > 0 else None
+
+    def _status_path(self, name: str) -> str:
+        """<root>/.nopaste/<name>, with the previous command's status removed."""
+        path = os.path.join(self.root_directory, shelling.RESPONSE_DIR, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return path
+
+    def _await_status(self, status_path: str, on_done, waited_ms: int = 0):
+        """Wait, without blocking Tk, for a terminal window's status file; on_done(exit code, seconds)."""
+        status = shelling.read_status_file(status_path)
+        if status is not None:
+            on_done(*status)
+        elif waited_ms < STATUS_WAIT_MS:
+            self.after(STATUS_POLL_MS, self._await_status, status_path, on_done, waited_ms + STATUS_POLL_MS)
+
+    def _build_recorder(self, mode: str, cpp_files, started: float):
+        """
+        record(stats, phases=None) storing the build in the project's history (in the background); the options
+        are read now, so changing them while the build runs does not mislabel it.
+        """
+        import history
+        store = history.History(self.root_directory)
+        target = self.output_name.get()
+        std = self.cpp_standard.get()
+        opts = {k: v.get() for k, v in self.options.items()}
+        files = len(shelling.expand_sources(cpp_files))
+
+        def record(stats: dict, phases=None):
+            phases = {**history.phase_totals(started), **(phases or {})}
+            self._run_in_background(lambda: store.record_build_result(target, mode, stats, std, opts, files, phases))
+        return record
+
+    def _record_run(self, mode: str, exit_code, seconds: float, **extra):
+        import history
+        store = history.History(self.root_directory)
+        target = self.output_name.get()
+        self._run_in_background(lambda: store.record_run(target, mode, exit_code, seconds, **extra))
+
+    def cancel_action(self):
+        """Stop every build and run started from here (each job's whole process group inside WSL)."""
+        import jobs
+        self._run_in_background(jobs.cancel_all, lambda count: print(f"Cancelled {count} job(s)"))
+
+    def _run_in_background(self, work, on_done=None, on_error=None):
+        """
+        Run work() on a worker thread and hand its result to on_done(result) on the Tk thread.
+        If work() raises, the error is printed and handed to on_error(exc) instead (e.g. to re-enable a button).
+        """
+        def target():
+            try:
+                result = work()
+            except Exception as exc:
+                print(f"Background task failed: {type(exc).__name__}: {exc}")
+                if on_error is not None:
+                    self.after(0, on_error, exc)
+                return
+            if on_done is not None:
+                self.after(0, on_done, result)
+
+        threading.Thread(target=target, daemon=True).start()
+
+    def judge_action(self):
+        import judge
+        if not self.root_directory:
+            messagebox.showwarning("Judge", "Select a project directory first.")
+            return
+        tests_dir = filedialog.askdirectory(title="Select directory with .in/.out files",
+                                            initialdir=self.judge_directory or self.root_directory)
+        if not tests_dir:
+            return
+        self.judge_directory = tests_dir
+        self._on_state_change()
+
+        root_directory = self.root_directory
+        out = self.output_name.get()
+        print(f"Judging {out} against {tests_dir} ...")
+
+        def on_result(result):
+            print(f"  {result.status:<7} {result.name} ({result.elapsed * 1000:.1f} ms)")
+
+        def work():
+            return judge.run_judge(tests_dir, root_directory, executable_name=out, on_result=on_result)
+
+        def done(results):
+            if not results:
+                messagebox.showinfo("Judge", f"No .in files found in {tests_dir}")
+                return
+            report = judge.format_report(results)
+            print(report)
+            messagebox.showinfo("Judge", report.splitlines()[-1])
+
+        self._run_in_background(work, done)
+
+    def test_action(self, failed_only: bool = False):
+        """Discover and run the project's test executables in parallel; results stream to the console."""
+        import history
+        import testrun
+        if not self.root_directory:
+            messagebox.showwarning("Tests", "Select a project directory first.")
+            return
+        root_directory = self.root_directory
+        out = self.output_name.get()
+
+        def on_result(result):
+            print(testrun.format_result(result))
+
+        def work():
+            if failed_only:
+                cases = testrun.load_failed(root_directory)
+            else:
+                binaries = testrun.find_test_binaries(root_directory, extra=[out])
+                cases = testrun.list_cases(root_directory, binaries) if binaries else []
+            if not cases:
+                return None
+            print(f"Running {len(cases)} test case(s) ...")
+            return testrun.run_tests(cases, root_directory, on_result=on_result)
+
+        def done(results):
+            if results is None:
+                messagebox.showinfo("Tests", "No failed tests recorded." if failed_only else
+                                    "No test executables found (executables with \"test\" in the name).")
+                return
+            report = testrun.format_report(results)
+            print(report)
+            store = history.History(root_directory)
+            self._run_in_background(lambda: store.record_tests(results))
+            messagebox.showinfo("Tests", report.splitlines()[-1])
+
+        self._run_in_background(work, done)
+
+    def check_action(self, report: bool = False):
+        """
+        Background `g++ -fsyntax-only` of the checked files that changed since their last check; each file's
+        error/warning counts become a badge on its tree node as soon as it is done. report: also say so when
+        nothing changed.
+        """
+        import check
+        if not self.root_directory or self.checker is None or self._checking:
+            return
+        cpp_files = self._gather_checked_paths()
+        if not cpp_files:
+            return
+        checker = self.checker
+        opts = {k: v.get() for k, v in self.options.items()}
+        std = self.cpp_standard.get()
+        self._checking = True
+
+        def on_result(result):
+            self.after(0, self._show_check_result, checker, result)
+
+        def done(results):
+            self._checking = False
+            if not results:
+                if report:
+                    print("Syntax check: nothing changed")
+                return
+            for result in results:
+                if result.output.strip():
+                    print(result.output.rstrip())
+            errors = sum(r.errors for r in results)
+            warnings = sum(r.warnings for r in results)
+            print(f"Syntax check: {len(results)} file(s), {errors} error(s), {warnings} warning(s)")
+
+        def work():
+            try:
+                return checker.check(cpp_files, opts, std, on_result=on_result)
+            except OSError as exc:
+                print(f"Syntax check failed to start: {exc}")
+                return []
+            except check.CheckFailed as exc:
+                print(exc)
+                print("Not checked: " + ", ".join(exc.unchecked))
+                return exc.checked
+
+        def failed(_exc):
+            self._checking = False
+
+        self._run_in_background(work, done, failed)
+
+    def _show_check_result(self, checker, result):
+        if checker is not self.checker:
+            return  # another root was opened meanwhile
+        path = checker.path_of(result.rel)
+        self.check_badges[path] = result.badge
+        item_id = self.path_to_id.get(path)
+        if item_id is not None and self.tree.exists(item_id):
+            self._set_check_state(item_id, self.checked_state.get(item_id, False))
+
+    def _poll_check(self):
+        if self.options["Syntax check"].get():
+            self.check_action()
+        self.after(CHECK_INTERVAL_MS, self._poll_check)
+
+    def captured_run(self, cmd: str, title: str, stdin_path=None, mode: str = "captured"):
+        """
+        Run cmd with its output in a bounded capture (ring buffer + spill file) shown in a viewer.
+        mode: how the run is labelled in the project's history.
+        """
+        import capture
+        output = capture.new_capture(self.root_directory)
+        print("doing this: ", cmd)
+        self.open_output_viewer(output, title)
+        timeout = self._timeout(self.run_timeout)
+
+        def done(result):
+            print(f"{title}: {capture.summary(result)}")
+            self._record_run(mode, result.returncode, result.seconds)
+
+        self._run_in_background(lambda: capture.run_captured(cmd, output, stdin_path=stdin_path, timeout=timeout),
+                                done)
+
+    def open_output_viewer(self, output, title: str):
+        """Pages through an OutputCapture without loading it: one READ_CHUNK page at a time."""
+        import capture
+        self._configure_popup_styles()
+        win = tk.Toplevel(self)
+        win.title(title)
+        win.configure(bg=BG)
+        win.geometry("900x560")
+
+        status = ttk.Label(win, text="")
+        status.pack(anchor="w", padx=12, pady=(8, 4))
+        frame = ttk.Frame(win)
+        frame.pack(fill="both", expand=True, padx=12)
+        text = tk.Text(frame, bg=CARD, fg=FG, insertbackground=FG, wrap="none", font=("Consolas", 10),
+                       borderwidth=0, highlightthickness=0)
+        scroll = ttk.Scrollbar(frame, orient="vertical", command=text.yview)
+        text.configure(yscrollcommand=scroll.set)
+        scroll.pack(side="right", fill="y")
+        text.pack(side="left", fill="both", expand=True)
+        view = {"offset": 0, "follow": tk.BooleanVar(value=True)}
+
+        def show(offset: int):
+            offset = capture.line_start(output, max(0, min(offset, output.total)))
+            view["offset"] = offset
+            data = output.read(offset, capture.READ_CHUNK)
+            text.configure(state="normal")
+            text.delete("1.0", "end")
+            text.insert("end", data.decode(errors="replace"))
+            text.configure(state="disabled")
+            status.configure(text=f"{capture.summary(output)}   showing "
+                                  f"{capture.format_size(offset)}-{capture.format_size(offset + len(data))}")
+
+        def head():
+            view["follow"].set(False)
+            show(0)
+
+        def tail():
+            show(output.total - capture.READ_CHUNK)
+            text.see("end")
+
+        def page(direction: int):
+            view["follow"].set(False)
+            show(view["offset"] + direction * capture.READ_CHUNK)
+
+        def poll():
+            if not win.winfo_exists():
+                return
+            if view["follow"].get():
+                tail()
+            else:
+                status.configure(text=capture.summary(output))
+            if not output.finished:
+                win.after(250, poll)
+            elif view["follow"].get():
+                tail()
+
+        def close():
+            output.close()
+            win.destroy()
+
+        buttons = ttk.Frame(win)
+        buttons.pack(fill="x", padx=12, pady=8)
+        ttk.Button(buttons, text="Head", command=head, style="Card.TButton").pack(side="left")
+        ttk.Button(buttons, text="◀ Page", command=lambda: page(-1), style="Card.TButton").pack(side="left", padx=6)
+        ttk.Button(buttons, text="Page ▶", command=lambda: page(1), style="Card.TButton").pack(side="left")
+        ttk.Button(buttons, text="Tail", command=tail, style="Card.TButton").pack(side="left", padx=6)
+        ttk.Checkbutton(buttons, text="Follow", variable=view["follow"],
+                        style="Card.TCheckbutton").pack(side="left", padx=6)
+        ttk.Button(buttons, text="Close", command=close, style="Accent.TButton").pack(side="right")
+        win.protocol("WM_DELETE_WINDOW", close)
+        poll()
+
+    def _ask_session(self, parent=None):
+        """Pick a recorded session directory; returns its name or None."""
+        import sessions
+        base = os.path.join(self.root_directory, sessions.SESSIONS_DIR)
+        if not sessions.list_sessions(self.root_directory):
+            messagebox.showinfo("Sessions", "No recorded sessions yet (use the \"record session\" run mode).",
+                                parent=parent)
+            return None
+        directory = filedialog.askdirectory(title="Select a recorded session", initialdir=base, parent=parent)
+        if not directory:
+            return None
+        name = os.path.basename(os.path.normpath(directory))
+        return name if name in sessions.list_sessions(self.root_directory) else None
+
+    def replay_action(self):
+        """Feed a recorded session's input to the current binary and diff its output with the recording."""
+        import sessions
+        if not self.root_directory:
+            messagebox.showwarning("Replay", "Select a project directory first.")
+            return
+        name = self._ask_session()
+        if name is None:
+            return
+        root_directory = self.root_directory
+        out = self.output_name.get()
+
+        def done(result):
+            if result is None:
+                messagebox.showerror("Replay", f"Session {name} cannot be replayed.")
+                return
+            print(result.summary())
+            if not result.matches:
+                print(result.diff())
+            messagebox.showinfo("Replay", result.summary())
+
+        self._run_in_background(lambda: sessions.replay(root_directory, name, out), done)
+
+    def daemon_compile(self, cpp_files, started: float):
+        """Incremental build through the shared compile server; output goes to the console."""
+        import daemon
+        request = dict(root_directory=self.root_directory, sources=cpp_files,
+                       options={k: v.get() for k, v in self.options.items()},
+                       cpp_standard=self.cpp_standard.get(), output_file_name=self.output_name.get(),
+                       linker=self.linker.get(), remote_workers=self.remote_workers,
+                       remote_token=self.remote_token)
+
+        def done(reply):
+            if reply is None:
+                messagebox.showerror("Compile", "Could not start or reach the compile server.")
+            else:
+                record(reply, {"link": reply.get("link_seconds", 0.0)})
+                if not reply.get("ok"):
+                    print("Compilation failed; fix errors then re-run.")
+
+        record = self._build_recorder("daemon", cpp_files, started)
+        self._run_in_background(lambda: daemon.build(on_event=print, **request), done)
+
+    def run_action(self):
+        import sessions
+        out = self.output_name.get()
+        mode = self.run_mode.get()
+
+        if mode == "judge":
+            self.judge_action()
+            return
+        if mode == "tests":
+            self.test_action()
+            return
+        if mode == "record session":
+            if self.script_available is False:
+                messagebox.showwarning("Record session", "`script` was not found in WSL; install util-linux "
+                                                         "(e.g. sudo apt install util-linux) to record sessions.")
+                return
+            name = sessions.new_session_name()
+            print(f"Recording session {name} (replay it with the \"replay session\" run mode)")
+            shelling.run_wsl_command(sessions.record_command(self.root_directory, out, name), distro=None,
+                                     capture=False, keep_open="pause")
+            return
+        if mode == "replay session":
+            self.replay_action()
+            return
+        if mode == "run valgrind":
+            cmd = f"cd {shelling.windows_to_wsl(self.root_directory)} && valgrind --leak-check=full ./{out}"
+            self.captured_run(cmd, f"Valgrind: {out}", mode="valgrind")
+            return
+        if mode == "run captured":
+            stdin_path = filedialog.askopenfilename(title="Input file for stdin (Cancel: no input)",
+                                                    initialdir=self.judge_directory or self.root_directory)
+            cmd = f"cd {shelling.windows_to_wsl(self.root_directory)} && ./{out}"
+            self.captured_run(cmd, f"Output: {out}", stdin_path or None)
+            return
+        cmd = f"cd {shelling.windows_to_wsl(self.root_directory)} && ./{out}"
+
+        print("doing this: ", cmd)
+
+        status_path = self._status_path("run.status")
+        shelling.run_wsl_command(shelling.with_status_file(cmd, status_path), distro=None, capture=False,
+                                 keep_open="pause", timeout=self._timeout(self.run_timeout), job_name=f"run {out}")
+        self._await_status(status_path, lambda rc, seconds: self._record_run("terminal", rc, seconds))
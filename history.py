@@ -0,0 +1,349 @@
+import json
+import os
+import sqlite3
+import statistics
+import time
+from contextlib import closing
+from typing import Dict, List, Optional
+
+import shelling
+import tracing
+
+DB_FILE = "history.sqlite3"
+BUILD_THRESHOLD = 0.20  # a build this much slower than its baseline is a regression
+RUN_THRESHOLD = 0.10
+BASELINE = 5  # the baseline is the median of this many earlier records doing the same work (see _comparable)
+MIN_PHASE_CHANGE = 0.05  # seconds; smaller phase differences are noise, not a reason
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS builds (
+    id INTEGER PRIMARY KEY,
+    started REAL NOT NULL,
+    target TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    standard TEXT,
+    options TEXT,
+    files INTEGER,
+    compiled INTEGER,
+    cache_hits INTEGER,
+    ok INTEGER NOT NULL,
+    seconds REAL,
+    link_seconds REAL,
+    binary_size INTEGER,
+    phases TEXT
+);
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    started REAL NOT NULL,
+    target TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    build_id INTEGER,
+    exit_code INTEGER,
+    seconds REAL,
+    runs INTEGER,
+    min_seconds REAL,
+    detail TEXT
+);
+CREATE INDEX IF NOT EXISTS builds_target ON builds (target);
+CREATE INDEX IF NOT EXISTS runs_target ON runs (target);
+"""
+
+
+def enabled_options(custom_options) -> List[str]:
+    """Names of the enabled GUI options (tk vars or plain bools), sorted so they compare between records."""
+    if not custom_options:
+        return []
+    return sorted(name for name in custom_options if shelling.option_enabled(custom_options, name))
+
+
+def phase_totals(since: float) -> Dict[str, float]:
+    """Per-phase seconds from the tracing spans recorded since `since` (a time.perf_counter() value)."""
+    return {name: round(seconds, 4) for name, seconds in tracing.totals(since).items() if seconds >= 0.001}
+
+
+class Regression:
+    """The newest record of a target/mode that got slower than the median of the records before it."""
+
+    def __init__(self, kind: str, record: dict, baseline: float, reasons: List[str]):
+        self.kind = kind  # build | run
+        self.record = record
+        self.baseline = baseline
+        self.reasons = reasons
+
+    @property
+    def change(self) -> float:
+        return self.record["seconds"] / self.baseline - 1
+
+    def __str__(self) -> str:
+        when = time.strftime("%Y-%m-%d %H:%M", time.localtime(self.record["started"]))
+        text = (f"{when} {self.kind} {self.record['target']} ({self.record['mode']}): "
+                f"{self.record['seconds']:.2f}s vs {self.baseline:.2f}s ({self.change:+.0%})")
+        return text + (" - " + "; ".join(self.reasons) if self.reasons else "")
+
+
+class History:
+    """
+    Every build and run of a project, in <root>/.nopaste/history.sqlite3:
+    - builds: options, standard, file count, compiled / cache hits, per-phase timings (tracing spans), binary size
+    - runs: exit code and wall time; benchmarks keep their median and fastest run, tests their pass/fail counts
+    Each call opens its own connection, so the GUI's worker threads can record at the same time.
+    """
+
+    def __init__(self, root_directory: str):
+        self.root_directory = os.path.abspath(root_directory)
+        self.path = os.path.join(self.root_directory, shelling.RESPONSE_DIR, DB_FILE)
+
+    def _connect(self) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        conn.executescript(SCHEMA)
+        return conn
+
+    def _insert(self, table: str, values: dict) -> int:
+        columns = ", ".join(values)
+        marks = ", ".join("?" for _ in values)
+        try:
+            with closing(self._connect()) as conn, conn:
+                cursor = conn.execute(f"INSERT INTO {table} ({columns}) VALUES ({marks})", list(values.values()))
+                return cursor.lastrowid
+        except sqlite3.Error as exc:
+            print(f"Failed to record the {table[:-1]} in {self.path}: {exc}")
+            return 0
+
+    def binary_size(self, target: str) -> Optional[int]:
+        try:
+            return os.path.getsize(os.path.join(self.root_directory, target))
+        except OSError:
+            return None
+
+    def record_build(self,
+                     target: str,
+                     mode: str,
+                     ok: bool,
+                     seconds: float,
+                     language_standard: Optional[str] = None,
+                     custom_options=None,
+                     files: Optional[int] = None,
+                     compiled: Optional[int] = None,
+                     cache_hits: Optional[int] = None,
+                     link_seconds: Optional[float] = None,
+                     phases: Optional[Dict[str, float]] = None,
+                     started: Optional[float] = None) -> int:
+        """
+        Store one build; returns its id. mode: terminal | inline | incremental | daemon.
+        compiled/cache_hits are None for modes that compile everything in one g++ call.
+        """
+        return self._insert("builds", {
+            "started": started or time.time() - seconds, "target": target, "mode": mode,
+            "standard": language_standard, "options": json.dumps(enabled_options(custom_options)),
+            "files": files, "compiled": compiled, "cache_hits": cache_hits, "ok": int(bool(ok)),
+            "seconds": seconds, "link_seconds": link_seconds,
+            "binary_size": self.binary_size(target) if ok else None,
+            "phases": json.dumps({name: round(seconds, 4) for name, seconds in (phases or {}).items()})})
+
+    def record_build_result(self, target: str, mode: str, stats: dict, language_standard=None, custom_options=None,
+                            files: Optional[int] = None, phases=None) -> int:
+        """record_build() from builder.BuildResult.stats() (or the daemon's reply, which carries the same keys)."""
+        return self.record_build(target, mode, stats.get("ok", False), stats.get("seconds", 0.0),
+                                 language_standard, custom_options, files=files,
+                                 compiled=stats.get("compiled"), cache_hits=stats.get("reused"),
+                                 link_seconds=stats.get("link_seconds"), phases=phases)
+
+    def record_run(self,
+                   target: str,
+                   mode: str,
+                   exit_code: Optional[int],
+                   seconds: float,
+                   runs: int = 1,
+                   min_seconds: Optional[float] = None,
+                   detail: Optional[dict] = None,
+                   started: Optional[float] = None) -> int:
+        """
+        Store one run; returns its id. mode: terminal | captured | valgrind | bench | tests.
+        seconds is the wall time (bench: the median run). The run is linked to the target's latest build.
+        """
+        build = self.builds(target, limit=1)
+        return self._insert("runs", {
+            "started": started or time.time() - seconds, "target": target, "mode": mode,
+            "build_id": build[0]["id"] if build else None, "exit_code": exit_code, "seconds": seconds,
+            "runs": runs, "min_seconds": min_seconds, "detail": json.dumps(detail or {})})
+
+    def record_tests(self, results, target: str = "tests") -> int:
+        """
+        A testrun.run_tests() result as one run: summed case time, exit code = number of failed cases.
+        Cases that timed out or crashed are counted separately; their time says nothing about the code's speed.
+        """
+        failed = sum(result.status != "PASS" for result in results)
+        aborted = sum(result.status in ("TIMEOUT", "CRASH") for result in results)
+        detail = {"passed": len(results) - failed, "failed": failed, "aborted": aborted}
+        return self.record_run(target, "tests", failed, sum(result.seconds for result in results),
+                               runs=len(results), detail=detail)
+
+    def _select(self, table: str, where: str = "", params: Optional[list] = None, limit: int = 100) -> List[dict]:
+        params = list(params or [])
+        try:
+            with closing(self._connect()) as conn:
+                rows = conn.execute(f"SELECT * FROM {table} {where} ORDER BY id DESC LIMIT ?",
+                                    params + [limit]).fetchall()
+        except sqlite3.Error as exc:
+            print(f"Failed to read {self.path}: {exc}")
+            return []
+        records = [dict(row) for row in rows]
+        for record in records:
+            for column in ("options", "phases", "detail"):
+                if column in record:
+                    record[column] = json.loads(record[column] or ("[]" if column == "options" else "{}"))
+        return records
+
+    def builds(self, target: Optional[str] = None, limit: int = 100) -> List[dict]:
+        """Newest first."""
+        return self._select("builds", "WHERE target = ?" if target else "", [target] if target else [], limit)
+
+    def runs(self, target: Optional[str] = None, limit: int = 100) -> List[dict]:
+        """Newest first."""
+        return self._select("runs", "WHERE target = ?" if target else "", [target] if target else [], limit)
+
+    def build_by_id(self, build_id: Optional[int]) -> Optional[dict]:
+        if build_id is None:
+            return None
+        found = self._select("builds", "WHERE id = ?", [build_id], 1)
+        return found[0] if found else None
+
+    def trend(self, records: List[dict], baseline: int = BASELINE) -> Dict[int, float]:
+        """
+        {record id: change of its time against the median of the `baseline` earlier successful records doing the
+        same work (_comparable)}, for successful records that have a baseline. records: newest first.
+        No-op incremental builds get no trend and are no baseline: their time is only the up-to-date check.
+        """
+        changes = {}
+        for index, record in enumerate(records):
+            if not _succeeded(record) or not record["seconds"] or record.get("compiled") == 0:
+                continue
+            earlier = [other["seconds"] for other in records[index + 1:]
+                       if _comparable(record, other) and _succeeded(other) and other["seconds"]][:baseline]
+            if earlier:
+                changes[record["id"]] = record["seconds"] / statistics.median(earlier) - 1
+        return changes
+
+    def regressions(self, build_threshold: float = BUILD_THRESHOLD, run_threshold: float = RUN_THRESHOLD,
+                    baseline: int = BASELINE) -> List[Regression]:
+        """The latest build/run of each target and mode, where it is slower than its baseline by the threshold."""
+        found = []
+        for kind, records, threshold in (("build", self.builds(limit=1000), build_threshold),
+                                         ("run", self.runs(limit=1000), run_threshold)):
+            changes = self.trend(records, baseline)
+            latest = {}
+            for record in records:
+                latest.setdefault((record["target"], record["mode"]), record)
+            for record in latest.values():
+                change = changes.get(record["id"])
+                if change is None or change <= threshold:
+                    continue
+                previous = _previous(records, record)
+                reasons = (self.explain_build(record, previous) if kind == "build"
+                           else self.explain_run(record, previous))
+                found.append(Regression(kind, record, record["seconds"] / (1 + change), reasons))
+        return sorted(found, key=lambda regression: regression.record["started"], reverse=True)
+
+    @staticmethod
+    def explain_build(record: dict, previous: Optional[dict]) -> List[str]:
+        """What differs from the previous successful build: flags, inputs, cache hits, and the phases that grew."""
+        if previous is None:
+            return []
+        reasons = _option_changes(record, previous)
+        if record["files"] is not None and previous["files"] is not None and record["files"] != previous["files"]:
+            reasons.append(f"{record['files'] - previous['files']:+d} files")
+        if record["cache_hits"] is not None and previous["cache_hits"] is not None \
+                and record["cache_hits"] < previous["cache_hits"]:
+            reasons.append(f"{previous['cache_hits'] - record['cache_hits']} fewer cache hits "
+                           f"({record['compiled']} compiled)")
+        if record["binary_size"] and previous["binary_size"] and record["binary_size"] != previous["binary_size"]:
+            reasons.append(f"binary {record['binary_size'] - previous['binary_size']:+d} bytes")
+        grown = [(seconds - previous["phases"].get(name, 0.0), name) for name, seconds in record["phases"].items()]
+        for delta, name in sorted(grown, reverse=True)[:2]:
+            if delta >= MIN_PHASE_CHANGE:
+                reasons.append(f"{name} +{delta:.2f}s")
+        return reasons
+
+    def explain_run(self, record: dict, previous: Optional[dict]) -> List[str]:
+        """What changed since the previous successful run: a rebuild with other flags or a different binary size."""
+        if previous is None:
+            return []
+        reasons = []
+        if record["build_id"] != previous["build_id"]:
+            build, before = self.build_by_id(record["build_id"]), self.build_by_id(previous["build_id"])
+            if build is not None and before is not None:
+                reasons += _option_changes(build, before)
+                if build["binary_size"] and before["binary_size"] and build["binary_size"] != before["binary_size"]:
+                    reasons.append(f"binary {build['binary_size'] - before['binary_size']:+d} bytes")
+            if not reasons:
+                reasons.append("rebuilt since the previous run")
+        if record["detail"].get("failed") != previous["detail"].get("failed"):
+            reasons.append(f"{record['detail'].get('failed')} failing (was {previous['detail'].get('failed')})")
+        return reasons
+
+
+def _succeeded(record: dict) -> bool:
+    """Builds that worked; runs that exited 0, or test runs in which no case timed out or crashed."""
+    if "ok" in record:
+        return bool(record["ok"])
+    if record["mode"] == "tests":
+        return not record["detail"].get("aborted")
+    return record["exit_code"] == 0
+
+
+def _comparable(record: dict, other: dict) -> bool:
+    """
+    Whether other did the same work as record: same target and mode; builds also the same standard, options and
+    number of compiled units (None for the modes that compile everything in one g++ call).
+    """
+    if other["target"] != record["target"] or other["mode"] != record["mode"]:
+        return False
+    if "ok" not in record:
+        return True
+    return (other["standard"] == record["standard"] and other["options"] == record["options"]
+            and other["compiled"] == record["compiled"])
+
+
+def _previous(records: List[dict], record: dict) -> Optional[dict]:
+    """The successful record of the same target and mode just before `record` (records are newest first)."""
+    index = records.index(record)
+    return next((other for other in records[index + 1:] if other["target"] == record["target"]
+                 and other["mode"] == record["mode"] and _succeeded(other)), None)
+
+
+def _option_changes(record: dict, previous: dict) -> List[str]:
+    reasons = []
+    added = [name for name in record["options"] if name not in previous["options"]]
+    removed = [name for name in previous["options"] if name not in record["options"]]
+    if added or removed:
+        reasons.append("options " + " ".join([f"+{name}" for name in added] + [f"-{name}" for name in removed]))
+    if record["standard"] != previous["standard"]:
+        reasons.append(f"standard {previous['standard']} -> {record['standard']}")
+    return reasons
+
+
+def format_build(record: dict, change: Optional[float] = None) -> str:
+    when = time.strftime("%Y-%m-%d %H:%M", time.localtime(record["started"]))
+    status = "ok" if record["ok"] else "FAILED"
+    cache = f"{record['compiled']} compiled/{record['cache_hits']} cached" if record["compiled"] is not None else ""
+    size = f"{record['binary_size']} B" if record["binary_size"] else ""
+    trend = f"{change:+.0%}" if change is not None else ""
+    return (f"{when}  {record['target']:<14} {record['mode']:<11} {status:<6} {record['seconds']:>8.2f}s {trend:>6}  "
+            f"{cache:<22} {size:>12}  {record['standard'] or ''} {' '.join(record['options'])}")
+
+
+def run_detail(record: dict) -> str:
+    if record["mode"] == "tests":
+        return f"{record['detail'].get('passed', 0)} passed, {record['detail'].get('failed', 0)} failed"
+    if record["min_seconds"] is not None:
+        return f"{record['runs']} runs, fastest {record['min_seconds']:.3f}s"
+    return ""
+
+
+def format_run(record: dict, change: Optional[float] = None) -> str:
+    when = time.strftime("%Y-%m-%d %H:%M", time.localtime(record["started"]))
+    trend = f"{change:+.0%}" if change is not None else ""
+    return (f"{when}  {record['target']:<14} {record['mode']:<9} exit {record['exit_code']!s:<4} "
+            f"{record['seconds']:>8.3f}s {trend:>6}  {run_detail(record)}")
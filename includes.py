@@ -0,0 +1,333 @@
+import os
+import re
+import secrets
+import shlex
+import subprocess
+from typing import Dict, List, Optional, Set
+
+import capture
+import check
+import jobs
+import shelling
+
+DEFAULT_TOP = 30
+FORWARD_DECLARE_MIN_BYTES = 4096  # smaller headers are not worth a suggestion
+# names a few heavy standard headers provide; an includer that mentions none of them probably does not need it
+STD_HEADER_NAMES = {
+    "iostream": ("cout", "cin", "cerr", "clog", "endl", "ostream", "istream", "ios_base", "ws"),
+    "sstream": ("stringstream", "istringstream", "ostringstream"),
+    "fstream": ("fstream", "ifstream", "ofstream"),
+    "iomanip": ("setw", "setprecision", "setfill", "fixed", "put_time", "quoted"),
+    "regex": ("regex", "smatch", "cmatch", "regex_match", "regex_search", "regex_replace"),
+    "algorithm": ("sort", "find", "min", "max", "swap", "reverse", "count", "copy", "fill", "lower_bound",
+                  "upper_bound", "unique", "transform", "accumulate", "any_of", "all_of", "none_of", "remove",
+                  "replace", "binary_search", "equal", "next_permutation", "max_element", "min_element"),
+    "functional": ("function", "bind", "hash", "less", "greater", "plus", "ref", "cref", "invoke"),
+    "string": ("string", "to_string", "stoi", "stol", "stoll", "stod", "getline", "wstring"),
+    "vector": ("vector",),
+    "map": ("map", "multimap"),
+    "unordered_map": ("unordered_map", "unordered_multimap"),
+    "set": ("set", "multiset"),
+    "unordered_set": ("unordered_set", "unordered_multiset"),
+    "random": ("mt19937", "random_device", "uniform_int_distribution", "uniform_real_distribution",
+               "default_random_engine", "normal_distribution"),
+    "chrono": ("chrono",),
+    "thread": ("thread", "this_thread", "jthread"),
+}
+INCLUDE_RE = re.compile(r'^\s*#\s*include\s*([<"])([^>"]+)[>"]', re.MULTILINE)
+DECLARED_RE = re.compile(r"\b(?:class|struct|union|enum(?:\s+class)?|namespace|using|typedef[^;]*?)\s+(\w+)"
+                         r"|^\s*#\s*define\s+(\w+)"
+                         r"|^[\w:<>,*& \t]+?[\s*&](\w+)\s*\([^;{)]*\)\s*(?:const\s*)?[;{]", re.MULTILINE)
+TYPE_RE = re.compile(r"\b(?:class|struct|union)\s+(\w+)\s*(?:final\s*)?[:{]")
+
+
+class HeaderCost:
+    """One header's cost summed over every TU that pulls it in."""
+
+    def __init__(self, path: str):
+        self.path = path  # root-relative for project headers, absolute for system headers
+        self.tus: Set[str] = set()
+        self.includers: Set[str] = set()  # files that #include it directly
+        self.opened = 0  # times the preprocessor opened it (include guards stop most repeats)
+        self.own_bytes = 0  # preprocessed bytes of the header itself
+        self.total_bytes = 0  # own bytes plus everything it includes, per TU, summed
+
+    @property
+    def is_project(self) -> bool:
+        return not self.path.startswith("/")
+
+
+class Suggestion:
+    def __init__(self, kind: str, includer: str, header: str, reason: str):
+        self.kind = kind  # forward-declare | unused
+        self.includer = includer
+        self.header = header
+        self.reason = reason
+
+    def __str__(self) -> str:
+        return f"{self.includer}: {self.kind} {self.header} ({self.reason})"
+
+
+class TuIncludes:
+    """The include tree of one TU (from -H, in order) and the preprocessed bytes of each file (from -E)."""
+
+    def __init__(self, rel: str, tree: List[tuple], own_bytes: Dict[str, int], ok: bool = True, output: str = ""):
+        self.rel = rel
+        self.tree = tree  # [(depth, path)], depth 1 = included by the TU itself
+        self.own_bytes = own_bytes
+        self.ok = ok
+        self.output = output  # compiler errors when preprocessing failed
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(self.own_bytes.values())
+
+
+class IncludeReport:
+    def __init__(self, tus: List[TuIncludes], headers: Dict[str, HeaderCost], suggestions: List[Suggestion]):
+        self.tus = tus
+        self.headers = headers
+        self.suggestions = suggestions
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(tu.total_bytes for tu in self.tus)
+
+    def ranked(self, by: str = "bytes", top: Optional[int] = None) -> List[HeaderCost]:
+        key = {"bytes": lambda h: h.total_bytes, "count": lambda h: (len(h.tus), h.total_bytes),
+               "own": lambda h: h.own_bytes}[by]
+        rows = sorted(self.headers.values(), key=key, reverse=True)
+        return rows[:top] if top else rows
+
+
+# --- collection ----------------------------------------------------------------------------------
+
+def parse_tree(text: str) -> List[tuple]:
+    """`g++ -H` output -> [(depth, path)]; the "Multiple include guards may be useful for:" list is skipped."""
+    tree = []
+    for line in text.splitlines():
+        match = re.match(r"^(\.+) (.+)$", line)
+        if match:
+            path = match.group(2)
+            tree.append((len(match.group(1)), path[2:] if path.startswith("./") else path))
+    return tree
+
+
+def parse_bytes(text: str) -> Dict[str, int]:
+    """"<bytes> <file>" lines (see BYTES_AWK) -> {file: bytes}."""
+    sizes = {}
+    for line in text.splitlines():
+        size, _sep, path = line.partition(" ")
+        if size.isdigit() and path and not path.startswith("<"):
+            path = path[2:] if path.startswith("./") else path
+            sizes[path] = sizes.get(path, 0) + int(size)
+    return sizes
+
+
+# bytes of preprocessed output per file, attributed through the `# <line> "<file>" <flags>` line markers
+BYTES_AWK = ("LC_ALL=C awk '/^# [0-9]+ \"/ { f = substr($0, index($0, \"\\\"\") + 1); "
+             "f = substr(f, 1, index(f, \"\\\"\") - 1); next } { b[f] += length($0) + 1 } "
+             "END { for (k in b) print b[k], k }'")
+
+
+def collect(root_directory: str,
+            sources: List[str],
+            custom_options=None,
+            language_standard: Optional[str] = None,
+            parallel: Optional[int] = None,
+            distro: Optional[str] = None,
+            on_tu=None) -> List[TuIncludes]:
+    """
+    Preprocess every TU with the build's flags (`g++ -E -H`, nothing is compiled), up to `parallel` at a time
+    in one WSL shell. on_tu(TuIncludes) is called as each TU finishes.
+    Raises RuntimeError when the shell fails (WSL, mktemp, cd, cancelled) or a TU never reports back.
+    """
+    root = os.path.abspath(root_directory)
+    rels = [os.path.relpath(os.path.abspath(p), root).replace("\\", "/") for p in shelling.expand_sources(sources)
+            if p.endswith(shelling.SOURCE_EXTENSIONS)]
+    if not rels:
+        return []
+    flags = check.check_flags(custom_options, language_standard)
+    marker = "@@NOPASTE-" + secrets.token_hex(4)
+    parallel = max(1, parallel or os.cpu_count() or 1)
+    flag_text = " ".join(shlex.quote(f) for f in flags)
+    root_path = shelling.translate_paths([root])[0]
+    lines = [f"cd {shlex.quote(root_path)} && T=$(mktemp -d) && trap 'rm -rf \"$T\"' EXIT || exit 1",
+             f"pp() {{ {{ g++ -E -H {flag_text} -IHeaders -ISources \"$2\" 2> \"$T/$1.h\"; echo $? > \"$T/$1.rc\"; }} "
+             f"| {BYTES_AWK} > \"$T/$1.b\"; "
+             f"{{ echo '{marker} tree'; cat \"$T/$1.h\"; echo '{marker} bytes'; cat \"$T/$1.b\"; "
+             f"echo \"{marker} end $1 $(cat \"$T/$1.rc\")\"; }} > \"$T/$1.msg\"; flock \"$T\" cat \"$T/$1.msg\"; }}"]
+    for index, rel in enumerate(rels):
+        lines.append(f"while [ $(jobs -rp | wc -l) -ge {parallel} ]; do wait -n; done; pp {index} {shlex.quote(rel)} &")
+    lines.append("wait")
+
+    job = jobs.Job(f"include analysis ({len(rels)} files)", distro=distro)
+    proc = subprocess.Popen(shelling.wsl_args(job.wrap("\n".join(lines)), distro=distro), stdout=subprocess.PIPE,
+                            stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL, text=True, errors="replace")
+    job.attach(proc)
+    results = []
+    tree: List[str] = []
+    sizes: List[str] = []
+    stray: List[str] = []  # shell output outside a TU's block: why the shell failed
+    target = stray
+    try:
+        for line in proc.stdout:
+            if line.startswith(marker + " tree"):
+                tree, sizes = [], []
+                target = tree
+                continue
+            if line.startswith(marker + " bytes"):
+                target = sizes
+                continue
+            if not line.startswith(marker + " end "):
+                target.append(line)
+                continue
+            target = stray
+            try:
+                _end, index, rc = line[len(marker) + 1:].split()
+                rel = rels[int(index)]
+            except (ValueError, IndexError):
+                continue
+            text = "".join(tree)
+            # -H lines start with dots; anything else on stderr is a diagnostic
+            errors = "\n".join(l for l in text.splitlines() if not l.startswith(".") and ": " in l)
+            tu = TuIncludes(rel, parse_tree(text), parse_bytes("".join(sizes)), rc == "0", errors)
+            results.append(tu)
+            if on_tu is not None:
+                on_tu(tu)
+        returncode = proc.wait()
+    finally:
+        job.finish()
+    missing = sorted(set(rels) - {tu.rel for tu in results})
+    if returncode != 0 or missing:
+        reason = "cancelled" if job.cancelled else f"shell exited with {returncode}"
+        detail = "".join(stray).strip()[-1000:]
+        raise RuntimeError(f"include analysis failed ({reason}); no result for {len(missing)} TU(s)"
+                           + (f": {', '.join(missing[:10])}" if missing else "") + (f"\n{detail}" if detail else ""))
+    return results
+
+
+# --- analysis ------------------------------------------------------------------------------------
+
+def header_costs(tus: List[TuIncludes]) -> Dict[str, HeaderCost]:
+    headers: Dict[str, HeaderCost] = {}
+    for tu in tus:
+        counted: Set[str] = set()  # own bytes go to the first time a header is opened in this TU
+        # subtree bytes: a header's own bytes plus those of every deeper entry until the depth drops back
+        stack: List[tuple] = []  # [(depth, HeaderCost, bytes so far)]
+
+        def close(until_depth):
+            while stack and stack[-1][0] >= until_depth:
+                _depth, cost, subtotal = stack.pop()
+                cost.total_bytes += subtotal
+                if stack:
+                    stack[-1] = (stack[-1][0], stack[-1][1], stack[-1][2] + subtotal)
+
+        parents = [tu.rel]
+        for depth, path in tu.tree:
+            close(depth)
+            del parents[depth:]
+            cost = headers.setdefault(path, HeaderCost(path))
+            cost.tus.add(tu.rel)
+            cost.includers.add(parents[-1])
+            cost.opened += 1
+            own = 0
+            if path not in counted:
+                counted.add(path)
+                own = tu.own_bytes.get(path, 0)
+                cost.own_bytes += own
+            stack.append((depth, cost, own))
+            parents.append(path)
+        close(1)
+    return headers
+
+
+def _read(root_directory: str, rel: str) -> str:
+    try:
+        with open(os.path.join(root_directory, rel), "r", encoding="utf-8", errors="replace") as handle:
+            return handle.read()
+    except OSError:
+        return ""
+
+
+def _strip_comments(text: str) -> str:
+    return re.sub(r"//[^\n]*|/\*.*?\*/", " ", text, flags=re.DOTALL)
+
+
+def declared_names(text: str) -> Set[str]:
+    """Rough set of the names a header declares (types, namespaces, aliases, macros, functions)."""
+    names = set()
+    for match in DECLARED_RE.finditer(_strip_comments(text)):
+        name = next((g for g in match.groups() if g), None)
+        if name and name not in ("std", "detail"):
+            names.add(name)
+    return names
+
+
+def _include_targets(text: str) -> Dict[str, str]:
+    """{spelled include: "<" or '"'} of a file's own #include lines."""
+    return {match.group(2): match.group(1) for match in INCLUDE_RE.finditer(text)}
+
+
+def suggest(root_directory: str, headers: Dict[str, HeaderCost]) -> List[Suggestion]:
+    """
+    Heuristic hints, cheapest to act on first:
+    - forward-declare: a project header includes another project header but only uses its classes through
+      pointers or references, so `class X;` would do
+    - unused: an includer mentions none of the names a project header declares (or, for a few heavy standard
+      headers, none of the names in STD_HEADER_NAMES)
+    Includers outside the root are not looked at. Macros and ADL can make these wrong; they are hints.
+    """
+    suggestions = []
+    texts: Dict[str, str] = {}
+
+    def text_of(rel):
+        if rel not in texts:
+            texts[rel] = _strip_comments(_read(root_directory, rel))
+        return texts[rel]
+
+    for cost in headers.values():
+        name = os.path.basename(cost.path)
+        own_code = text_of(cost.path) if cost.is_project else ""
+        declared = declared_names(own_code) if cost.is_project else set(STD_HEADER_NAMES.get(name, ()))
+        if not declared:
+            continue
+        types = set(TYPE_RE.findall(own_code)) if cost.is_project else set()
+        for includer in sorted(cost.includers):
+            if includer.startswith("/"):
+                continue
+            code = text_of(includer)
+            if not any(spelled == name or spelled.endswith("/" + name) for spelled in _include_targets(code)):
+                continue  # reached through a path that is spelled differently; leave it alone
+            body = INCLUDE_RE.sub("", code)
+            used = {n for n in declared if re.search(rf"\b{re.escape(n)}\b", body)}
+            size = f"{capture.format_size(cost.total_bytes // max(1, len(cost.tus)))} per TU"
+            if not used:
+                suggestions.append(Suggestion("unused", includer, cost.path, f"none of its names are used, {size}"))
+                continue
+            if not cost.is_project or not includer.endswith((".h", ".hpp", ".hh", ".hxx")) or not types or \
+                    used - types or cost.total_bytes < FORWARD_DECLARE_MIN_BYTES * len(cost.tus):
+                continue
+            by_value = [t for t in used if re.search(rf"\b{re.escape(t)}\b(?!\s*[*&])(?!\s*::)", body)]
+            if not by_value:
+                suggestions.append(Suggestion("forward-declare", includer, cost.path,
+                                              f"only {', '.join(sorted(used))} through pointers/references, {size}"))
+    order = {"unused": 0, "forward-declare": 1}
+    return sorted(suggestions, key=lambda s: (order[s.kind], -headers[s.header].total_bytes))
+
+
+def analyze(root_directory: str,
+            sources: List[str],
+            custom_options=None,
+            language_standard: Optional[str] = None,
+            parallel: Optional[int] = None,
+            distro: Optional[str] = None,
+            on_tu=None) -> IncludeReport:
+    tus = collect(root_directory, sources, custom_options, language_standard, parallel, distro, on_tu)
+    headers = header_costs([tu for tu in tus if tu.ok])
+    return IncludeReport(tus, headers, suggest(root_directory, headers))
+
+
+def format_row(cost: HeaderCost) -> str:
+    return (f"{capture.format_size(cost.total_bytes):>10}  {capture.format_size(cost.own_bytes):>10}  "
+            f"{len(cost.tus):5}  {cost.opened:6}  {cost.path}")
@@ -0,0 +1,217 @@
+import itertools
+import os
+import shlex
+import subprocess
+import threading
+import time
+from typing import Dict, List, Optional
+
+import shelling
+
+PID_DIR = "/tmp/nopaste-jobs"  # Linux side; one file per running job holding its process group / wrapper pid
+KILL_GRACE = 0.2  # seconds between SIGTERM and SIGKILL
+
+_ids = itertools.count(1)
+_jobs: Dict[int, "Job"] = {}
+_lock = threading.Lock()
+
+
+class Job:
+    """
+    One build or run, tracked so it can be cancelled as a whole:
+    - batch jobs run in their own session (setsid), so `kill -- -PGID` reaches every compiler/child at once
+    - interactive jobs (terminal windows) keep the terminal's foreground group so Ctrl+C and /dev/tty still
+      work; they are cancelled by killing the recorded pid's process tree (grandchildren such as cc1plus too).
+      Their timeout only covers the command: once it is done the window (e.g. its "press any key") is left alone
+    - on Windows the wsl.exe process tree is also ended with taskkill /T, natively the Popen is killed
+    """
+
+    def __init__(self, name: str, distro: Optional[str] = None, interactive: bool = False,
+                 timeout: Optional[float] = None):
+        self.id = next(_ids)
+        self.name = name
+        self.distro = distro
+        self.interactive = interactive
+        self.timeout = timeout or None
+        self.proc: Optional[subprocess.Popen] = None
+        self.started = time.time()
+        self.cancelled = False
+        self.timed_out = False
+        self.detached = False  # the Popen is a launcher (wt.exe) that exits while the job keeps running
+        self.command_done = False  # interactive jobs: the command ended (its window may still be open)
+        self._timer: Optional[threading.Timer] = None
+
+    @property
+    def pid_file(self) -> str:
+        return f"{PID_DIR}/{os.getpid()}-{self.id}"
+
+    def wrap(self, cmd: str) -> str:
+        """
+        The shell command that runs cmd while publishing its pid, and cleans the pid file up afterwards.
+        Interactive jobs also leave a .done file, so command_running() can tell "finished" from "not started yet".
+        """
+        inner = f"echo $$ > {self.pid_file}; {cmd}"
+        runner = "bash -c" if self.interactive else "setsid -w bash -c"
+        done = f"touch {self.pid_file}.done; " if self.interactive else ""
+        return (f"mkdir -p {PID_DIR} && {runner} {shlex.quote(inner)}; "
+                f"rc=$?; rm -f {self.pid_file}; {done}(exit $rc)")
+
+    def attach(self, proc: subprocess.Popen):
+        self.proc = proc
+        with _lock:
+            _jobs[self.id] = self
+        if self.timeout:
+            self._timer = threading.Timer(self.timeout, self._expire)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def finish(self):
+        if self._timer is not None:
+            self._timer.cancel()
+        with _lock:
+            _jobs.pop(self.id, None)
+
+    def _expire(self):
+        if self.interactive and not self.command_running():
+            # the command is done and its window is only waiting for a key press: leave the output on screen
+            self.finish()
+            return
+        self.timed_out = True
+        print(f"{self.name}: timed out after {self.timeout:g}s, stopping it")
+        self.cancel()
+
+    def command_running(self) -> bool:
+        """Interactive jobs: False once the wrapped command ended (wrap() leaves a .done file, removed here)."""
+        if self.command_done:
+            return False
+        done_file = self.pid_file + ".done"
+        if shelling.is_native():
+            try:
+                os.remove(done_file)
+                self.command_done = True
+            except OSError:
+                pass
+            return not self.command_done
+        try:
+            cp = subprocess.run(shelling.wsl_args(f"rm {done_file} 2>/dev/null", distro=self.distro),
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, stdin=subprocess.DEVNULL,
+                                timeout=10)
+        except (OSError, subprocess.TimeoutExpired):
+            return True
+        self.command_done = cp.returncode == 0
+        return not self.command_done
+
+    @property
+    def running(self) -> bool:
+        # detached jobs stay listed until cancelled; cancelling a finished job is a no-op (its pid file is gone)
+        return self.detached or self.proc is None or self.proc.poll() is None
+
+    def cancel(self):
+        if self.interactive and not self.command_running():
+            self.finish()  # finished; closing its window would only hide the output
+            return
+        self.cancelled = True
+        if self.proc is not None and self.proc.poll() is None and os.name == "nt":
+            # ends the Windows side (and the output stream) at once; the Linux processes are signalled below
+            subprocess.run(["taskkill", "/T", "/F", "/PID", str(self.proc.pid)],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        if shelling.is_native():
+            self._signal_native()
+        else:
+            self._signal_in_wsl()
+        if self.proc is not None and self.proc.poll() is None and os.name != "nt":
+            self.proc.kill()
+        self.finish()
+
+    def _signal_in_wsl(self):
+        kill_tree = "kt() { for c in $(pgrep -P \"$1\"); do kt \"$c\" \"$2\"; done; kill -\"$2\" \"$1\" 2>/dev/null; }; "
+        signal_group = "kt \"$P\" {sig}" if self.interactive else "kill -{sig} -- -\"$P\" 2>/dev/null"
+        cmd = (f"{kill_tree}P=$(cat {self.pid_file} 2>/dev/null) && [ -n \"$P\" ] && {{ "
+               f"{signal_group.format(sig='TERM')}; sleep {KILL_GRACE}; {signal_group.format(sig='KILL')}; "
+               f"rm -f {self.pid_file}; }}; rm -f {self.pid_file}.done; true")
+        try:
+            subprocess.run(shelling.wsl_args(cmd, distro=self.distro), stdout=subprocess.DEVNULL,
+                           stderr=subprocess.DEVNULL, stdin=subprocess.DEVNULL, timeout=10)
+        except (OSError, subprocess.TimeoutExpired) as exc:
+            print(f"Could not signal {self.name} inside WSL: {exc}")
+
+    def _signal_native(self):
+        """Same as _signal_in_wsl without starting a shell: read the pid file and signal directly."""
+        import signal
+        try:
+            with open(self.pid_file, "r", encoding="utf-8") as handle:
+                pid = int(handle.read().strip())
+        except (OSError, ValueError):
+            return
+        def send(sig) -> bool:
+            try:
+                if self.interactive:
+                    # the whole tree (g++ -> cc1plus, ...), found again each time in case it forked meanwhile
+                    for child in _descendants(pid):
+                        try:
+                            os.kill(child, sig)
+                        except ProcessLookupError:
+                            pass
+                    os.kill(pid, sig)
+                else:
+                    os.killpg(pid, sig)
+            except (ProcessLookupError, PermissionError):
+                return False
+            return True
+
+        if send(signal.SIGTERM):
+            deadline = time.time() + KILL_GRACE
+            while time.time() < deadline and send(0):
+                time.sleep(0.01)
+            if send(0):
+                send(signal.SIGKILL)
+        if self.interactive:
+            time.sleep(0.05)  # the wrapper touches the .done file right after the command dies
+            try:
+                os.remove(self.pid_file + ".done")
+            except OSError:
+                pass
+
+
+def _descendants(pid: int) -> List[int]:
+    """Every process below pid, deepest first."""
+    try:
+        out = subprocess.run(["pgrep", "-P", str(pid)], capture_output=True, text=True).stdout
+    except OSError:
+        return []
+    found = []
+    for child in (int(p) for p in out.split()):
+        found += _descendants(child) + [child]
+    return found
+
+
+def communicate(job: Job, proc: subprocess.Popen, input=None):
+    """proc.communicate() for a job; returns (stdout, stderr) even if the job was cancelled or timed out."""
+    job.attach(proc)
+    try:
+        stdout, stderr = proc.communicate(input)
+    finally:
+        job.finish()
+    if job.timed_out:
+        stderr = (stderr or "") + f"\n[stopped: timed out after {job.timeout:g}s]"
+    elif job.cancelled:
+        stderr = (stderr or "") + "\n[stopped: cancelled]"
+    return stdout, stderr
+
+
+def running_jobs() -> List[Job]:
+    with _lock:
+        for job_id in [job_id for job_id, job in _jobs.items() if not job.running]:
+            del _jobs[job_id]
+        return list(_jobs.values())
+
+
+def cancel_all() -> int:
+    """Cancel every tracked build and run; returns how many were stopped."""
+    jobs = running_jobs()
+    threads = [threading.Thread(target=job.cancel, daemon=True) for job in jobs]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return len(jobs)
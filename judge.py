@@ -0,0 +1,206 @@
+import os
+import shlex
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+
+import shelling
+
+DEFAULT_TIME_LIMIT = 2.0  # seconds per case
+DEFAULT_MEMORY_LIMIT_MB = 256
+EXPECTED_EXTENSIONS = (".out", ".ans")
+CHUNK_SIZE = 64 * 1024
+STDERR_TAIL_BYTES = 4096
+RSS_MARKER = "NOPASTE_MAXRSS"
+REAL_MARKER = "NOPASTE_REAL"
+
+
+class CaseResult:
+    def __init__(self, name: str, status: str, elapsed: float, max_rss_kb: Optional[int] = None, detail: str = ""):
+        self.name = name
+        self.status = status  # PASS | FAIL | TLE | MLE | RE | NO-OUT
+        self.elapsed = elapsed
+        self.max_rss_kb = max_rss_kb
+        self.detail = detail
+
+    def __repr__(self):
+        return f"CaseResult({self.name!r}, {self.status!r}, {self.elapsed:.3f}s)"
+
+
+def discover_cases(tests_dir: str) -> List[Tuple[str, str, Optional[str]]]:
+    """
+    Find `<name>.in` files in tests_dir and pair them with `<name>.out` (or `<name>.ans`).
+    Returns a sorted list of (name, input_path, expected_path_or_None).
+    """
+    cases = []
+    for entry in os.scandir(tests_dir):
+        if not entry.is_file() or not entry.name.endswith(".in"):
+            continue
+        stem = entry.name[:-3]
+        expected = None
+        for ext in EXPECTED_EXTENSIONS:
+            candidate = os.path.join(tests_dir, stem + ext)
+            if os.path.isfile(candidate):
+                expected = candidate
+                break
+        cases.append((stem, entry.path, expected))
+    cases.sort(key=lambda c: c[0].lower())
+    return cases
+
+
+def iter_tokens(stream: BinaryIO) -> Iterator[bytes]:
+    """Yield whitespace separated tokens from a binary stream, reading it in fixed-size chunks."""
+    pending = b""
+    while True:
+        chunk = stream.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        pieces = (pending + chunk).split()
+        # the last piece may continue in the next chunk unless the chunk ended on whitespace
+        if pieces and not chunk[-1:].isspace():
+            pending = pieces.pop()
+        else:
+            pending = b""
+        yield from pieces
+    if pending:
+        yield pending
+
+
+def compare_streams(actual: BinaryIO, expected: BinaryIO) -> Tuple[bool, str]:
+    """
+    Compare two outputs token by token (whitespace differences are ignored).
+    Never holds more than one chunk of either stream in memory.
+    """
+    actual_tokens = iter_tokens(actual)
+    expected_tokens = iter_tokens(expected)
+    index = 0
+    while True:
+        got = next(actual_tokens, None)
+        want = next(expected_tokens, None)
+        if got is None and want is None:
+            return True, ""
+        if got != want:
+            got_text = "<end of output>" if got is None else got[:40].decode(errors="replace")
+            want_text = "<end of output>" if want is None else want[:40].decode(errors="replace")
+            return False, f"token {index}: expected {want_text!r}, got {got_text!r}"
+        index += 1
+
+
+def build_case_command(root_path: str, executable_name: str, time_limit: float, memory_limit_mb: int) -> str:
+    """
+    Shell command that runs the binary under a time limit and an address-space limit.
+    The program's own wall time (bash `time`) and peak RSS (GNU time, when installed) are
+    reported on stderr, so the WSL start-up cost is not counted against the case.
+    """
+    limit_kb = int(memory_limit_mb) * 1024
+    binary = "./" + shlex.quote(executable_name)
+    timed = f"timeout -k 1 {time_limit:g} {binary}"
+    return (f"cd {root_path} && ulimit -v {limit_kb} && TIMEFORMAT='{REAL_MARKER} %R' && "
+            f"if [ -x /usr/bin/time ]; then time /usr/bin/time -f '{RSS_MARKER} %M' {timed}; "
+            f"else time {timed}; fi")
+
+
+def _drain_tail(stream: BinaryIO, sink: list):
+    tail = b""
+    for chunk in iter(lambda: stream.read(CHUNK_SIZE), b""):
+        tail = (tail + chunk)[-STDERR_TAIL_BYTES:]
+    sink.append(tail)
+
+
+def run_case(name: str, input_path: str, expected_path: Optional[str], command: str,
+             time_limit: float, memory_limit_mb: int, distro: Optional[str] = None) -> CaseResult:
+    args = shelling.wsl_args(command, distro=distro)
+    start = time.perf_counter()
+    with open(input_path, "rb") as stdin:
+        proc = subprocess.Popen(args, stdin=stdin, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        stderr_tail: list = []
+        drain = threading.Thread(target=_drain_tail, args=(proc.stderr, stderr_tail), daemon=True)
+        drain.start()
+
+        matched, detail = True, ""
+        if expected_path is not None:
+            with open(expected_path, "rb") as expected:
+                matched, detail = compare_streams(proc.stdout, expected)
+        # keep reading so the program never blocks on a full pipe
+        for _ in iter(lambda: proc.stdout.read(CHUNK_SIZE), b""):
+            pass
+        try:
+            returncode = proc.wait(timeout=time_limit + 5)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            returncode = proc.wait()
+        drain.join()
+    elapsed = time.perf_counter() - start
+
+    stderr_text = stderr_tail[0].decode(errors="replace") if stderr_tail else ""
+    max_rss_kb = None
+    for line in stderr_text.splitlines():
+        try:
+            if line.startswith(RSS_MARKER):
+                max_rss_kb = int(line.split()[1])
+            elif line.startswith(REAL_MARKER):
+                elapsed = float(line.split()[1])
+        except (IndexError, ValueError):
+            pass
+
+    if returncode in (124, 137):
+        return CaseResult(name, "TLE", elapsed, max_rss_kb)
+    if (max_rss_kb is not None and max_rss_kb > memory_limit_mb * 1024) or \
+            (returncode != 0 and ("bad_alloc" in stderr_text or "Cannot allocate memory" in stderr_text)):
+        return CaseResult(name, "MLE", elapsed, max_rss_kb)
+    if returncode != 0:
+        return CaseResult(name, "RE", elapsed, max_rss_kb, f"exit code {returncode}")
+    if expected_path is None:
+        return CaseResult(name, "NO-OUT", elapsed, max_rss_kb, "no expected output file")
+    if not matched:
+        return CaseResult(name, "FAIL", elapsed, max_rss_kb, detail)
+    return CaseResult(name, "PASS", elapsed, max_rss_kb)
+
+
+def run_judge(tests_dir: str,
+              root_directory: str,
+              executable_name: str = "a.out",
+              time_limit: float = DEFAULT_TIME_LIMIT,
+              memory_limit_mb: int = DEFAULT_MEMORY_LIMIT_MB,
+              distro: Optional[str] = None,
+              jobs: Optional[int] = None,
+              on_result=None) -> List[CaseResult]:
+    """
+    Run the compiled binary against every `.in` file in tests_dir, in parallel across cores.
+    - root_directory / executable_name: same binary that `run_action` starts.
+    - on_result: optional callback invoked with each CaseResult as soon as it finishes.
+    Returns the results sorted by case name.
+    """
+    cases = discover_cases(tests_dir)
+    if not cases:
+        return []
+    command = build_case_command(shelling.windows_to_wsl(root_directory), executable_name,
+                                 time_limit, memory_limit_mb)
+    results: List[CaseResult] = []
+    with ThreadPoolExecutor(max_workers=jobs or os.cpu_count() or 1) as pool:
+        futures = [pool.submit(run_case, name, in_path, out_path, command, time_limit, memory_limit_mb, distro)
+                   for name, in_path, out_path in cases]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            if on_result is not None:
+                on_result(result)
+    results.sort(key=lambda r: r.name.lower())
+    return results
+
+
+def format_report(results: List[CaseResult]) -> str:
+    lines = []
+    counts = {}
+    for r in results:
+        counts[r.status] = counts.get(r.status, 0) + 1
+        rss = f"{r.max_rss_kb / 1024:.1f} MB" if r.max_rss_kb is not None else "-"
+        line = f"{r.status:<7} {r.name:<24} {r.elapsed * 1000:8.1f} ms  {rss:>10}"
+        if r.detail:
+            line += f"  {r.detail}"
+        lines.append(line)
+    summary = ", ".join(f"{k}: {v}" for k, v in sorted(counts.items()))
+    lines.append(f"{len(results)} cases - {summary}")
+    return "\n".join(lines)
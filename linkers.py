@@ -0,0 +1,65 @@
+import os
+import re
+import shlex
+from typing import Dict, List, Optional
+
+import shelling
+
+LINK_BENCH_DIR = ".nopaste/link-bench"
+REAL_MARKER = "NOPASTE_LINK"
+REAL_RE = re.compile(REAL_MARKER + r" (\d+(?:\.\d+)?)")
+
+
+def time_linkers(sources: List[str],
+                 root_directory: str,
+                 custom_options=None,
+                 language_standard: Optional[str] = None,
+                 linkers: Optional[List[str]] = None,
+                 repeat: int = 3,
+                 distro: Optional[str] = None) -> Dict[str, Optional[float]]:
+    """
+    Compile the sources to objects once, then link them with each linker `repeat` times.
+    Returns {linker: best link time in seconds, or None if linking failed}.
+    The timing is taken inside WSL so the wsl.exe start-up is not part of it.
+    """
+    if linkers is None:
+        linkers = ["default"] + shelling.detect_linkers(distro=distro)
+    root_path = shelling.windows_to_wsl(root_directory)
+    std = f"-std={language_standard}" if language_standard else ""
+    compile_flags = " ".join(shelling.options_to_flags(custom_options))
+
+    # one object per source, named after its root-relative path like builder's cache, so a.cpp and lib/a.cpp
+    # do not overwrite each other
+    obj_dir = f"{LINK_BENCH_DIR}/obj"
+    sources = shelling.expand_sources(sources)
+    objects = []
+    steps = [f"cd {root_path}", f"rm -rf {obj_dir}"]
+    for source, wsl_source in zip(sources, shelling.translate_paths(sources, root_directory)):
+        rel = os.path.relpath(os.path.abspath(source), root_directory).replace("\\", "/")
+        obj = f"{obj_dir}/{os.path.splitext(rel.replace('../', '__/'))[0]}.o"
+        objects.append(obj)
+        steps.append(f"mkdir -p {shlex.quote(os.path.dirname(obj))}")
+        steps.append(f"g++ -c {compile_flags} {std} -IHeaders -ISources {shlex.quote(wsl_source)} "
+                     f"-o {shlex.quote(obj)}")
+    cp = shelling.run_wsl_command(" && ".join(steps), distro=distro, capture=True)
+    if cp.returncode != 0:
+        print("Object build for link timing failed:", cp.stdout, cp.stderr)
+        return {name: None for name in linkers}
+    objects_rsp = shelling.write_response_file(objects, root_directory, "link-bench-objects.rsp")
+
+    results = {}
+    for name in linkers:
+        link_flags = " ".join(shelling.options_to_flags(custom_options, linker=name))
+        link = f"g++ {link_flags} @{shlex.quote(objects_rsp)} -o {LINK_BENCH_DIR}/out-{name}"
+        cmd = (f"cd {root_path} && TIMEFORMAT='{REAL_MARKER} %R' && "
+               f"for i in $(seq {repeat}); do time {link} || exit 1; done")
+        cp = shelling.run_wsl_command(cmd, distro=distro, capture=True)
+        times = [float(t) for t in REAL_RE.findall(cp.stderr or "")]
+        results[name] = min(times) if cp.returncode == 0 and times else None
+        print(f"link with {name}: {results[name]}")
+    return results
+
+
+def format_timings(timings: Dict[str, Optional[float]]) -> str:
+    ranked = sorted(timings.items(), key=lambda kv: (kv[1] is None, kv[1] or 0.0))
+    return ", ".join(f"{name} {'failed' if t is None else f'{t:.2f}s'}" for name, t in ranked)
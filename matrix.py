@@ -0,0 +1,111 @@
+import itertools
+import os
+import re
+import shlex
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import shelling
+
+MATRIX_DIR = ".nopaste/matrix"
+WARNING_RE = re.compile(r"\bwarning:")
+
+
+class MatrixCell:
+    def __init__(self, standard: str, combo_name: str, options: Dict[str, bool]):
+        self.standard = standard
+        self.combo_name = combo_name
+        self.options = options
+        self.ok = None  # None until built
+        self.warnings = 0
+        self.seconds = 0.0
+        self.output = ""
+
+    @property
+    def build_dir(self) -> str:
+        slug = re.sub(r"[^A-Za-z0-9+]+", "-", f"{self.standard}_{self.combo_name}").strip("-")
+        return f"{MATRIX_DIR}/{slug}"
+
+    def flags(self) -> List[str]:
+        return shelling.options_to_flags(self.options) + [f"-std={self.standard}"]
+
+
+def option_combinations(base_options: Dict[str, bool], vary: List[str]) -> Dict[str, Dict[str, bool]]:
+    """
+    Every on/off combination of the options in `vary`, on top of base_options.
+    Returns {combo name: options dict}; combo names list the varied options that are on.
+    """
+    combos = {}
+    for values in itertools.product((False, True), repeat=len(vary)):
+        options = dict(base_options)
+        options.update(zip(vary, values))
+        enabled = [name for name, on in zip(vary, values) if on]
+        combos["+".join(enabled) if enabled else "base"] = options
+    return combos
+
+
+def plan_matrix(standards: List[str], combos: Dict[str, Dict[str, bool]]) -> List[MatrixCell]:
+    return [MatrixCell(std, name, options) for std in standards for name, options in combos.items()]
+
+
+def _build_cell(cell: MatrixCell, root_path: str, sources_rsp: str, executable_name: str,
+                distro: Optional[str]):
+    out_path = f"{cell.build_dir}/{executable_name}"
+    cmd = (f"cd {root_path} && mkdir -p {cell.build_dir} && "
+           f"g++ -pipe {' '.join(cell.flags())} @{shlex.quote(sources_rsp)} -o {out_path}")
+    start = time.perf_counter()
+    cp = shelling.run_wsl_command(cmd, distro=distro, capture=True)
+    cell.seconds = time.perf_counter() - start
+    cell.output = (cp.stdout or "") + (cp.stderr or "")
+    cell.warnings = len(WARNING_RE.findall(cell.output))
+    cell.ok = cp.returncode == 0
+
+
+def run_matrix(cells: List[MatrixCell],
+               sources: List[str],
+               root_directory: str,
+               executable_name: str = "a.out",
+               distro: Optional[str] = None,
+               jobs: Optional[int] = None,
+               on_cell=None) -> List[MatrixCell]:
+    """
+    Compile the same sources once per cell, in parallel, each into its own build directory
+    under <root>/.nopaste/matrix. Source paths are translated once into a response file shared by every cell,
+    and cells whose flags end up identical are only compiled once.
+    """
+    root_path = shelling.windows_to_wsl(root_directory)
+    sources_rsp = shelling.write_response_file(shelling.source_args(sources, root_directory),
+                                               root_directory, "matrix-sources.rsp")
+
+    unique: Dict[tuple, MatrixCell] = {}
+    duplicates: Dict[int, MatrixCell] = {}
+    for cell in cells:
+        key = tuple(cell.flags())
+        if key in unique:
+            duplicates[id(cell)] = unique[key]
+        else:
+            unique[key] = cell
+
+    def build(cell):
+        _build_cell(cell, root_path, sources_rsp, executable_name, distro)
+        if on_cell is not None:
+            on_cell(cell)
+
+    with ThreadPoolExecutor(max_workers=jobs or os.cpu_count() or 1) as pool:
+        list(pool.map(build, unique.values()))
+
+    for cell in cells:
+        source = duplicates.get(id(cell))
+        if source is not None:
+            cell.ok, cell.warnings, cell.seconds, cell.output = source.ok, source.warnings, source.seconds, source.output
+            if on_cell is not None:
+                on_cell(cell)
+    return cells
+
+
+def format_cell(cell: MatrixCell) -> str:
+    if cell.ok is None:
+        return "..."
+    status = "pass" if cell.ok else "FAIL"
+    return f"{status}  {cell.warnings}w  {cell.seconds:.1f}s"
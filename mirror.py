@@ -0,0 +1,122 @@
+import hashlib
+import json
+import os
+import shlex
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+import shelling
+
+HEADER_EXTENSIONS = (".h", ".hh", ".hpp", ".hxx", ".inl", ".ipp", ".tpp")
+STATE_FILE = "mirror-state.json"
+ID_FILE = ".nopaste-mirror-id"
+# inside WSL; set NOPASTE_MIRROR_BASE=/dev/shm/nopaste in the distro to keep the mirror in tmpfs
+MIRROR_BASE = "${NOPASTE_MIRROR_BASE:-${XDG_CACHE_HOME:-$HOME/.cache}/nopaste/mirror}"
+
+
+def mirror_dir(root_directory: str) -> str:
+    """Shell expression (double-quote safe) for the Linux-native mirror of this root."""
+    key = hashlib.sha1(os.path.abspath(root_directory).encode("utf-8")).hexdigest()[:16]
+    return f"{MIRROR_BASE}/{key}"
+
+
+def collect_manifest(sources: List[str], root_directory: str) -> Dict[str, Tuple[int, int]]:
+    """
+    Files the build needs, relative to the root: the expanded sources plus every header under the root
+    (headers are found through -IHeaders -ISources and relative includes, so all of them are mirrored).
+    Returns {relative posix path: (size, mtime_ns)}.
+    """
+    root = os.path.abspath(root_directory)
+    paths = [p for p in shelling.expand_sources(sources) if os.path.isfile(p)]
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if not d.startswith(".")]
+        paths += [os.path.join(dirpath, f) for f in filenames if f.endswith(HEADER_EXTENSIONS)]
+
+    manifest = {}
+    for path in paths:
+        path = os.path.abspath(path)
+        if not path.startswith(root + os.sep):
+            continue
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        manifest[os.path.relpath(path, root).replace("\\", "/")] = (st.st_size, st.st_mtime_ns)
+    return manifest
+
+
+def _load_state(state_path: str) -> dict:
+    try:
+        with open(state_path, "r", encoding="utf-8") as handle:
+            state = json.load(handle)
+    except (OSError, json.JSONDecodeError):
+        return {}
+    return state if isinstance(state, dict) else {}
+
+
+def _write_list(path: str, entries: List[str]):
+    with open(path, "wb") as handle:
+        handle.write(b"\0".join(e.encode("utf-8") for e in entries))
+
+
+def sync_mirror(sources: List[str], root_directory: str, distro: Optional[str] = None) -> Optional[str]:
+    """
+    Bring the Linux-native mirror of root_directory up to date, copying only files whose size or
+    mtime changed since the last sync (everything if the mirror was wiped, e.g. tmpfs after a reboot).
+    Returns the mirror directory as a shell expression, or None if the sync failed.
+    """
+    scratch = os.path.join(root_directory, shelling.RESPONSE_DIR)
+    os.makedirs(scratch, exist_ok=True)
+    state_path = os.path.join(scratch, STATE_FILE)
+    state = _load_state(state_path)
+    previous = {k: tuple(v) for k, v in state.get("files", {}).items()}
+    mirror_id = state.get("id") or uuid.uuid4().hex
+
+    manifest = collect_manifest(sources, root_directory)
+    changed = [rel for rel, sig in manifest.items() if previous.get(rel) != sig]
+    removed = [rel for rel in previous if rel not in manifest]
+    _write_list(os.path.join(scratch, "mirror-all.list"), sorted(manifest))
+    _write_list(os.path.join(scratch, "mirror-changed.list"), changed)
+    _write_list(os.path.join(scratch, "mirror-removed.list"), removed)
+
+    mirror = mirror_dir(root_directory)
+    lists = shlex.quote(shelling.translate_paths([scratch])[0])
+    cmd = (f'M="{mirror}" && mkdir -p "$M" && cd {shelling.windows_to_wsl(root_directory)} && L={lists} && '
+           f'if [ "$(cat "$M/{ID_FILE}" 2>/dev/null)" = {mirror_id} ]; then '
+           f'  (cd "$M" && xargs -0 -r rm -f -- < "$L/mirror-removed.list") && '
+           f'  xargs -0 -r cp -p --parents -t "$M" -- < "$L/mirror-changed.list"; '
+           f'else '
+           f'  xargs -0 -r cp -p --parents -t "$M" -- < "$L/mirror-all.list" && echo {mirror_id} > "$M/{ID_FILE}"; '
+           f'fi')
+    cp = shelling.run_wsl_command(cmd, distro=distro, capture=True)
+    if cp.returncode != 0:
+        print("Mirror sync failed:", cp.stdout, cp.stderr)
+        return None
+    print(f"Mirror sync: {len(changed)} changed, {len(removed)} removed, {len(manifest)} tracked")
+
+    state = {"id": mirror_id, "files": {k: list(v) for k, v in manifest.items()}}
+    try:
+        with open(state_path, "w", encoding="utf-8") as handle:
+            json.dump(state, handle)
+    except OSError as exc:
+        print(f"Failed to save mirror state: {exc}")
+    return mirror
+
+
+def relative_source_args(sources: List[str], root_directory: str) -> List[str]:
+    """Like shelling.source_args, but root-relative so the same arguments work inside the mirror."""
+    root = os.path.abspath(root_directory)
+    args = ["-IHeaders", "-ISources"]
+    for path in shelling.expand_sources(sources):
+        path = os.path.abspath(path)
+        if path.startswith(root + os.sep):
+            args.append(os.path.relpath(path, root).replace("\\", "/"))
+        else:
+            args += shelling.translate_paths([path])
+    return args
+
+
+def mirrored_compile_command(mirror: str, root_path: str, rsp_path: str, executable_name: str) -> str:
+    """Compile inside the mirror, then copy only the finished binary back to the Windows tree."""
+    exe = shlex.quote(executable_name)
+    return f'cd "{mirror}" && g++ @{shlex.quote(rsp_path)} && cp -p {exe} {root_path}/{exe}'
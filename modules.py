@@ -0,0 +1,312 @@
+import json
+import os
+import re
+import secrets
+import shlex
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, wait
+from typing import Dict, List, Optional, Tuple
+
+import shelling
+
+MODULE_FLAG = "-fmodules-ts"
+CMI_DIR = "gcm"  # compiled module interfaces, next to the mapper file
+MAPPER_FILE = "modules.map"
+# "export module a.b:part;" / "module a.b;" (the global module fragment "module;" has no name)
+MODULE_RE = re.compile(r"^\s*(export\s+)?module\s+([\w.]+)(:[\w.]+)?\s*;", re.MULTILINE)
+IMPORT_RE = re.compile(r"^\s*(?:export\s+)?import\s+([\w.]+|:[\w.]+)\s*;", re.MULTILINE)
+HEADER_UNIT_RE = re.compile(r"^\s*(?:export\s+)?import\s+([<\"][^>\"]+[>\"])\s*;", re.MULTILINE)
+# cheap pre-check: a source without any such line cannot declare or import a module
+MODULE_HINT_RE = re.compile(rb"^[ \t]*(export\s+)?(module|import)\b", re.MULTILINE)
+
+_p1689_support: Dict[Optional[str], bool] = {}  # distro -> does g++ have -fdeps-format=p1689r5 (GCC 14+)
+_p1689_lock = threading.Lock()
+
+
+class ModuleInfo:
+    """What one source provides and imports, from a p1689 scan or the source text."""
+
+    def __init__(self, rel: str, provides: Optional[str] = None, requires: Optional[List[str]] = None,
+                 interface: bool = False, header_units: Optional[List[str]] = None):
+        self.rel = rel
+        self.provides = provides  # "name" or "name:partition"; also set for implementation units
+        self.requires = requires or []
+        self.interface = interface  # False for "module name;" implementation units (they produce no CMI)
+        self.header_units = header_units or []
+
+    @property
+    def uses_modules(self) -> bool:
+        return bool(self.provides or self.requires or self.header_units)
+
+
+def modules_standard(language_standard: Optional[str]) -> bool:
+    """c++20 and later (also gnu++ and the 2a/2b/2c draft names)."""
+    match = re.search(r"\+\+(\d\w)$", language_standard or "")
+    if not match:
+        return False
+    version = match.group(1)
+    return version[0] == "2" and (version[1].isalpha() or int(version) >= 20)
+
+
+def _strip_comments(text: str) -> str:
+    return re.sub(r"//[^\n]*|/\*.*?\*/", " ", text, flags=re.DOTALL)
+
+
+def scan_text(rel: str, text: str) -> ModuleInfo:
+    """
+    Module declarations from the source text (the fallback when g++ cannot write p1689 files). Good enough for
+    the usual layout; declarations hidden behind macros or #if are only seen by the p1689 scan.
+    """
+    text = _strip_comments(text)
+    info = ModuleInfo(rel)
+    declared = MODULE_RE.search(text)
+    module_name = None
+    if declared:
+        module_name = declared.group(2)
+        info.provides = module_name + (declared.group(3) or "")
+        info.interface = bool(declared.group(1)) or bool(declared.group(3))
+        if not info.interface:
+            info.requires.append(module_name)  # an implementation unit implicitly imports its interface
+    for match in IMPORT_RE.finditer(text):
+        name = match.group(1)
+        if name.startswith(":"):
+            if module_name is None:
+                continue  # partitions can only be imported inside their module
+            name = module_name + name
+        if name not in info.requires and name != info.provides:
+            info.requires.append(name)
+    info.header_units = [match.group(1) for match in HEADER_UNIT_RE.finditer(text)]
+    return info
+
+
+def parse_p1689(text: str, rel: str) -> ModuleInfo:
+    """One source's p1689r5 JSON (`-fdeps-format=p1689r5 -fdeps-file=...`)."""
+    info = ModuleInfo(rel)
+    for rule in json.loads(text).get("rules", []):
+        for provided in rule.get("provides", []):
+            info.provides = provided.get("logical-name")
+            info.interface = provided.get("is-interface", True)
+        for required in rule.get("requires", []):
+            name = required.get("logical-name")
+            if required.get("lookup-method") in ("include-angle", "include-quote"):
+                info.header_units.append(name)
+            elif name and name not in info.requires:
+                info.requires.append(name)
+    return info
+
+
+def supports_p1689(distro: Optional[str] = None) -> bool:
+    with _p1689_lock:
+        if distro not in _p1689_support:
+            cp = shelling.run_wsl_command("echo | g++ -std=c++20 -fmodules-ts -E -x c++ - -o /dev/null "
+                                          "-fdeps-format=p1689r5 -fdeps-file=/dev/null -fdeps-target=x.o "
+                                          "> /dev/null 2>&1 && echo yes", distro=distro, capture=True)
+            _p1689_support[distro] = (cp.stdout or "").strip().endswith("yes")
+        return _p1689_support[distro]
+
+
+def mentions_modules(path: str) -> bool:
+    """True when a line of the file starts with `module` / `import` (optionally exported); unreadable: False."""
+    try:
+        with open(path, "rb") as handle:
+            return MODULE_HINT_RE.search(handle.read()) is not None
+    except OSError:
+        return False
+
+
+def scan(root_directory: str, rels: List[str], flags: List[str],
+         distro: Optional[str] = None) -> Dict[str, ModuleInfo]:
+    """
+    Module dependencies of the given root-relative sources: with a p1689-capable g++ every source is
+    preprocessed once (one WSL call) and g++ reports provides/requires; otherwise the sources are read here.
+    Only sources passing mentions_modules() are scanned, so a project without modules costs no WSL call.
+    """
+    infos = {rel: ModuleInfo(rel) for rel in rels}
+    rels = [rel for rel in rels if mentions_modules(os.path.join(root_directory, rel))]
+    if not rels:
+        return infos
+    if not supports_p1689(distro):
+        for rel in rels:
+            try:
+                with open(os.path.join(root_directory, rel), "r", encoding="utf-8", errors="replace") as handle:
+                    infos[rel] = scan_text(rel, handle.read())
+            except OSError:
+                pass
+        return infos
+
+    marker = "@@NOPASTE-" + secrets.token_hex(4)
+    flag_text = " ".join(shlex.quote(f) for f in flags if not f.startswith("-fmodule-mapper="))
+    root_path = shelling.translate_paths([os.path.abspath(root_directory)])[0]
+    lines = [f"cd {shlex.quote(root_path)} && T=$(mktemp -d) && trap 'rm -rf \"$T\"' EXIT || exit 1"]
+    for index, rel in enumerate(rels):
+        quoted = shlex.quote(rel)
+        lines.append(f"g++ {flag_text} {MODULE_FLAG} -IHeaders -ISources -E {quoted} -o /dev/null "
+                     f"-fdeps-format=p1689r5 -fdeps-file=\"$T/{index}.ddi\" -fdeps-target={quoted}.o 2>/dev/null; "
+                     f"echo '{marker} {index}'; cat \"$T/{index}.ddi\" 2>/dev/null")
+    cp = shelling.run_wsl_command("\n".join(lines), distro=distro, capture=True, job_name="module scan")
+    chunks = (cp.stdout or "").split(marker + " ")[1:]
+    for chunk in chunks:
+        index, _sep, body = chunk.partition("\n")
+        try:
+            rel = rels[int(index)]
+            infos[rel] = parse_p1689(body, rel) if body.strip() else ModuleInfo(rel)
+        except (ValueError, IndexError):
+            continue
+    return infos
+
+
+def providers(infos: Dict[str, ModuleInfo]) -> Dict[str, str]:
+    """{module name: rel of its interface unit}."""
+    return {info.provides: rel for rel, info in infos.items() if info.provides and info.interface}
+
+
+def problems(infos: Dict[str, ModuleInfo]) -> List[str]:
+    """What stops a modules build: unknown imports, modules defined twice, header units, import cycles."""
+    found = []
+    seen: Dict[str, str] = {}
+    for rel, info in infos.items():
+        if info.provides and info.interface:
+            if info.provides in seen:
+                found.append(f"module {info.provides} is declared in both {seen[info.provides]} and {rel}")
+            seen[info.provides] = rel
+    provided = providers(infos)
+    for rel, info in infos.items():
+        for name in info.requires:
+            if name not in provided:
+                found.append(f"{rel} imports {name}, which no checked source exports")
+        for header in info.header_units:
+            found.append(f"{rel}: header unit import {header} is not supported; use #include")
+    if not found:
+        try:
+            order(infos)
+        except ValueError as exc:
+            found.append(str(exc))
+    return found
+
+
+def dependencies(infos: Dict[str, ModuleInfo]) -> Dict[str, List[str]]:
+    """{rel: rels of the interface units it imports}."""
+    provided = providers(infos)
+    return {rel: [provided[name] for name in info.requires if name in provided and provided[name] != rel]
+            for rel, info in infos.items()}
+
+
+def order(infos: Dict[str, ModuleInfo]) -> List[str]:
+    """Sources in an order where every interface comes before its importers (Kahn); ValueError on a cycle."""
+    deps = {rel: set(needs) for rel, needs in dependencies(infos).items()}
+    importers: Dict[str, List[str]] = {rel: [] for rel in infos}
+    for rel, needs in deps.items():
+        for dep in needs:
+            importers[dep].append(rel)
+    in_degree = {rel: len(needs) for rel, needs in deps.items()}
+    ready = deque(rel for rel in infos if not in_degree[rel])
+    ordered = []
+    while ready:
+        rel = ready.popleft()
+        ordered.append(rel)
+        for other in importers[rel]:
+            in_degree[other] -= 1
+            if not in_degree[other]:
+                ready.append(other)
+    if len(ordered) != len(infos):
+        stuck = sorted(rel for rel in infos if rel not in ordered)
+        raise ValueError(f"module import cycle between {', '.join(stuck)}")
+    return ordered
+
+
+def cmi_path(directory: str, module: str) -> str:
+    return f"{directory}/{CMI_DIR}/{module.replace(':', '-')}.gcm"
+
+
+def write_mapper(root_directory: str, directory: str, infos: Dict[str, ModuleInfo],
+                 cmi_root: Optional[str] = None) -> str:
+    """
+    Write <directory>/modules.map, the g++ module mapper that puts every CMI in <directory>/gcm, and return
+    its root-relative path. Keeping the CMIs per flag set is what lets unchanged modules be reused.
+    cmi_root: how g++ should spell <directory>/gcm (default root-relative, for compiles run from the root).
+    """
+    lines = [f"$root {cmi_root or directory + '/' + CMI_DIR}"]
+    for module in sorted(providers(infos)):
+        lines.append(f"{module} {os.path.basename(cmi_path(directory, module))}")
+    path = f"{directory}/{MAPPER_FILE}"
+    full = os.path.join(root_directory, path)
+    os.makedirs(os.path.join(root_directory, directory, CMI_DIR), exist_ok=True)
+    text = "\n".join(lines) + "\n"
+    try:
+        with open(full, "r", encoding="utf-8") as handle:
+            unchanged = handle.read() == text
+    except OSError:
+        unchanged = False
+    if not unchanged:
+        with open(full, "w", encoding="utf-8", newline="\n") as handle:
+            handle.write(text)
+    return path
+
+
+def module_flags(mapper: str) -> List[str]:
+    return [MODULE_FLAG, f"-fmodule-mapper={mapper}"]
+
+
+def order_sources(sources: List[str], root_directory: str, flags: List[str],
+                  distro: Optional[str] = None) -> Tuple[List[str], List[str]]:
+    """
+    For the single g++ call of shelling.compile_in_wsl, which compiles its sources in command-line order:
+    the expanded sources with every interface before its importers, plus the module flags (CMIs in
+    <root>/.nopaste/modules/gcm, absolute paths so a mirrored compile finds them too).
+    Sources that use no modules come back as they are, with no flags.
+    """
+    files = shelling.expand_sources(sources)
+    root = os.path.abspath(root_directory)
+    by_rel = {os.path.relpath(os.path.abspath(p), root).replace("\\", "/"): p for p in files
+              if p.endswith(shelling.SOURCE_EXTENSIONS)}
+    infos = scan(root_directory, list(by_rel), flags, distro=distro)
+    if not any(info.uses_modules for info in infos.values()):
+        return sources, []
+    issues = problems(infos)
+    if issues:
+        for issue in issues:
+            print(issue)
+        return files, [MODULE_FLAG]  # g++ reports the rest
+    directory = f"{shelling.RESPONSE_DIR}/modules"
+    cmi_root = shelling.translate_paths([os.path.join(root, directory, CMI_DIR)])[0]
+    mapper = write_mapper(root_directory, directory, infos, cmi_root=cmi_root)
+    mapper_path = shelling.translate_paths([os.path.join(root, mapper)])[0]
+    ordered = [by_rel[rel] for rel in order(infos)]
+    return ordered + [p for p in files if p not in ordered], module_flags(mapper_path)
+
+
+def run_in_order(pool, units, deps: Dict[str, List[str]], run, on_skip=None) -> list:
+    """
+    Run run(unit) on the pool as soon as the units it depends on (deps: rel -> rels, only those among `units`
+    count) have finished, so independent modules still build in parallel. Units whose dependency failed
+    are not run; on_skip(unit, failed_rel) is called for them. Returns the units that ran, in finish order.
+    """
+    pending = {unit.rel: unit for unit in units}
+    waiting = {unit.rel: {d for d in deps.get(unit.rel, []) if d in pending} for unit in units}
+    running = {}
+    done = []
+    failed = set()
+    while pending or running:
+        for rel in [rel for rel in list(pending) if not waiting[rel]]:
+            running[pool.submit(run, pending.pop(rel))] = rel
+        if not running:
+            # only units blocked by failures are left
+            for rel, unit in list(pending.items()):
+                blocker = next(iter(waiting[rel] & failed), None) or next(iter(waiting[rel]))
+                failed.add(rel)
+                if on_skip is not None:
+                    on_skip(unit, blocker)
+                del pending[rel]
+            break
+        finished, _rest = wait(list(running), return_when=FIRST_COMPLETED)
+        for future in finished:
+            rel = running.pop(future)
+            unit = future.result()
+            done.append(unit)
+            if not unit.ok:
+                failed.add(rel)
+                continue
+            for other in waiting.values():
+                other.discard(rel)
+    return done
@@ -0,0 +1,151 @@
+import json
+import os
+import subprocess
+import threading
+from typing import Dict, List, Optional
+
+import shelling
+
+# compiler / linker processes worth watching (g++ itself is a thin driver)
+TOOL_NAMES = ["cc1plus", "cc1", "as", "collect2", "ld", "ld.bfd", "ld.gold", "ld.lld", "mold", "lto1"]
+STATS_FILE = "tu-stats.json"
+DEFAULT_JOB_MB = 1536  # assumed peak RSS of a TU we have never seen
+RESERVE_MB = 1024  # always leave this much memory free
+SAMPLE_INTERVAL = 0.25
+
+
+def load_tu_stats(root_directory: str) -> Dict[str, dict]:
+    """Per-TU history kept in <root>/.nopaste/tu-stats.json: {source rel: {"peak_rss_kb", "cpu_seconds", ...}}."""
+    path = os.path.join(root_directory, shelling.RESPONSE_DIR, STATS_FILE)
+    try:
+        with open(path, "r", encoding="utf-8") as handle:
+            stats = json.load(handle)
+    except (OSError, json.JSONDecodeError):
+        return {}
+    return stats if isinstance(stats, dict) else {}
+
+
+def save_tu_stats(root_directory: str, stats: Dict[str, dict]):
+    directory = os.path.join(root_directory, shelling.RESPONSE_DIR)
+    os.makedirs(directory, exist_ok=True)
+    try:
+        with open(os.path.join(directory, STATS_FILE), "w", encoding="utf-8") as handle:
+            json.dump(stats, handle, indent=1)
+    except OSError as exc:
+        print(f"Failed to save TU stats: {exc}")
+
+
+class ResourceMonitor:
+    """
+    Samples every compiler/linker process and the free memory of the machine the builds run on,
+    records peak RSS and CPU time per TU, and gates new compile jobs while memory is low.
+
+    Sampling runs as one long-lived `ps` loop through shelling.wsl_args: with WSL2 the compilers live
+    in the Linux VM where a Windows-side psutil cannot see them, and natively it is just bash.
+    """
+
+    def __init__(self, distro: Optional[str] = None, reserve_mb: int = RESERVE_MB,
+                 default_job_mb: int = DEFAULT_JOB_MB, interval: float = SAMPLE_INTERVAL):
+        self.distro = distro
+        self.reserve_mb = reserve_mb
+        self.default_job_mb = default_job_mb
+        self.interval = interval
+        self.available_mb: Optional[float] = None
+        self.history: Dict[str, dict] = {}
+        self.peaks: Dict[str, dict] = {}  # TU rel -> {"peak_rss_kb", "cpu_seconds"} for this build
+        self._watch: List[str] = []  # TU rels currently compiling
+        self._running: Dict[str, float] = {}  # TU rel -> MB reserved for it
+        self._cond = threading.Condition()
+        self._proc: Optional[subprocess.Popen] = None
+        self._reader: Optional[threading.Thread] = None
+        self.throttled = 0
+
+    # --- sampling ---------------------------------------------------------------------------------
+
+    def start(self):
+        names = ",".join(TOOL_NAMES)
+        cmd = (f"while :; do echo \"@ $(awk '/MemAvailable/{{print $2}}' /proc/meminfo)\"; "
+               f"ps -C {names} -o pid=,rss=,cputimes=,args= 2>/dev/null; sleep {self.interval}; done")
+        self._proc = subprocess.Popen(shelling.wsl_args(cmd, distro=self.distro), stdout=subprocess.PIPE,
+                                      stderr=subprocess.DEVNULL, stdin=subprocess.DEVNULL, text=True)
+        self._reader = threading.Thread(target=self._read_samples, daemon=True)
+        self._reader.start()
+
+    def stop(self):
+        if self._proc is not None:
+            self._proc.kill()
+            self._proc.wait()
+            self._proc = None
+        with self._cond:
+            self._cond.notify_all()
+
+    def _read_samples(self):
+        for line in self._proc.stdout:
+            parts = line.split(None, 3)
+            if not parts:
+                continue
+            if parts[0] == "@":
+                with self._cond:
+                    try:
+                        self.available_mb = int(parts[1]) / 1024
+                    except (IndexError, ValueError):
+                        pass
+                    self._cond.notify_all()
+                continue
+            if len(parts) < 4:
+                continue
+            try:
+                rss_kb, cpu_seconds = int(parts[1]), float(parts[2])
+            except ValueError:
+                continue
+            args = parts[3].split()
+            with self._cond:
+                for rel in self._watch:
+                    if rel in args:
+                        peak = self.peaks.setdefault(rel, {"peak_rss_kb": 0, "cpu_seconds": 0.0})
+                        peak["peak_rss_kb"] = max(peak["peak_rss_kb"], rss_kb)
+                        peak["cpu_seconds"] = max(peak["cpu_seconds"], cpu_seconds)
+                        break
+
+    # --- throttling -------------------------------------------------------------------------------
+
+    def estimate_mb(self, rel: str) -> float:
+        known = self.history.get(rel, {}).get("peak_rss_kb")
+        return known / 1024 if known else self.default_job_mb
+
+    def acquire(self, rel: str):
+        """Block until there is memory for this TU; a lone job is always admitted so builds cannot stall."""
+        need = self.estimate_mb(rel)
+        with self._cond:
+            waited = False
+            while self._running and self.available_mb is not None and self._proc is not None:
+                # memory of jobs that started recently may not show in MemAvailable yet
+                pending = sum(mb for r, mb in self._running.items() if r not in self.peaks)
+                if self.available_mb - pending - need >= self.reserve_mb:
+                    break
+                if not waited:
+                    self.throttled += 1
+                    waited = True
+                self._cond.wait(timeout=1.0)
+            self._running[rel] = need
+            self._watch.append(rel)
+
+    def release(self, rel: str):
+        with self._cond:
+            self._running.pop(rel, None)
+            if rel in self._watch:
+                self._watch.remove(rel)
+            self._cond.notify_all()
+
+    # --- reporting --------------------------------------------------------------------------------
+
+    def merge_into(self, stats: Dict[str, dict]):
+        for rel, peak in self.peaks.items():
+            stats.setdefault(rel, {}).update(peak)
+
+    def report(self, top: int = 5) -> str:
+        heavy = sorted(self.peaks.items(), key=lambda kv: kv[1]["peak_rss_kb"], reverse=True)[:top]
+        lines = [f"throttled {self.throttled} job start(s) for memory" if self.throttled else "no memory throttling"]
+        for rel, peak in heavy:
+            lines.append(f"  {peak['peak_rss_kb'] / 1024:8.1f} MB  {peak['cpu_seconds']:6.1f}s cpu  {rel}")
+        return "\n".join(lines)
@@ -0,0 +1,128 @@
+import shlex
+import statistics
+from typing import Dict, List, Optional
+
+import benchmark
+import shelling
+
+PGO_DIR = ".nopaste/pgo"
+PROFILE_DIR = f"{PGO_DIR}/profile"
+BASE_DIR = f"{PGO_DIR}/base"
+# the instrumented and the optimized binary must have the same output path: gcc names the .gcda files
+# after it, so -fprofile-use only finds the profile of a build with the same -o
+BUILD_DIR = f"{PGO_DIR}/build"
+
+
+class PgoResult:
+    def __init__(self):
+        self.ok = False
+        self.stage = ""  # last stage reached: baseline, instrument, train, optimize, benchmark
+        self.output = ""
+        self.baseline: Dict[str, List[float]] = {}  # training input -> timed runs (seconds)
+        self.optimized: Dict[str, List[float]] = {}
+
+    def summary(self) -> str:
+        if not self.ok:
+            return f"PGO build failed at {self.stage}"
+        lines = ["PGO build done"]
+        for name, before_runs in self.baseline.items():
+            after_runs = self.optimized.get(name)
+            if not before_runs or not after_runs:
+                continue
+            before, after = statistics.median(before_runs), statistics.median(after_runs)
+            change = (after - before) / before * 100 if before else 0.0
+            noise = "" if benchmark.differs(before_runs, after_runs) else ", within noise"
+            lines.append(f"  {name}: {before * 1000:.2f} ms -> {after * 1000:.2f} ms ({change:+.1f}%{noise})")
+        before = sum(statistics.median(runs) for runs in self.baseline.values() if runs)
+        after = sum(statistics.median(runs) for runs in self.optimized.values() if runs)
+        if before and after:
+            lines.append(f"  total speed-up {before / after:.2f}x")
+        return "\n".join(lines)
+
+
+def _time_inputs(root_directory: str, executable: str, inputs: List[Optional[str]], repeat: int,
+                 distro: Optional[str]) -> Dict[str, List[float]]:
+    runs = {}
+    for path in inputs:
+        runs[path or "(no input)"] = benchmark.time_runs(root_directory, executable, repeat=repeat, stdin_path=path,
+                                                         distro=distro)
+    return runs
+
+
+def run_pgo(sources: List[str],
+            root_directory: str,
+            custom_options=None,
+            language_standard: Optional[str] = None,
+            executable_name: str = "a.out",
+            training_inputs: Optional[List[str]] = None,
+            linker: Optional[str] = None,
+            lto: bool = False,
+            repeat: int = 5,
+            distro: Optional[str] = None,
+            on_event=None) -> PgoResult:
+    """
+    Profile-guided build of the checked sources:
+    - baseline: the normal build, kept in <root>/.nopaste/pgo/base for the comparison
+    - instrument: -fprofile-generate build, run once per training input (stdin files; none = empty stdin)
+    - optimize: -fprofile-use (plus -flto if lto) build, copied to <root>/<executable_name>
+    - benchmark: median of `repeat` runs per input, baseline against optimized
+    """
+    log = on_event or print
+    result = PgoResult()
+    root_path = shelling.windows_to_wsl(root_directory)
+    inputs: List[Optional[str]] = list(training_inputs or []) or [None]
+    sources_rsp = shelling.write_response_file(shelling.source_args(sources, root_directory),
+                                               root_directory, "pgo-sources.rsp")
+    flags = shelling.options_to_flags(custom_options, linker=linker)
+    if language_standard:
+        flags.append(f"-std={language_standard}")
+    if not any(flag.startswith("-O") for flag in flags):
+        log("Optimize is off; PGO builds use -O2")
+        flags.append("-O2")
+    flags = " ".join(flags)
+    exe = shlex.quote(executable_name)
+    profile = f'"$PWD/{PROFILE_DIR}"'
+
+    def stage(name: str, cmd: str) -> bool:
+        result.stage = name
+        log(f"[{name}]")
+        cp = shelling.run_wsl_command(f"cd {root_path} && {cmd}", distro=distro, capture=True)
+        output = (cp.stdout or "") + (cp.stderr or "")
+        result.output += output
+        if output.strip():
+            log(output.rstrip())
+        return cp.returncode == 0
+
+    if not stage("baseline", f"mkdir -p {BASE_DIR} {BUILD_DIR} && "
+                             f"g++ {flags} @{shlex.quote(sources_rsp)} -o {BASE_DIR}/{exe}"):
+        return result
+    if not stage("instrument", f"rm -rf {PROFILE_DIR} && g++ {flags} -fprofile-generate -fprofile-dir={profile} "
+                               f"-fprofile-update=prefer-atomic @{shlex.quote(sources_rsp)} -o {BUILD_DIR}/{exe}"):
+        return result
+
+    # a training run that exits non-zero still leaves a usable profile, so only warn
+    runs = []
+    for path in inputs:
+        stdin = shelling.windows_to_wsl(path) if path else "/dev/null"
+        runs.append(f"{{ ./{BUILD_DIR}/{exe} < {stdin} > /dev/null || echo \"training run exited with $?\"; }}")
+    if not stage("train", " && ".join(runs) + f" && ls {PROFILE_DIR} | grep -q gcda"):
+        log("No profile data was written")
+        return result
+
+    lto_flag = "-flto=auto " if lto else ""
+    if not stage("optimize", f"g++ {flags} {lto_flag}-fprofile-use -fprofile-dir={profile} -fprofile-correction "
+                             f"-Wmissing-profile @{shlex.quote(sources_rsp)} -o {BUILD_DIR}/{exe} && "
+                             f"cp {BUILD_DIR}/{exe} {exe}"):
+        return result
+
+    result.stage = "benchmark"
+    log("[benchmark]")
+    try:
+        result.baseline = _time_inputs(root_directory, f"{BASE_DIR}/{executable_name}", inputs, repeat, distro)
+        result.optimized = _time_inputs(root_directory, executable_name, inputs, repeat, distro)
+    except RuntimeError as exc:
+        log(str(exc))
+        return result
+    result.ok = True
+    log(result.summary())
+    return result
@@ -0,0 +1,236 @@
+import hmac
+import itertools
+import json
+import os
+import re
+import shlex
+import socket
+import socketserver
+import subprocess
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import shelling
+
+DEFAULT_PORT = 7878
+CONNECT_TIMEOUT = 3.0
+COMPILE_TIMEOUT = 600.0
+TOKEN_ENV = "NOPASTE_WORKER_TOKEN"
+RETRY_AFTER = 30.0  # seconds before a worker that failed is tried again; doubles per failure in a row
+MAX_RETRY_AFTER = 600.0
+LOOPBACK_HOSTS = ("127.0.0.1", "localhost", "::1")
+# flags a worker accepts; anything that can load code or run programs (-fplugin=, -wrapper, -specs=, -B,
+# @file, -Wl/-Wa/-Wp pass-through) or touch the worker's files (paths in -f values) is refused
+ALLOWED_FLAG_RE = re.compile(r"-O[0-3sgz]?|-Ofast|-std=[\w+]+|-[DU]\w+(=\S*)?|-W(no-)?[a-z0-9][a-z0-9-]*(=\w+)?"
+                             r"|-f(no-)?[a-z0-9][a-z0-9-]*(=[\w.,+-]*)?|-g[a-z0-9-]*|-m[a-z0-9][\w-]*(=[\w.-]+)?"
+                             r"|-pthread|-pedantic(-errors)?")
+# split-dwarf: the .dwo is written next to the worker's temporary object and deleted with it, so those TUs are
+# compiled locally
+REFUSED_FLAG_WORDS = ("plugin", "wrapper", "dump", "profile", "record", "debug-prefix", "file-prefix", "split-dwarf")
+
+
+# --- framing: one JSON header line, then `size` raw bytes ---------------------------------------
+
+def send_message(stream, header: dict, payload: bytes = b""):
+    header = dict(header, size=len(payload))
+    stream.write((json.dumps(header) + "\n").encode("utf-8"))
+    stream.write(payload)
+    stream.flush()
+
+
+def read_message(stream) -> Tuple[Optional[dict], bytes]:
+    line = stream.readline()
+    if not line:
+        return None, b""
+    header = json.loads(line)
+    size = int(header.get("size", 0))
+    payload = stream.read(size) if size else b""
+    if len(payload) != size:
+        raise ConnectionError("truncated message")
+    return header, payload
+
+
+def flag_allowed(flag: str) -> bool:
+    return bool(ALLOWED_FLAG_RE.fullmatch(flag)) and not any(word in flag for word in REFUSED_FLAG_WORDS)
+
+
+def refused_flags(flags: List[str]) -> List[str]:
+    return [flag for flag in flags if not isinstance(flag, str) or not flag_allowed(flag)]
+
+
+def token_matches(given, expected: str) -> bool:
+    return isinstance(given, str) and hmac.compare_digest(given.encode("utf-8"), expected.encode("utf-8"))
+
+
+# --- worker ---------------------------------------------------------------------------------------
+
+def compile_preprocessed(source: bytes, flags: List[str], distro: Optional[str] = None) -> Tuple[bool, bytes, str]:
+    """Compile an already preprocessed TU (fed on stdin) and return (ok, object bytes, diagnostics)."""
+    quoted = " ".join(shlex.quote(f) for f in flags)
+    cmd = (f'T=$(mktemp -d) && g++ -c {quoted} -x c++-cpp-output - -o "$T/out.o" && cat "$T/out.o"; '
+           f'rc=$?; rm -rf "$T"; exit $rc')
+    cp = subprocess.run(shelling.wsl_args(cmd, distro=distro), input=source, capture_output=True,
+                        timeout=COMPILE_TIMEOUT)
+    return cp.returncode == 0, cp.stdout if cp.returncode == 0 else b"", cp.stderr.decode(errors="replace")
+
+
+class WorkerServer(socketserver.ThreadingTCPServer):
+    """A compile endpoint: receives preprocessed TUs, returns objects. Runs where g++ is available."""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host: str, port: int, token: str, jobs: Optional[int] = None, distro: Optional[str] = None):
+        super().__init__((host, port), WorkerHandler)
+        self.token = token
+        self.distro = distro
+        self.slots = threading.Semaphore(jobs or os.cpu_count() or 1)
+        self.compiled = 0
+
+
+class WorkerHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        while True:
+            try:
+                header, payload = read_message(self.rfile)
+            except (ValueError, ConnectionError, OSError):
+                return
+            if header is None:
+                return
+            if not token_matches(header.get("token"), self.server.token):
+                send_message(self.wfile, {"ok": False, "output": "bad token"})
+                return
+            if header.get("op") == "ping":
+                send_message(self.wfile, {"ok": True})
+                continue
+            flags = header.get("flags", [])
+            refused = refused_flags(flags) if isinstance(flags, list) else [str(flags)]
+            if refused:
+                send_message(self.wfile, {"ok": False, "output": f"flags not allowed on a worker: {' '.join(refused)}"})
+                continue
+            with self.server.slots:
+                start = time.perf_counter()
+                try:
+                    ok, obj, output = compile_preprocessed(payload, flags, self.server.distro)
+                except subprocess.TimeoutExpired:
+                    ok, obj, output = False, b"", "remote compile timed out"
+                self.server.compiled += 1
+            send_message(self.wfile, {"ok": ok, "output": output, "seconds": time.perf_counter() - start}, obj)
+
+
+def serve_worker(host: str = "127.0.0.1", port: int = DEFAULT_PORT, token: Optional[str] = None,
+                 jobs: Optional[int] = None, distro: Optional[str] = None):
+    """Raises ValueError when listening beyond this machine without a token (anyone could use the compiler)."""
+    token = token or os.environ.get(TOKEN_ENV, "")
+    if not token and host not in LOOPBACK_HOSTS:
+        raise ValueError(f"a worker listening on {host} needs a token (--token or ${TOKEN_ENV})")
+    server = WorkerServer(host, port, token, jobs=jobs, distro=distro)
+    print(f"NoPaste compile worker on {host}:{server.server_address[1]}")
+    server.serve_forever()
+
+
+def start_local_workers(count: int, base_port: int = DEFAULT_PORT, token: str = "",
+                        jobs_per_worker: int = 1) -> List[threading.Thread]:
+    """In-process worker stand-ins on 127.0.0.1 (for trying the remote path on one machine)."""
+    threads = []
+    for i in range(count):
+        server = WorkerServer("127.0.0.1", base_port + i, token, jobs=jobs_per_worker)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        threads.append(thread)
+    return threads
+
+
+# --- client ---------------------------------------------------------------------------------------
+
+def parse_endpoint(endpoint: str) -> Tuple[str, int]:
+    host, _sep, port = endpoint.rpartition(":")
+    if not host:
+        return endpoint, DEFAULT_PORT
+    return host, int(port)
+
+
+class RemoteCompiler:
+    """
+    distcc-style distribution: preprocess locally (so headers never leave this machine's view of the tree),
+    compile on a worker endpoint, write the object back locally. Endpoints are used round-robin; a TU whose
+    endpoint fails is compiled locally instead. A failed endpoint is skipped for RETRY_AFTER seconds (doubling
+    while it keeps failing), then tried again.
+    """
+
+    def __init__(self, endpoints: List[str], token: Optional[str] = None):
+        self.endpoints = [parse_endpoint(e) for e in endpoints]
+        self.token = token if token is not None else os.environ.get(TOKEN_ENV, "")
+        self._next = itertools.cycle(range(len(self.endpoints)))
+        self._lock = threading.Lock()
+        self.down: Dict[Tuple[str, int], Tuple[float, int]] = {}  # endpoint -> (retry at, failures in a row)
+
+    def _pick(self) -> Optional[Tuple[str, int]]:
+        now = time.monotonic()
+        with self._lock:
+            for _ in range(len(self.endpoints)):
+                endpoint = self.endpoints[next(self._next)]
+                if endpoint not in self.down or self.down[endpoint][0] <= now:
+                    return endpoint
+        return None
+
+    def _failed(self, endpoint: Tuple[str, int]):
+        with self._lock:
+            _retry_at, failures = self.down.get(endpoint, (0.0, 0))
+            backoff = min(RETRY_AFTER * 2 ** failures, MAX_RETRY_AFTER)
+            self.down[endpoint] = (time.monotonic() + backoff, failures + 1)
+
+    def _succeeded(self, endpoint: Tuple[str, int]):
+        with self._lock:
+            self.down.pop(endpoint, None)
+
+    def preprocess(self, project, tu, compile_flags: List[str]) -> Tuple[bool, bytes, str]:
+        """g++ -E locally; -MMD still writes the depfile the incremental build needs."""
+        obj_dir = os.path.dirname(tu.obj)
+        cmd = (f"cd {project.root_path} && mkdir -p {shlex.quote(obj_dir)} && "
+               f"g++ -E {' '.join(compile_flags)} -IHeaders -ISources -MMD -MF {shlex.quote(tu.dep)} "
+               f"-MT {shlex.quote(tu.obj)} {shlex.quote(tu.rel)}")
+        cp = subprocess.run(shelling.wsl_args(cmd, distro=project.distro), capture_output=True)
+        return cp.returncode == 0, cp.stdout, cp.stderr.decode(errors="replace")
+
+    def compile_unit(self, project, tu, compile_flags: List[str]):
+        if "-march=native" in compile_flags or refused_flags(compile_flags):
+            # "native" would mean the worker's CPU, not the one the binary runs on; workers refuse other flags
+            return project.compile_unit(tu, compile_flags, local=True)
+        start = time.perf_counter()
+        ok, source, output = self.preprocess(project, tu, compile_flags)
+        if not ok:
+            tu.ok, tu.output, tu.seconds = False, output, time.perf_counter() - start
+            return tu
+
+        endpoint = self._pick()
+        header, obj = None, b""
+        tried = set()
+        while endpoint is not None and endpoint not in tried:
+            tried.add(endpoint)
+            try:
+                with socket.create_connection(endpoint, timeout=CONNECT_TIMEOUT) as sock:
+                    sock.settimeout(COMPILE_TIMEOUT)
+                    stream = sock.makefile("rwb")
+                    send_message(stream, {"token": self.token, "op": "compile", "flags": compile_flags}, source)
+                    header, obj = read_message(stream)
+                if header is None:
+                    raise ConnectionError("worker closed the connection")
+                break
+            except (OSError, ValueError, ConnectionError) as exc:
+                print(f"worker {endpoint[0]}:{endpoint[1]} unavailable ({exc}); trying another")
+                self._failed(endpoint)
+                endpoint = self._pick()
+        if endpoint is None or header is None:
+            # no worker left: build this TU locally
+            return project.compile_unit(tu, compile_flags, local=True)
+        self._succeeded(endpoint)
+
+        tu.output = output + header.get("output", "")
+        tu.ok = bool(header.get("ok"))
+        if tu.ok:
+            obj_path = os.path.join(project.root_directory, tu.obj)
+            with open(obj_path, "wb") as handle:
+                handle.write(obj)
+        tu.seconds = time.perf_counter() - start
+        return tu
@@ -0,0 +1,230 @@
+import difflib
+import os
+import shlex
+import subprocess
+import time
+from typing import List, Optional
+
+import jobs
+import shelling
+
+SESSIONS_DIR = ".nopaste/sessions"
+INPUT_LOG = "input.log"  # raw keystrokes (script --log-in)
+OUTPUT_LOG = "output.log"  # terminal output including the tty echo (script --log-out)
+TIMING_LOG = "timing.log"  # interleaving of the two (script --log-timing, "I/O <delay> <bytes>" lines)
+STDIN_FILE = "stdin.txt"  # what the program read, after line editing
+EXPECTED_FILE = "expected.txt"  # what the program printed, without the echo
+DIFF_LINES = 200
+
+
+class ReplayResult:
+    def __init__(self, session: str, returncode: int, output: bytes, expected: bytes, seconds: float,
+                 timed_out: bool = False):
+        self.session = session
+        self.returncode = returncode
+        self.output = output
+        self.expected = expected
+        self.seconds = seconds
+        self.timed_out = timed_out  # stopped after the timeout; output is what it printed until then
+
+    @property
+    def matches(self) -> bool:
+        return not self.timed_out and normalize(self.output) == normalize(self.expected)
+
+    def diff(self, limit: int = DIFF_LINES) -> str:
+        lines = list(difflib.unified_diff(normalize(self.expected).decode(errors="replace").splitlines(),
+                                          normalize(self.output).decode(errors="replace").splitlines(),
+                                          "recorded", "replay", lineterm=""))
+        if len(lines) > limit:
+            lines = lines[:limit] + [f"... {len(lines) - limit} more diff lines"]
+        return "\n".join(lines)
+
+    def summary(self) -> str:
+        status = "output matches the recording" if self.matches else "output DIFFERS from the recording"
+        if self.timed_out:
+            status = "TIMED OUT"
+        return f"{self.session}: {status} (exit {self.returncode}, {self.seconds * 1000:.0f} ms)"
+
+
+def normalize(data: bytes) -> bytes:
+    return data.replace(b"\r\n", b"\n").rstrip(b"\n")
+
+
+def session_dir(root_directory: str, name: str) -> str:
+    return os.path.join(root_directory, SESSIONS_DIR, name)
+
+
+def new_session_name() -> str:
+    return time.strftime("session-%Y%m%d-%H%M%S")
+
+
+def list_sessions(root_directory: str) -> List[str]:
+    """Recorded sessions that can be replayed, newest first."""
+    try:
+        names = os.listdir(os.path.join(root_directory, SESSIONS_DIR))
+    except OSError:
+        return []
+    usable = [n for n in names if os.path.isfile(os.path.join(root_directory, SESSIONS_DIR, n, INPUT_LOG))]
+    return sorted(usable, reverse=True)
+
+
+def record_command(root_directory: str, executable_name: str, name: str) -> str:
+    """
+    Shell command that runs the binary on a pty under `script`, logging input, output and their timing
+    separately (util-linux >= 2.35). Older `script` versions only get a plain typescript, which cannot be replayed.
+    """
+    root_path = shelling.windows_to_wsl(root_directory)
+    directory = shlex.quote(f"{SESSIONS_DIR}/{name}")
+    binary = shlex.quote("./" + executable_name)
+    return (f"cd {root_path} && mkdir -p {directory} && "
+            f"if script --help 2>&1 | grep -q -- --log-in; then "
+            f"script -q -e --log-in {directory}/{INPUT_LOG} --log-out {directory}/{OUTPUT_LOG} "
+            f"--log-timing {directory}/{TIMING_LOG} -c {binary}; "
+            f"else echo 'script is too old to record input; saving a plain transcript'; "
+            f"script -q -e -f {directory}/typescript -c {binary}; fi")
+
+
+def _strip_script_banner(data: bytes) -> bytes:
+    """Drop script's "Script started ..." first line and "\\nScript done ..." trailer."""
+    if data.startswith(b"Script started"):
+        data = data.split(b"\n", 1)[1] if b"\n" in data else b""
+    end = data.rfind(b"\nScript done")
+    return data[:end] if end != -1 else data
+
+
+def extract_stdin(keystrokes: bytes) -> bytes:
+    """
+    Apply the terminal's line editing to the raw keystrokes and return what the program read:
+    Enter ends a line, Backspace/^U/^W edit the current line, ^D on an empty line and ^C end the input.
+    """
+    lines, current = [], bytearray()
+    for byte in keystrokes:
+        ch = bytes([byte])
+        if ch in (b"\r", b"\n"):
+            lines.append(bytes(current) + b"\n")
+            current.clear()
+        elif ch in (b"\x7f", b"\x08"):
+            if current:
+                current.pop()
+        elif ch == b"\x15":  # ^U
+            current.clear()
+        elif ch == b"\x17":  # ^W
+            while current and current[-1:] == b" ":
+                current.pop()
+            while current and current[-1:] != b" ":
+                current.pop()
+        elif ch == b"\x04":  # ^D
+            if not current:
+                break
+            lines.append(bytes(current))
+            current.clear()
+        elif ch == b"\x03":  # ^C: the program was interrupted
+            break
+        else:
+            current += ch
+    return b"".join(lines) + bytes(current)
+
+
+def _echo_of(chunk: bytes) -> bytes:
+    echo = bytearray()
+    for byte in chunk:
+        if byte == 0x0d:
+            echo += b"\r\n"
+        elif byte in (0x7f, 0x08):
+            echo += b"\b \b"
+        elif byte >= 0x20 or byte in (0x09,):
+            echo.append(byte)
+    return bytes(echo)
+
+
+def strip_echo(keystrokes: bytes, output: bytes, timing: str) -> bytes:
+    """
+    Remove the tty echo of the typed input from the recorded output, using the timing log to know which
+    output follows which keystroke. Echo that does not match (e.g. a program that turned echo off) is kept.
+    """
+    clean = bytearray()
+    in_pos = out_pos = 0
+    pending = b""
+    for line in timing.splitlines():
+        parts = line.split()
+        if len(parts) < 3 or parts[0] not in ("I", "O"):
+            continue
+        try:
+            size = int(parts[2])
+        except ValueError:
+            continue
+        if parts[0] == "I":
+            pending += _echo_of(keystrokes[in_pos:in_pos + size])
+            in_pos += size
+            continue
+        chunk = output[out_pos:out_pos + size]
+        out_pos += size
+        matched = 0
+        while matched < len(chunk) and matched < len(pending) and chunk[matched] == pending[matched]:
+            matched += 1
+        if matched < len(chunk) and matched < len(pending):
+            pending = b""  # not an echo after all
+            clean += chunk
+            continue
+        pending = pending[matched:]
+        clean += chunk[matched:]
+    clean += output[out_pos:]
+    return bytes(clean)
+
+
+def finalize(root_directory: str, name: str) -> bool:
+    """Turn the raw script logs into stdin.txt and expected.txt. Returns False if there is nothing to replay."""
+    directory = session_dir(root_directory, name)
+    try:
+        with open(os.path.join(directory, INPUT_LOG), "rb") as handle:
+            keystrokes = _strip_script_banner(handle.read())
+        with open(os.path.join(directory, OUTPUT_LOG), "rb") as handle:
+            output = _strip_script_banner(handle.read())
+        with open(os.path.join(directory, TIMING_LOG), "r", encoding="utf-8", errors="replace") as handle:
+            timing = handle.read()
+    except OSError as exc:
+        print(f"Session {name} has no input log: {exc}")
+        return False
+    with open(os.path.join(directory, STDIN_FILE), "wb") as handle:
+        handle.write(extract_stdin(keystrokes))
+    with open(os.path.join(directory, EXPECTED_FILE), "wb") as handle:
+        handle.write(strip_echo(keystrokes, output, timing))
+    return True
+
+
+def stdin_path(root_directory: str, name: str) -> Optional[str]:
+    """
+    The session's extracted stdin, for use as a benchmark / PGO / tune input.
+    Extracted on first use (the recording runs in its own window, so nothing is notified when it ends).
+    """
+    directory = session_dir(root_directory, name)
+    path = os.path.join(directory, STDIN_FILE)
+    try:
+        fresh = os.path.getmtime(path) >= os.path.getmtime(os.path.join(directory, INPUT_LOG))
+    except OSError:
+        fresh = False
+    if not fresh and not finalize(root_directory, name):
+        return None
+    return path
+
+
+def replay(root_directory: str, name: str, executable_name: str, distro: Optional[str] = None,
+           timeout: Optional[float] = None) -> Optional[ReplayResult]:
+    """
+    Run the binary with the session's stdin (no person typing) and compare its output with the recording.
+    The run is a jobs.Job: after `timeout` seconds it is stopped inside WSL too and the result is marked timed_out.
+    """
+    path = stdin_path(root_directory, name)
+    if path is None:
+        return None
+    with open(os.path.join(session_dir(root_directory, name), EXPECTED_FILE), "rb") as handle:
+        expected = handle.read()
+    cmd = f"cd {shelling.windows_to_wsl(root_directory)} && ./{shlex.quote(executable_name)}"
+    job = jobs.Job(f"replay {name}", distro=distro, timeout=timeout)
+    start = time.perf_counter()
+    with open(path, "rb") as stdin:
+        proc = subprocess.Popen(shelling.wsl_args(job.wrap(cmd), distro=distro), stdin=stdin, stdout=subprocess.PIPE,
+                                stderr=subprocess.STDOUT)
+        output, _stderr = jobs.communicate(job, proc)
+    return ReplayResult(name, proc.returncode, output or b"", expected, time.perf_counter() - start,
+                        timed_out=job.timed_out)
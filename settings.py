@@ -0,0 +1,37 @@
+import json
+import os
+import sys
+from typing import Optional
+
+# Detect if running as PyInstaller exe
+if getattr(sys, 'frozen', False):
+    # For bundled resources (read-only)
+    PROGRAM_BASE_PATH = sys._MEIPASS
+    # For user data (writable) - use AppData folder
+    user_data_dir = os.path.join(os.path.expanduser("~"), ".nopaste")
+    os.makedirs(user_data_dir, exist_ok=True)
+    SETTINGS_FILE = os.path.join(user_data_dir, "settings.json")
+else:
+    PROGRAM_BASE_PATH = os.path.abspath(".")
+    SETTINGS_FILE = os.path.join(PROGRAM_BASE_PATH, "settings.json")
+
+
+def load_settings_file(path: str = SETTINGS_FILE) -> Optional[dict]:
+    """Read settings.json; returns None (after printing why) if it is missing or unreadable."""
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as handle:
+            data = json.load(handle)
+    except (OSError, json.JSONDecodeError) as exc:
+        print(f"Failed to load settings: {exc}")
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def save_settings_file(data: dict, path: str = SETTINGS_FILE):
+    try:
+        with open(path, "w", encoding="utf-8") as handle:
+            json.dump(data, handle, indent=2)
+    except OSError as exc:
+        print(f"Failed to save settings: {exc}")
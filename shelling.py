@@ -2,11 +2,50 @@ import os
 import shlex
 import subprocess
 import sys
+import tempfile
+from functools import lru_cache
 from typing import List, Tuple, Optional, Union
 import shutil
 
+import tracing
+
 CREATE_NEW_CONSOLE = 0x00000010
 
+# GUI option name -> g++ flag
+OPTION_FLAGS = {
+    "Optimize": "-O2",
+    "Optimize more": "-O3",
+    "Optimize fast": "-Ofast",
+    "LTO": "-flto=auto",
+    "Native arch": "-march=native",
+    "Warn All": "-Wall",
+    "Debug info": "-g",
+    "Warnings as errors": "-Werror",
+    "Link static": "-static",
+    "Split DWARF": "-gsplit-dwarf",
+    "GDB index": "-Wl,--gdb-index",
+}
+# options that change how we build rather than adding a g++ flag
+BUILD_MODE_OPTIONS = ("Native mirror", "Build daemon", "Memory throttle")
+# only meaningful together with -g
+DEBUG_ONLY_OPTIONS = ("Split DWARF", "GDB index")
+
+# options that pick the optimization level; the last enabled one wins, as with the g++ flags
+OPTIMIZATION_OPTIONS = ("Optimize", "Optimize more", "Optimize fast", "LTO", "Native arch")
+
+# linker name -> g++ flag; "default" lets g++ pick (usually GNU ld.bfd)
+LINKER_FLAGS = {
+    "default": None,
+    "mold": "-fuse-ld=mold",
+    "lld": "-fuse-ld=lld",
+    "gold": "-fuse-ld=gold",
+}
+LINKER_BINARIES = {"mold": "mold", "lld": "ld.lld", "gold": "ld.gold"}
+
+# build scratch files (response files, caches) live in <root>/.nopaste
+RESPONSE_DIR = ".nopaste"
+SOURCE_EXTENSIONS = (".cpp",)
+
 def windows_to_wsl(path: str) -> str:
     path = os.path.abspath(path)
     if path.startswith("/"):
@@ -16,13 +55,111 @@ def windows_to_wsl(path: str) -> str:
     rest = path[2:].replace("\\", "/")
     return f" '/mnt/{drive}/{rest}'"
 
-def windows_to_wsl_quote(sources: List[str]) -> str:
-    quoted = ""
+@lru_cache(maxsize=None)
+def _wsl_prefix(directory: str) -> str:
+    """Unquoted WSL form of an absolute directory; cached so each root/drive folder is converted once."""
+    if directory.startswith("/"):
+        return directory.rstrip("/")
+    rest = directory[2:].replace("\\", "/")
+    return f"/mnt/{directory[0].lower()}{rest}".rstrip("/")
+
+def translate_paths(paths: List[str], root_directory: Optional[str] = None) -> List[str]:
+    """
+    Convert many paths to (unquoted) WSL paths in one pass.
+    Paths under root_directory only need a prefix swap, so the root is converted once.
+    """
+    root = os.path.abspath(root_directory) if root_directory else None
+    root_prefix = _wsl_prefix(root) if root else None
+    translated = []
+    for path in paths:
+        path = os.path.abspath(path)
+        if root and path.startswith(root + os.sep):
+            translated.append(root_prefix + path[len(root):].replace("\\", "/"))
+        elif path.startswith("/"):
+            translated.append(path)
+        else:
+            translated.append(_wsl_prefix(os.path.dirname(path)) + "/" + os.path.basename(path))
+    return translated
 
+def expand_sources(sources: List[str]) -> List[str]:
+    """Checked directories stand for the .cpp files directly inside them (what `dir/*.cpp` used to glob)."""
+    expanded = []
+    seen = set()
     for path in sources:
-        sub = windows_to_wsl(path)
-        quoted += " " + sub + ("'/'*.cpp " if os.path.isdir(path) else " ")
-    return quoted
+        if os.path.isdir(path):
+            files = sorted(entry.path for entry in os.scandir(path)
+                           if entry.is_file() and not entry.name.startswith(".")
+                           and entry.name.endswith(SOURCE_EXTENSIONS))
+        else:
+            files = [path]
+        for file in files:
+            normalized = os.path.normpath(file)
+            if normalized not in seen:
+                seen.add(normalized)
+                expanded.append(normalized)
+    return expanded
+
+def windows_to_wsl_quote(sources: List[str]) -> str:
+    with tracing.span("quote sources", "command", sources=len(sources)):
+        paths = translate_paths(expand_sources(sources))
+        return " ".join(shlex.quote(p) for p in paths)
+
+def rsp_quote(arg: str) -> str:
+    """Quote one argument for a gcc @response file (whitespace separated, double quotes and backslash escapes)."""
+    if arg and not any(c in arg for c in " \t\n'\"\\"):
+        return arg
+    return '"' + arg.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+def write_response_file(args: List[str], root_directory: Optional[str], name: str) -> str:
+    """
+    Write args to <root>/.nopaste/<name> (or the temp dir without a root) and return its WSL path,
+    ready to be passed to g++ as `@<path>`. Keeps the bash -lc command short whatever the file count.
+    """
+    directory = os.path.join(root_directory or tempfile.gettempdir(), RESPONSE_DIR)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, name)
+    with open(path, "w", encoding="utf-8", newline="\n") as handle:
+        handle.write("\n".join(rsp_quote(arg) for arg in args))
+        handle.write("\n")
+    return translate_paths([path], root_directory)[0]
+
+def with_status_file(cmd: str, status_path: str) -> str:
+    """
+    cmd, followed by writing "<exit code> <start> <end>" (unix seconds) to status_path (a Windows path),
+    so a command running in a terminal window can still report back. Keeps cmd's exit code.
+    """
+    target = shlex.quote(translate_paths([status_path])[0])
+    return (f"s=$(date +%s.%N); {{ {cmd}; }}; rc=$?; "
+            f"echo \"$rc $s $(date +%s.%N)\" > {target}.tmp && mv {target}.tmp {target}; (exit $rc)")
+
+def read_status_file(status_path: str) -> Optional[Tuple[int, float]]:
+    """(exit code, seconds) from a with_status_file() status, or None while the command still runs."""
+    try:
+        with open(status_path, "r", encoding="utf-8") as handle:
+            rc, start, end = handle.read().split()
+        return int(rc), float(end) - float(start)
+    except (OSError, ValueError):
+        return None
+
+def source_args(sources: List[str], root_directory: Optional[str] = None) -> List[str]:
+    return ["-IHeaders", "-ISources"] + translate_paths(expand_sources(sources), root_directory)
+
+def is_native() -> bool:
+    """True outside Windows (CI, or NoPaste started from inside WSL): there is no wsl.exe and bash runs directly."""
+    return os.name != "nt" and not shutil.which("wsl.exe")
+
+def wsl_args(cmd: str, distro: Optional[str] = None) -> List[str]:
+    """
+    Return the argv that runs `bash -lc <cmd>` inside WSL (for callers that need their own Popen).
+    Natively (see is_native) bash runs directly.
+    """
+    if is_native():
+        return ["bash", "-lc", cmd]
+    args = ["wsl.exe"]
+    if distro:
+        args += ["-d", distro]
+    args += ["--", "bash", "-lc", cmd]
+    return args
 
 # def run_wsl_command(cmd: str, distro: Optional[str] = None, capture: bool = False) -> subprocess.CompletedProcess:
 #     """
@@ -43,6 +180,8 @@ def run_wsl_command(
         distro: Optional[str] = None,
         capture: bool = False,
         keep_open: Optional[str] = None,  # None | "shell" | "pause"
+        timeout: Optional[float] = None,
+        job_name: Optional[str] = None,
 ) -> Union[subprocess.CompletedProcess, subprocess.Popen]:
     """
     Run a WSL command.
@@ -54,12 +193,17 @@ def run_wsl_command(
         - "shell": after the cmd finishes, start an interactive bash in that window.
         - "pause": after the cmd finishes, prompt "Press any key to exit..." and wait.
 
+    - timeout: seconds before the command is stopped (see jobs.Job); None = no limit.
+    Every command is registered as a jobs.Job, so jobs.cancel_all() can stop it and all of its children.
+
     Notes:
-    - With the "start" fallback (cmd.exe /c start) the returned Popen usually refers
-      to the short-lived cmd.exe wrapper. If you need to reliably wait for the
-      window to close, prefer Windows Terminal (wt.exe) or use keep_open to create
-      a long-lived process inside the terminal.
+    - Windows Terminal (wt.exe) returns at once, so the returned Popen does not track the window; the job
+      is still cancellable through its pid file. Without wt.exe the window is a new console owned by the
+      returned wsl.exe process.
     """
+    import jobs
+    job = jobs.Job(job_name or cmd[:80], distro=distro, interactive=not capture, timeout=timeout)
+    cmd = job.wrap(cmd)
     if keep_open == "shell":
         wrapped_cmd = f'{cmd}; echo; exec bash'
     elif keep_open == "pause":
@@ -68,14 +212,16 @@ def run_wsl_command(
         wrapped_cmd = cmd
 
     # WSL command base
-    wsl_base = ["wsl.exe"]
-    if distro:
-        wsl_base += ["-d", distro]
-    wsl_base += ["--", "bash", "-lc", wrapped_cmd]
+    wsl_base = wsl_args(wrapped_cmd, distro=distro)
 
     if capture:
-        # same behavior as before
-        return subprocess.run(wsl_base, text=True, capture_output=True)
+        # "spawn" is only process creation; the shell's own startup shows up in "wsl command"
+        with tracing.span("spawn", "shell", job=job.name):
+            proc = subprocess.Popen(wsl_base, text=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                    stdin=subprocess.DEVNULL)
+        with tracing.span("wsl command", "shell", job=job.name):
+            stdout, stderr = jobs.communicate(job, proc)
+        return subprocess.CompletedProcess(wsl_base, proc.returncode, stdout, stderr)
 
     # Non-capture: open a new terminal window
     wt_path = shutil.which("wt.exe") or shutil.which("wt")
@@ -86,46 +232,102 @@ def run_wsl_command(
         if distro:
             wt_args += ["-d", distro]
         wt_args += ["--", "bash", "-lc", wrapped_cmd]
-        return subprocess.Popen(wt_args, close_fds=True)
+        with tracing.span("spawn", "shell", job=job.name, window="wt"):
+            proc = subprocess.Popen(wt_args, close_fds=True)
+        job.detached = True
+    else:
+        # Fallback: wsl.exe in a new console window; unlike `cmd.exe /c start` the Popen is the window's process
+        with tracing.span("spawn", "shell", job=job.name, window="console"):
+            proc = subprocess.Popen(wsl_base, close_fds=True, creationflags=CREATE_NEW_CONSOLE)
+    job.attach(proc)
+    return proc
 
-    # Fallback: cmd.exe /c start "" wsl.exe ...  (start opens a new window)
-    start_args = ["cmd.exe", "/c", "start", "", "wsl.exe"]
-    if distro:
-        start_args += ["-d", distro]
-    start_args += ["--", "bash", "-lc", wrapped_cmd]
-    # Note: Popen here refers to the short-lived cmd.exe process (it returns immediately).
-    return subprocess.Popen(start_args, shell=False, close_fds=True)
+def option_enabled(custom_options, name: str) -> bool:
+    """Options may be tk BooleanVars (GUI) or plain bools (settings.json, matrix cells)."""
+    value = custom_options.get(name, False)
+    if hasattr(value, "get"):
+        value = value.get()
+    return bool(value)
+
+def options_to_flags(custom_options, linker: Optional[str] = None) -> List[str]:
+    flags = []
+    if custom_options is not None:
+        debug = option_enabled(custom_options, "Debug info")
+        for name, flag in OPTION_FLAGS.items():
+            if not option_enabled(custom_options, name):
+                continue
+            if name in DEBUG_ONLY_OPTIONS and not debug:
+                continue
+            # GNU ld.bfd does not understand --gdb-index
+            if name == "GDB index" and LINKER_FLAGS.get(linker or "default") is None:
+                continue
+            flags.append(flag)
+    linker_flag = LINKER_FLAGS.get(linker or "default")
+    if linker_flag:
+        flags.append(linker_flag)
+    return flags
 
 def compile_in_wsl(sources: List[str],
                    distro: Optional[str] = None,
                    root_path="/",
                    custom_options=None,
                    language_standard=None,
-                   executable_name=None
+                   executable_name=None,
+                   linker=None,
+                   inline=False,
+                   root_directory=None,
+                   timeout: Optional[float] = None,
+                   status_path: Optional[str] = None
                    ) -> Tuple[bool, str]:
     """
     Compile the given source files in WSL via g++.
     - sources: list of Windows paths OR WSL paths to .cpp files
     - output_binary_wsl: if provided, should be a WSL path for the produced executable (e.g. /home/user/prog)
                          If None, produced binary will be next to first source with name a.out or <basename>.
+    - root_directory: Windows path of root_path; the g++ arguments go into <root>/.nopaste/compile.rsp
+    - inline: run g++ in this process' console and wait for it (headless CLI) instead of a new terminal window.
+    - timeout: seconds before the compiler is stopped (terminal window only); None = no limit.
+    - status_path: terminal window only; the exit code and compile time are written there (see with_status_file).
     Returns: (success, wsl_path_of_binary). Compilation stdout+stderr is printed and returned via console.
     """
-    srcs_quoted = windows_to_wsl_quote(sources)
-    # cmd = f"g++ {extra_flags} -o {shlex.quote(wsl_bin)} {srcs_quoted}"
-    options_str = ""
-    if custom_options is not None:
-        options_str += " -O2 " if custom_options["Optimize"].get() else ""
-        options_str += " -Wall " if custom_options["Warn All"].get() else ""
-        options_str += " -g " if custom_options["Debug info"].get() else ""
-        options_str += " -Werror " if custom_options["Warnings as errors"].get() else ""
-        options_str += " -static " if custom_options["Link static"].get() else ""
-    lang_std_str = f" -std={language_standard} " if language_standard is not None else ""
     if executable_name is None:
         executable_name = "a.out"
+    use_mirror = bool(root_directory) and custom_options is not None and option_enabled(custom_options, "Native mirror")
+    with tracing.span("build command", "command", sources=len(sources)):
+        args = options_to_flags(custom_options, linker=linker)
+        if language_standard is not None:
+            args.append(f"-std={language_standard}")
+        if root_directory:
+            import modules
+            if modules.modules_standard(language_standard):
+                # module interfaces have to be compiled before the sources importing them
+                sources, module_args = modules.order_sources(sources, root_directory, list(args), distro=distro)
+                args += module_args
+        if use_mirror:
+            import mirror
+            args += mirror.relative_source_args(sources, root_directory)
+        else:
+            args += source_args(sources, root_directory)
+        args += ["-o", executable_name]
+        rsp_path = write_response_file(args, root_directory, "compile.rsp")
 
-    cmd = f"cd {root_path} && g++ {options_str} {lang_std_str} -IHeaders -ISources {srcs_quoted} -o {executable_name}"
-    print("Compiling inside WSL: ", cmd)
-    cp = run_wsl_command(cmd, distro=distro, capture=False, keep_open="pause")
+    cmd = f"cd {root_path} && g++ @{shlex.quote(rsp_path)}"
+    if use_mirror:
+        with tracing.span("mirror sync", "fs"):
+            mirror_path = mirror.sync_mirror(sources, root_directory, distro=distro)
+        if mirror_path is not None:
+            cmd = mirror.mirrored_compile_command(mirror_path, root_path, rsp_path, executable_name)
+        else:
+            # the root-relative arguments work just as well from the Windows tree
+            print("Falling back to compiling in place.")
+    print("Compiling inside WSL: ", cmd, f"({len(args)} arguments in response file)")
+    if inline:
+        with tracing.span("compile", "compile", target=executable_name):
+            return subprocess.call(wsl_args(cmd, distro=distro)) == 0
+    if status_path:
+        cmd = with_status_file(cmd, status_path)
+    cp = run_wsl_command(cmd, distro=distro, capture=False, keep_open="pause", timeout=timeout,
+                         job_name=f"compile {executable_name}")
     print("--- compile stdout/stderr ---")
     print(cp.stdout, cp.stderr)
     success = (cp.returncode == 0)
@@ -136,6 +338,14 @@ def check_script_installed(distro: Optional[str] = None) -> bool:
     cp = run_wsl_command("command -v script >/dev/null 2>&1 && echo OK || echo MISSING", distro=distro, capture=True)
     return "OK" in cp.stdout
 
+def detect_linkers(distro: Optional[str] = None) -> List[str]:
+    """Return the fast linkers (mold, lld, gold) installed in the target WSL distro."""
+    probe = "; ".join(f"command -v {binary} >/dev/null 2>&1 && echo {name}"
+                      for name, binary in LINKER_BINARIES.items())
+    cp = run_wsl_command(probe + "; true", distro=distro, capture=True)
+    found = set((cp.stdout or "").split())
+    return [name for name in LINKER_BINARIES if name in found]
+
 def run_interactive_in_new_console(binary_wsl_path: str,
                                    recording_windows_path: str,
                                    distro: Optional[str] = None):
@@ -0,0 +1,258 @@
+import json
+import os
+import re
+import secrets
+import shlex
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import jobs
+import shelling
+import tracing
+
+DEFAULT_TIMEOUT = 60.0  # seconds per case
+LIST_TIMEOUT = 10  # seconds for --gtest_list_tests and friends
+FAILED_FILE = "test-failures.json"
+CATCH_SPECIAL_RE = re.compile(r"([\\,\[\]*])")
+
+
+class TestCase:
+    def __init__(self, binary: str, name: Optional[str] = None, framework: str = "plain"):
+        self.binary = binary  # root-relative path
+        self.name = name  # None: the whole binary is one case
+        self.framework = framework  # gtest | catch2 | plain
+
+    @property
+    def label(self) -> str:
+        return f"{self.binary}::{self.name}" if self.name else self.binary
+
+    def argv(self) -> List[str]:
+        args = ["./" + self.binary if "/" not in self.binary else self.binary]
+        if self.framework == "gtest" and self.name:
+            args.append(f"--gtest_filter={self.name}")
+        elif self.framework == "catch2" and self.name:
+            # Catch2 test specs treat these characters as syntax
+            args.append(CATCH_SPECIAL_RE.sub(r"\\\1", self.name))
+        return args
+
+    def to_dict(self) -> dict:
+        return {"binary": self.binary, "name": self.name, "framework": self.framework}
+
+
+class TestResult:
+    def __init__(self, case: TestCase, status: str, seconds: float, output: str):
+        self.case = case
+        self.status = status  # PASS | FAIL | TIMEOUT | CRASH
+        self.seconds = seconds
+        self.output = output
+
+
+def find_test_binaries(root_directory: str, extra: Optional[List[str]] = None,
+                       distro: Optional[str] = None) -> List[str]:
+    """
+    Executable ELF files under the root (outside .nopaste) whose name contains "test", plus `extra`
+    (e.g. the project's output binary) if they exist. Returns root-relative paths.
+    """
+    root_path = shelling.windows_to_wsl(root_directory)
+    extra_args = " ".join(shlex.quote(p) for p in extra or [])
+    cmd = (f"cd {root_path} && {{ find . -path ./{shelling.RESPONSE_DIR} -prune -o -type f -perm -u+x "
+           f"-iname '*test*' -print; for f in {extra_args}; do [ -x \"$f\" ] && echo \"./$f\"; done; }} | "
+           f"while IFS= read -r f; do [ \"$(head -c 4 \"$f\" | tail -c 3)\" = ELF ] && echo \"${{f#./}}\"; done")
+    cp = shelling.run_wsl_command(cmd, distro=distro, capture=True)
+    return sorted(set(line for line in (cp.stdout or "").splitlines() if line))
+
+
+def parse_gtest_list(text: str) -> List[str]:
+    names, suite = [], None
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        entry = line.split("#", 1)[0].rstrip()
+        if not line.startswith(" "):
+            suite = entry.strip()
+        elif suite:
+            names.append(suite + entry.strip())
+    return names
+
+
+def list_cases(root_directory: str, binaries: List[str], distro: Optional[str] = None) -> List[TestCase]:
+    """
+    One WSL call that asks every binary for its test list: GoogleTest (--gtest_list_tests) and Catch2
+    (--list-test-names-only in v2, --list-tests --verbosity quiet in v3) binaries are split into one case per
+    test; anything else runs as a single case. A binary that lists no tests also runs whole.
+    (Catch2 v2 exits with the number of tests listed, so only GoogleTest's exit code is checked.)
+    """
+    marker = "@@NOPASTE-" + secrets.token_hex(4)
+    root_path = shelling.windows_to_wsl(root_directory)
+    script = [f"cd {root_path}"]
+    for binary in binaries:
+        exe = shlex.quote("./" + binary)
+        script.append(
+            f"echo '{marker} bin {binary}'; "
+            f"if grep -qa -- --gtest_list_tests {exe}; then echo '{marker} fw gtest'; "
+            f"timeout {LIST_TIMEOUT} {exe} --gtest_list_tests < /dev/null || echo '{marker} fw plain'; "
+            f"elif grep -qa -- --list-test-names-only {exe}; then echo '{marker} fw catch2'; "
+            f"timeout {LIST_TIMEOUT} {exe} --list-test-names-only < /dev/null; "
+            f"elif grep -qa -- --list-reporters {exe}; then echo '{marker} fw catch2'; "
+            f"timeout {LIST_TIMEOUT} {exe} --list-tests --verbosity quiet < /dev/null; "
+            f"else echo '{marker} fw plain'; fi")
+    cp = shelling.run_wsl_command("\n".join(script), distro=distro, capture=True)
+
+    listed: Dict[str, list] = {}
+    binary = None
+    for line in (cp.stdout or "").splitlines():
+        if line.startswith(marker + " bin "):
+            binary = line[len(marker) + 5:]
+            listed[binary] = ["plain", []]
+        elif line.startswith(marker + " fw ") and binary:
+            listed[binary][0] = line[len(marker) + 4:]
+            if listed[binary][0] == "plain":
+                listed[binary][1] = []
+        elif binary and line.strip():
+            listed[binary][1].append(line)
+
+    cases = []
+    for binary in binaries:
+        framework, lines = listed.get(binary, ["plain", []])
+        if framework == "gtest":
+            names = parse_gtest_list("\n".join(lines))
+        elif framework == "catch2":
+            names = [line.strip() for line in lines if line.strip()]
+        else:
+            names = []
+        if names:
+            cases.extend(TestCase(binary, name, framework) for name in names)
+        else:
+            cases.append(TestCase(binary))
+    return cases
+
+
+def _run_shard(cases: List[TestCase], root_path: str, timeout: float, distro: Optional[str], on_result,
+               results: List[Optional[TestResult]], indices: List[int]):
+    """Run a shard's cases one after another in a single shell, reporting each as soon as it finishes."""
+    marker = "@@NOPASTE-" + secrets.token_hex(4)
+    lines = [f"cd {root_path} && T=$(mktemp -d) && trap 'rm -rf \"$T\"' EXIT || exit 1",
+             f"run_case() {{ i=$1; shift; s=$EPOCHREALTIME; "
+             f"timeout -k 1 {timeout} \"$@\" > \"$T/out\" 2>&1 < /dev/null; rc=$?; e=$EPOCHREALTIME; "
+             f"echo '{marker} begin'; cat \"$T/out\"; "
+             f"[ -s \"$T/out\" ] && [ -n \"$(tail -c 1 \"$T/out\")\" ] && echo; "
+             f"echo \"{marker} end $i $rc $s $e\"; }}"]
+    for index in indices:
+        lines.append("run_case " + str(index) + " " + " ".join(shlex.quote(a) for a in cases[index].argv()))
+    with tracing.span("test shard", "run", cases=len(indices)):
+        job = jobs.Job(f"tests ({len(indices)} cases)", distro=distro)
+        proc = subprocess.Popen(shelling.wsl_args(job.wrap("\n".join(lines)), distro=distro), stdout=subprocess.PIPE,
+                                stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL, text=True, errors="replace")
+        job.attach(proc)
+        output: List[str] = []
+        for line in proc.stdout:
+            if line.startswith(marker + " begin"):
+                output = []
+                continue
+            if not line.startswith(marker + " end "):
+                output.append(line)
+                continue
+            try:
+                _end, index, rc, start, end = line[len(marker) + 1:].split()
+                index, rc = int(index), int(rc)
+                seconds = float(end.replace(",", ".")) - float(start.replace(",", "."))
+            except ValueError:
+                continue
+            if rc == 0:
+                status = "PASS"
+            elif rc in (124, 137):
+                status = "TIMEOUT"
+            elif rc > 128:
+                status = "CRASH"
+            else:
+                status = "FAIL"
+            results[index] = TestResult(cases[index], status, seconds, "".join(output))
+            # timed inside the shell; it ended about now
+            tracing.add_span("test case", "run", time.perf_counter() - seconds, seconds, case=cases[index].label,
+                             status=status)
+            if on_result is not None:
+                on_result(results[index])
+        proc.wait()
+        job.finish()
+
+
+def run_tests(cases: List[TestCase],
+              root_directory: str,
+              parallel: Optional[int] = None,
+              timeout: float = DEFAULT_TIMEOUT,
+              distro: Optional[str] = None,
+              on_result=None,
+              merge_failed: bool = False) -> List[TestResult]:
+    """
+    Run the cases sharded across `parallel` shells (round-robin), each case under `timeout -k 1`.
+    on_result(result) is called from the shard threads as each case finishes. Cases whose shard
+    died before reporting them come back as CRASH. merge_failed: the cases are a subset (e.g. --filter),
+    so the stored failures of the other cases are kept.
+    """
+    root_path = shelling.windows_to_wsl(root_directory)
+    parallel = max(1, min(parallel or os.cpu_count() or 1, len(cases) or 1))
+    results: List[Optional[TestResult]] = [None] * len(cases)
+    shards = [list(range(i, len(cases), parallel)) for i in range(parallel)]
+    errors: Dict[int, str] = {}  # case index -> why its shard failed
+    with ThreadPoolExecutor(max_workers=parallel) as pool:
+        futures = [(pool.submit(_run_shard, cases, root_path, timeout, distro, on_result, results, shard), shard)
+                   for shard in shards if shard]
+        for future, shard in futures:
+            try:
+                future.result()
+            except Exception as exc:
+                print(f"Test shard failed: {type(exc).__name__}: {exc}")
+                errors.update((index, f"the test shard failed: {type(exc).__name__}: {exc}") for index in shard)
+    final = []
+    for index, (case, result) in enumerate(zip(cases, results)):
+        if result is None:
+            result = TestResult(case, "CRASH", 0.0,
+                                errors.get(index, "the test shell exited before this case reported"))
+            if on_result is not None:
+                on_result(result)
+        final.append(result)
+    save_failed(root_directory, final, merge=merge_failed)
+    return final
+
+
+def save_failed(root_directory: str, results: List[TestResult], merge: bool = False):
+    """Store the cases that did not pass; merge: keep the stored failures of cases that were not run."""
+    directory = os.path.join(root_directory, shelling.RESPONSE_DIR)
+    os.makedirs(directory, exist_ok=True)
+    failed = [r.case.to_dict() for r in results if r.status != "PASS"]
+    if merge:
+        ran = {r.case.label for r in results}
+        failed = [case.to_dict() for case in load_failed(root_directory) if case.label not in ran] + failed
+    try:
+        with open(os.path.join(directory, FAILED_FILE), "w", encoding="utf-8") as handle:
+            json.dump(failed, handle, indent=1)
+    except OSError as exc:
+        print(f"Failed to save the failed test list: {exc}")
+
+
+def load_failed(root_directory: str) -> List[TestCase]:
+    """Cases that did not pass in the last run (<root>/.nopaste/test-failures.json)."""
+    try:
+        with open(os.path.join(root_directory, shelling.RESPONSE_DIR, FAILED_FILE), "r", encoding="utf-8") as handle:
+            data = json.load(handle)
+    except (OSError, ValueError):
+        return []
+    return [TestCase(d["binary"], d.get("name"), d.get("framework", "plain"))
+            for d in data if isinstance(d, dict) and "binary" in d]
+
+
+def format_result(result: TestResult) -> str:
+    return f"  {result.status:<7} {result.case.label} ({result.seconds * 1000:.0f} ms)"
+
+
+def format_report(results: List[TestResult]) -> str:
+    lines = []
+    for result in results:
+        if result.status != "PASS":
+            lines.append(f"--- {result.status} {result.case.label}")
+            lines.append(result.output.rstrip()[-4000:])
+    passed = sum(r.status == "PASS" for r in results)
+    lines.append(f"{passed}/{len(results)} passed")
+    return "\n".join(lines)
@@ -0,0 +1,201 @@
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+# Taken as early as possible: run.py imports this module before anything else.
+PROCESS_T0 = time.perf_counter()
+
+startup_phases: List[Tuple[str, float, float]] = []  # (name, start offset, duration) in seconds
+startup_marks: List[Tuple[str, float]] = []  # (name, offset) in seconds
+
+TRACE_FILE = "trace.json"
+MAX_EVENTS = 100_000  # oldest spans are dropped past this, so a long session stays bounded
+enabled = os.environ.get("NOPASTE_TRACE", "1") != "0"
+# (name, category, start, duration or None for an instant, thread id, args); deque.append is thread-safe
+_events: deque = deque(maxlen=MAX_EVENTS)
+_thread_names: Dict[int, str] = {}
+
+
+def _pre_python_seconds() -> Optional[float]:
+    """
+    Time spent before the interpreter reached this module: process creation, and for the
+    PyInstaller --onefile build the bootloader unpacking into _MEIPASS (the bootloader is our parent).
+    Needs psutil; returns None without it.
+    """
+    try:
+        import psutil
+    except ImportError:
+        return None
+    try:
+        proc = psutil.Process(os.getpid())
+        if getattr(sys, 'frozen', False) and proc.parent() is not None:
+            proc = proc.parent()
+        return max(0.0, time.time() - (time.perf_counter() - PROCESS_T0) - proc.create_time())
+    except psutil.Error:
+        return None
+
+
+def _record(name: str, category: str, start: float, duration: Optional[float], args: Optional[dict]):
+    ident = threading.get_ident()
+    if ident not in _thread_names:
+        _thread_names[ident] = threading.current_thread().name
+    _events.append((name, category, start, duration, ident, args))
+
+
+@contextmanager
+def span(name: str, category: str = "app", **args):
+    """
+    Time a block as one trace span (nested spans are fine, also across threads).
+    Keep `name` generic ("compile", "link") and put the specifics in args, so the summary can group them.
+    Costs two perf_counter calls and an append; nothing at all with tracing disabled (NOPASTE_TRACE=0).
+    """
+    if not enabled:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _record(name, category, start, time.perf_counter() - start, args or None)
+
+
+def add_span(name: str, category: str, start: float, duration: float, **args):
+    """Record a span timed elsewhere (e.g. inside the WSL shell); start is a time.perf_counter() value."""
+    if enabled:
+        _record(name, category, start, duration, args or None)
+
+
+def instant(name: str, category: str = "app", **args):
+    if enabled:
+        _record(name, category, time.perf_counter(), None, args or None)
+
+
+@contextmanager
+def phase(name: str):
+    """Time a startup phase, relative to PROCESS_T0; also recorded as a "startup" span."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        end = time.perf_counter()
+        startup_phases.append((name, start - PROCESS_T0, end - start))
+        if enabled:
+            _record(name, "startup", start, end - start, None)
+
+
+def mark(name: str):
+    startup_marks.append((name, time.perf_counter() - PROCESS_T0))
+    instant(name, "startup")
+
+
+def clear():
+    _events.clear()
+
+
+def events() -> list:
+    return list(_events)
+
+
+def chrome_trace() -> dict:
+    """
+    The collected spans in the Chrome trace event format ("X" complete events, "i" instants, microseconds
+    since process start), which chrome://tracing, Perfetto (ui.perfetto.dev) and speedscope all open.
+    """
+    pid = os.getpid()
+    trace = [{"name": "process_name", "ph": "M", "pid": pid, "tid": 0, "args": {"name": "NoPaste"}}]
+    trace += [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+              for tid, name in list(_thread_names.items())]
+    for name, category, start, duration, tid, args in list(_events):
+        event = {"name": name, "cat": category, "ts": round((start - PROCESS_T0) * 1e6, 1), "pid": pid, "tid": tid}
+        if duration is None:
+            event.update(ph="i", s="t")
+        else:
+            event.update(ph="X", dur=round(duration * 1e6, 1))
+        if args:
+            event["args"] = {key: value if isinstance(value, (int, float, bool)) else str(value)
+                             for key, value in args.items()}
+        trace.append(event)
+    return {"traceEvents": trace, "displayTimeUnit": "ms"}
+
+
+def export_chrome_trace(path: str) -> int:
+    """Write chrome_trace() to path; returns the number of spans written."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    data = chrome_trace()
+    with open(path, "w", encoding="utf-8") as handle:
+        json.dump(data, handle)
+    return sum(1 for event in data["traceEvents"] if event["ph"] != "M")
+
+
+class SpanStats:
+    def __init__(self, category: str, name: str):
+        self.category = category
+        self.name = name
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+
+def summary() -> List[SpanStats]:
+    """Spans grouped by (category, name), most total time first."""
+    stats: Dict[Tuple[str, str], SpanStats] = {}
+    for name, category, _start, duration, _tid, _args in list(_events):
+        if duration is None:
+            continue
+        entry = stats.get((category, name))
+        if entry is None:
+            entry = stats[(category, name)] = SpanStats(category, name)
+        entry.count += 1
+        entry.total += duration
+        entry.max = max(entry.max, duration)
+    return sorted(stats.values(), key=lambda s: s.total, reverse=True)
+
+
+def totals(since: float = 0.0) -> Dict[str, float]:
+    """Seconds per span name over the spans that started at or after `since` (a time.perf_counter() value)."""
+    result: Dict[str, float] = {}
+    for name, _category, start, duration, _tid, _args in list(_events):
+        if duration is not None and start >= since:
+            result[name] = result.get(name, 0.0) + duration
+    return result
+
+
+def format_summary(limit: int = 40) -> str:
+    """
+    A text table of summary(). Totals add up time in every thread, so parallel compiles can exceed the wall
+    time; nested spans (a compile and the "wsl command" inside it) are each counted in full.
+    """
+    rows = summary()
+    if not rows:
+        return "No spans recorded" + ("" if enabled else " (tracing is disabled, NOPASTE_TRACE=0)") + "."
+    lines = [f"{'category':<10} {'span':<24} {'count':>6} {'total':>10} {'mean':>9} {'max':>9}"]
+    for row in rows[:limit]:
+        lines.append(f"{row.category:<10} {row.name[:24]:<24} {row.count:>6} {row.total * 1000:>8.1f}ms "
+                     f"{row.mean * 1000:>7.1f}ms {row.max * 1000:>7.1f}ms")
+    if len(rows) > limit:
+        lines.append(f"... {len(rows) - limit} more")
+    return "\n".join(lines)
+
+
+def startup_report() -> str:
+    lines = ["========== Startup =========="]
+    pre = _pre_python_seconds()
+    if pre is not None:
+        lines.append(f"{'before python (unpack/spawn)':<30} {pre * 1000:8.1f} ms")
+    events = [(offset, f"{name:<30} {duration * 1000:8.1f} ms  (at {offset * 1000:.1f} ms)")
+              for name, offset, duration in startup_phases]
+    events += [(offset, f"{'> ' + name:<30} {'':8}     (at {offset * 1000:.1f} ms)")
+               for name, offset in startup_marks]
+    lines += [text for _offset, text in sorted(events)]
+    lines.append("=============================")
+    return "\n".join(lines)
@@ -0,0 +1,110 @@
+import os
+import statistics
+from typing import Dict, List, Optional
+
+import benchmark
+import matrix
+import shelling
+
+# variant name -> optimization options turned on (every other OPTIMIZATION_OPTIONS entry is off)
+TUNE_VARIANTS = {
+    "-O2": ["Optimize"],
+    "-O3": ["Optimize more"],
+    "-Ofast": ["Optimize fast"],
+    "-O2 -flto": ["Optimize", "LTO"],
+    "-O3 -march=native": ["Optimize more", "Native arch"],
+    "-O3 -flto -march=native": ["Optimize more", "LTO", "Native arch"],
+}
+
+
+class TuneResult:
+    def __init__(self, variant: str, cell: matrix.MatrixCell):
+        self.variant = variant
+        self.cell = cell
+        self.median: Optional[float] = None  # seconds per run
+        self.times: List[float] = []  # every timed run
+        self.size: Optional[int] = None  # binary bytes
+        self.error = ""
+
+    @property
+    def options(self) -> Dict[str, bool]:
+        return self.cell.options
+
+    @property
+    def ok(self) -> bool:
+        return self.median is not None
+
+
+def variant_options(base_options: Dict[str, bool], enabled: List[str]) -> Dict[str, bool]:
+    options = dict(base_options)
+    for name in shelling.OPTIMIZATION_OPTIONS:
+        options[name] = name in enabled
+    return options
+
+
+def run_tune(sources: List[str],
+             root_directory: str,
+             custom_options: Dict[str, bool],
+             language_standard: str,
+             executable_name: str = "a.out",
+             stdin_path: Optional[str] = None,
+             repeat: int = 5,
+             variants: Optional[Dict[str, List[str]]] = None,
+             distro: Optional[str] = None,
+             jobs: Optional[int] = None,
+             on_result=None) -> List[TuneResult]:
+    """
+    Build every variant in parallel (through matrix.run_matrix), then benchmark them one after another
+    so the runs do not compete for the CPU. Returns the results ranked fastest first; failed variants last.
+    on_result(result) is called as each variant is benchmarked.
+    """
+    variants = variants or TUNE_VARIANTS
+    results = [TuneResult(name, matrix.MatrixCell(language_standard, name, variant_options(custom_options, on)))
+               for name, on in variants.items()]
+    matrix.run_matrix([r.cell for r in results], sources, root_directory, executable_name=executable_name,
+                      distro=distro, jobs=jobs)
+
+    for result in results:
+        binary = f"{result.cell.build_dir}/{executable_name}"
+        if not result.cell.ok:
+            result.error = "build failed"
+        else:
+            try:
+                times = benchmark.time_runs(root_directory, binary, repeat=repeat, stdin_path=stdin_path,
+                                            distro=distro)
+                result.times = times
+                result.median = statistics.median(times) if times else None
+                result.size = os.path.getsize(os.path.join(root_directory, binary))
+            except (RuntimeError, OSError) as exc:
+                result.error = str(exc)
+        if on_result is not None:
+            on_result(result)
+    return rank(results)
+
+
+def rank(results: List[TuneResult]) -> List[TuneResult]:
+    return sorted(results, key=lambda r: (not r.ok, r.median or 0.0, r.size or 0))
+
+
+def winner(results: List[TuneResult]) -> Optional[TuneResult]:
+    """The fastest of ranked results, or None if it is not measurably faster than the runner-up."""
+    ok = [r for r in results if r.ok]
+    if len(ok) < 2:
+        return ok[0] if ok else None
+    return ok[0] if benchmark.differs(ok[0].times, ok[1].times) else None
+
+
+def format_row(result: TuneResult) -> List[str]:
+    if not result.ok:
+        return [result.variant, result.error or "failed", "", f"{result.cell.seconds:.1f}s"]
+    return [result.variant, f"{result.median * 1000:.1f} ms", f"{result.size / 1024:.0f} KB",
+            f"{result.cell.seconds:.1f}s"]
+
+
+def format_table(results: List[TuneResult]) -> str:
+    rows = [["variant", "runtime", "size", "compile"]] + [format_row(r) for r in results]
+    widths = [max(len(row[i]) for row in rows) for i in range(4)]
+    table = "\n".join("  ".join(cell.ljust(w) for cell, w in zip(row, widths)).rstrip() for row in rows)
+    if any(r.ok for r in results) and winner(results) is None:
+        table += "\nNo clear winner: the fastest variants are within measurement noise."
+    return table